@@ -0,0 +1,202 @@
+"""Admission control for Submit: per-client and per-process rate limits.
+
+A submission costs a backend POST, a MuPDF render and an SMTP send, so excess
+submissions are turned away before any of that starts. Three checks run in order,
+each O(1) under one lock:
+
+1. a token bucket per client (keyed by forwarded IP, else the Streamlit session)
+2. a token bucket for the whole process
+3. a cap on submissions being processed at the same moment
+
+Returning-client lookups, which reveal a previous owner's details, get their own
+per-client bucket (``LookupLimiter``). It lives in the process rather than the
+session, so opening a new tab does not reset it.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from patient_intake.config import get_lookup_limit_config, get_rate_limit_config
+
+# Most clients tracked at once; the least recently seen are forgotten first
+MAX_TRACKED_CLIENTS = 10_000
+
+
+class AdmissionRejected(Exception):
+    """A submission was turned away; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to ``burst`` tokens, refilled at ``rate`` per second.
+
+    Not thread-safe on its own; ``AdmissionController`` guards it with its lock.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take one token if available."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def refund(self) -> None:
+        """Give back a token taken by ``try_acquire`` for a call that did not go ahead."""
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    def retry_after(self) -> float:
+        """Seconds until the next token is available."""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return math.inf if self.rate <= 0 else (1 - self._tokens) / self.rate
+
+
+class _ClientBuckets:
+    """
+    One ``TokenBucket`` per client key, forgetting the least recently seen clients.
+
+    Not thread-safe on its own; callers guard it with their lock.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float]):
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def get(self, client_key: str) -> TokenBucket:
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            bucket = TokenBucket(self._rate, self._burst, self._clock)
+            self._buckets[client_key] = bucket
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_key)
+        return bucket
+
+
+class AdmissionController:
+    """Per-client and per-process token buckets plus a global in-flight cap."""
+
+    def __init__(
+        self,
+        client_per_minute: float,
+        client_burst: int,
+        process_per_minute: float,
+        process_burst: int,
+        max_in_flight: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._process = TokenBucket(process_per_minute / 60, process_burst, clock)
+        self._clients = _ClientBuckets(client_per_minute / 60, client_burst, clock)
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Submissions currently admitted and not yet finished."""
+        with self._lock:
+            return self._in_flight
+
+    def acquire(self, client_key: str) -> None:
+        """
+        Admit one submission from ``client_key``; pair with ``release()``.
+
+        A rejected submission costs nothing: tokens taken by earlier checks are refunded.
+
+        Raises:
+            AdmissionRejected: If a rate limit or the in-flight cap is hit
+        """
+        with self._lock:
+            client = self._clients.get(client_key)
+            if not client.try_acquire():
+                raise AdmissionRejected("client rate limit", client.retry_after())
+            if not self._process.try_acquire():
+                client.refund()
+                raise AdmissionRejected("server rate limit", self._process.retry_after())
+            if self._in_flight >= self.max_in_flight:
+                client.refund()
+                self._process.refund()
+                raise AdmissionRejected("too many submissions in progress", 1.0)
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """Mark an admitted submission as finished."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+
+class LookupLimiter:
+    """Per-client token buckets for returning-client lookups."""
+
+    def __init__(self, per_hour: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self._clients = _ClientBuckets(per_hour / 3600, burst, clock)
+        self._lock = threading.Lock()
+
+    def acquire(self, client_key: str) -> None:
+        """
+        Allow one lookup by ``client_key``.
+
+        Raises:
+            AdmissionRejected: If the client has used up its lookups
+        """
+        with self._lock:
+            bucket = self._clients.get(client_key)
+            if not bucket.try_acquire():
+                raise AdmissionRejected("lookup rate limit", bucket.retry_after())
+
+
+@st.cache_resource
+def get_admission_controller() -> AdmissionController:
+    """Process-wide admission controller shared by all sessions."""
+    return AdmissionController(**get_rate_limit_config())
+
+
+@st.cache_resource
+def get_lookup_limiter() -> LookupLimiter:
+    """Process-wide returning-client lookup limiter shared by all sessions."""
+    return LookupLimiter(**get_lookup_limit_config())
+
+
+def client_key() -> str:
+    """
+    Identify the client for rate limiting.
+
+    Uses the last ``X-Forwarded-For`` hop (the address the ALB saw; earlier hops are
+    client-supplied), then the socket address, and finally the Streamlit session ID.
+    """
+    forwarded = st.context.headers.get("X-Forwarded-For", "")
+    if forwarded.strip():
+        return forwarded.split(",")[-1].strip()
+    ip_address: str | None = getattr(st.context, "ip_address", None)
+    if ip_address:
+        return ip_address
+    ctx = get_script_run_ctx()
+    return f"session:{ctx.session_id}" if ctx else "unknown"
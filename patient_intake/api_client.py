@@ -1,26 +1,121 @@
 """API client for pro4eyes.com backend."""
 
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import suppress
+from urllib.parse import urlsplit
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from patient_intake.breaker import CircuitOpenError, get_breaker
+from patient_intake.cassette import get_recorder
+from patient_intake.config import (
+    CATALOGUE_URL,
+    PATIENT_ADD_URL,
+    SERVICE_TOKEN,
+    get_backend_limit_config,
+)
+from patient_intake.deadline import Deadline, DeadlineExceeded
+from patient_intake.limiter import get_backend_limiter
+from patient_intake.snapshot import get_snapshot
+from patient_intake.tracing import correlation_id, event, with_trace
+
+# Upper bound on concurrent POSTs (and pooled connections) for one multi-pet visit
+MAX_PARALLEL_SUBMITS = 8
+# Connect/read timeout for one backend request, in seconds
+REQUEST_TIMEOUT = 20
+# Seconds a fetched catalogue is reused (in this process and from the host snapshot)
+CATALOGUE_TTL = 3600
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session so requests reuse pooled TCP/TLS connections."""
+    session = requests.Session()
+    # Enough pooled connections for the adaptive limit at its highest
+    pool_size = max(MAX_PARALLEL_SUBMITS, get_backend_limit_config()["max_limit"])
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _timed_out_by(deadline: Deadline | None, exc: Exception) -> bool:
+    """Whether ``exc`` is a request timeout cut short by the submission deadline."""
+    return (
+        deadline is not None
+        and isinstance(exc, requests.exceptions.Timeout)
+        and deadline.remaining() <= 0
+    )
+
 
-from patient_intake.config import CATALOGUE_URL, PATIENT_ADD_URL, SERVICE_TOKEN
+def _request(
+    session: requests.Session,
+    method: str,
+    url: str,
+    deadline: Deadline | None = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Send a request through the backend circuit breaker.
+
+    Any error raised while sending (connection refused, timeout, ...) and 5xx
+    responses count as backend failures, except a timeout cut short by
+    ``deadline``: that frees the breaker's probe slot without counting. When
+    recording is on, the exchange is appended to the cassette (see ``cassette``).
+
+    Raises:
+        CircuitOpenError: If the breaker is open (no request is sent)
+    """
+    breaker = get_breaker("backend")
+    breaker.before_call()
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, **kwargs)
+    except Exception as exc:
+        if _timed_out_by(deadline, exc):
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    recorder = get_recorder()
+    if recorder:
+        recorder.record_http(method, url, response, time.perf_counter() - started)
+    return response
 
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=CATALOGUE_TTL)
 def fetch_reference_data() -> tuple[dict, dict, dict]:
     """
     Fetch species, breed, and sex reference data from the API.
 
+    A catalogue published to the host snapshot by another process within
+    ``CATALOGUE_TTL`` is used instead of calling the API; a freshly fetched one
+    is published for the others.
+
     Returns:
         Tuple of (species_map, breed_map, sex_map) dictionaries
         mapping names to IDs.
     """
+    snapshot = get_snapshot()
+    shared = snapshot.catalogue(CATALOGUE_TTL) if snapshot else None
+    if shared:
+        return shared
     headers = {"service-token": SERVICE_TOKEN}
     try:
-        response = requests.get(CATALOGUE_URL, headers=headers, timeout=20)
+        response = _request(
+            get_http_session(), "GET", CATALOGUE_URL, headers=headers, timeout=REQUEST_TIMEOUT
+        )
         response.raise_for_status()
         data = response.json()
-    except requests.exceptions.RequestException as exc:
+    except (requests.exceptions.RequestException, CircuitOpenError) as exc:
         st.error("Unable to load reference data from the server. Please check your connection or try again later.")
         return {}, {}, {}
     except ValueError as exc:
@@ -36,18 +131,130 @@ def fetch_reference_data() -> tuple[dict, dict, dict]:
         # Handles missing keys, wrong types, or non-iterable data structures
         st.error("Reference data from the server is incomplete or malformed. Please try again later.")
         return {}, {}, {}
+    if snapshot and species_map and breed_map and sex_map:
+        with suppress(OSError):
+            snapshot.publish(catalogue=(species_map, breed_map, sex_map))
     return species_map, breed_map, sex_map
 
 
-def submit_patient(payload: dict) -> requests.Response:
+def submit_patient(
+    payload: dict,
+    session: requests.Session | None = None,
+    deadline: Deadline | None = None,
+) -> requests.Response:
     """
     Submit a new patient to the backend API.
 
+    The POST waits for a slot from the adaptive backend limiter (see ``limiter``)
+    and its outcome feeds back into the limit.
+
     Args:
         payload: Patient data to submit
+        session: HTTP session to send through (defaults to the shared session)
+        deadline: Submission deadline; the request timeout is capped at what is left
 
     Returns:
         Response object from the API
+
+    Raises:
+        CircuitOpenError: If the backend breaker is open
+        DeadlineExceeded: If the deadline has already passed
+        LimiterTimeout: If no backend slot freed up in time
     """
+    session = session or get_http_session()
     headers = {"Content-Type": "application/json", "service-token": SERVICE_TOKEN}
-    return requests.post(PATIENT_ADD_URL, headers=headers, json=payload, timeout=20)
+    if trace_id := correlation_id():
+        headers["X-Correlation-ID"] = trace_id
+    limiter = get_backend_limiter()
+    ticket = limiter.acquire(
+        deadline.timeout("Backend request", REQUEST_TIMEOUT) if deadline else REQUEST_TIMEOUT
+    )
+    started = time.perf_counter()
+    try:
+        timeout = (
+            deadline.timeout("Backend request", REQUEST_TIMEOUT) if deadline else REQUEST_TIMEOUT
+        )
+        response = _request(
+            session,
+            "POST",
+            PATIENT_ADD_URL,
+            deadline,
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        )
+    except Exception as exc:
+        # A request that was never sent, or was cut short by the deadline, says
+        # nothing about the backend's load
+        sent = not isinstance(exc, (CircuitOpenError, DeadlineExceeded))
+        overloaded = sent and not _timed_out_by(deadline, exc)
+        limiter.release(ticket, overloaded=True if overloaded else None)
+        event(
+            "backend.post.failed",
+            logging.WARNING,
+            error=type(exc).__name__,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        raise
+    limiter.release(ticket, overloaded=response.status_code == 429 or response.status_code >= 500)
+    event(
+        "backend.post",
+        status=response.status_code,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        limit=limiter.limit,
+    )
+    return response
+
+
+def submit_patients(
+    payloads: list[dict], deadline: Deadline | None = None
+) -> list[requests.Response | Exception]:
+    """
+    Submit several patients (one owner's visit) concurrently over the shared session.
+
+    Args:
+        payloads: Patient data to submit, one per pet
+        deadline: Submission deadline; POSTs still running when it passes are
+            reported as ``DeadlineExceeded`` and not waited for
+
+    Returns:
+        One entry per payload, in order: the Response, or the exception raised
+        while sending that payload.
+    """
+    session = get_http_session()
+    workers = min(len(payloads), MAX_PARALLEL_SUBMITS)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="submit")
+    try:
+        futures = [
+            executor.submit(with_trace(submit_patient), payload, session, deadline)
+            for payload in payloads
+        ]
+        wait(futures, timeout=deadline.remaining() if deadline else None)
+    finally:
+        # Stragglers finish on their own; their request timeout is already capped
+        executor.shutdown(wait=False, cancel_futures=True)
+    results: list[requests.Response | Exception] = []
+    for future in futures:
+        # Without a deadline, wait() above returned only once every POST was done
+        if deadline is not None and not future.done():
+            results.append(DeadlineExceeded("Backend request", deadline.budget))
+            continue
+        try:
+            results.append(future.result())
+        except Exception as exc:
+            results.append(exc)
+    return results
+
+
+def warm_up_connections() -> None:
+    """
+    Open pooled connections to every backend origin not already warmed by the catalogue fetch.
+
+    Connection errors are ignored; a cold connection is still usable later.
+    """
+    session = get_http_session()
+    catalogue_origin = urlsplit(CATALOGUE_URL)[:2]
+    if urlsplit(PATIENT_ADD_URL)[:2] == catalogue_origin:
+        return
+    with suppress(requests.exceptions.RequestException):
+        session.head(PATIENT_ADD_URL, timeout=5)
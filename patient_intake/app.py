@@ -1,26 +1,50 @@
 """Main Streamlit application for patient intake form."""
 
+import logging
+import math
 import re
 
 import streamlit as st
 
-from patient_intake.api_client import fetch_reference_data, submit_patient
+from patient_intake.admission import (
+    AdmissionRejected,
+    client_key,
+    get_admission_controller,
+    get_lookup_limiter,
+)
+from patient_intake.api_client import fetch_reference_data, submit_patients
+from patient_intake.archive import get_archive
+from patient_intake.breed_matcher import get_breed_matcher
 from patient_intake.captcha import check_captcha
-from patient_intake.email_sender import send_email_with_pdf
-from patient_intake.pdf_generator import fill_pdf_with_fitz
+from patient_intake.config import SUBMIT_DEADLINE_SECONDS
+from patient_intake.deadline import Deadline
+from patient_intake.digest import dispatch_visit_email
+from patient_intake.email_sender import visit_filename
+from patient_intake.pdf_generator import render_visit_pdf_async
+from patient_intake.preview import get_preview_cache
+from patient_intake.profiler import block, profiled_rerun
+from patient_intake.storage import get_intake_store
+from patient_intake.tracing import event, trace
 
+# Upper bound on pets per visit
+MAX_PETS = 6
 
+
+@profiled_rerun
 def main():
     """Main entry point for the Streamlit application."""
     # CAPTCHA check first
-    check_captcha()
+    with block("captcha"):
+        check_captcha()
 
     # Fetch reference data
-    species_map, breed_map, sex_map = fetch_reference_data()
+    with block("catalogue"):
+        species_map, breed_map, sex_map = fetch_reference_data()
 
     # === UI FORM ===
-    st.markdown(
-        """
+    with block("css"):
+        st.markdown(
+            """
     <style>
     .responsive-box {
         width: 100%;
@@ -34,34 +58,34 @@ def main():
     @media screen and (max-width: 768px) { .responsive-box { max-width: 100%; } }
     </style>
     """,
-        unsafe_allow_html=True,
-    )
+            unsafe_allow_html=True,
+        )
 
     st.header("Patient Intake Form")
 
     col1, col2 = st.columns(2)
 
     # === CLIENT AREA ===
-    with col1:
+    with col1, block("client"):
         with st.container(border=True):
             st.subheader("Client Information")
-            owner_name = st.text_input("Full Name (First and Last):")
-            sec_owner_name = st.text_input("Full Name of Secondary Contact:")
-            email = st.text_input("Email address:")
-            cell_no = st.text_input("Phone number (10 digits):")
-            work_no = st.text_input("Work phone:")
-            alt_no = st.text_input("Alternative phone:")
-            employer = st.text_input("Employer:")
+            owner_name = st.text_input("Full Name (First and Last):", key="owner_name")
+            sec_owner_name = st.text_input("Full Name of Secondary Contact:", key="sec_owner_name")
+            email = st.text_input("Email address:", key="email")
+            cell_no = st.text_input("Phone number (10 digits):", key="cell_no")
+            work_no = st.text_input("Work phone:", key="work_no")
+            alt_no = st.text_input("Alternative phone:", key="alt_no")
+            employer = st.text_input("Employer:", key="employer")
             drive_lic = st.text_input("Driver's License (IF writing check):")
-            owner_address = st.text_input("Address:")
+            owner_address = st.text_input("Address:", key="owner_address")
 
             city_col, state_col, zip_col = st.columns(3)
             with city_col:
-                city = st.text_input("City:")
+                city = st.text_input("City:", key="city")
             with state_col:
-                state = st.text_input("State (2-letter):")
+                state = st.text_input("State (2-letter):", key="state")
             with zip_col:
-                zip_code = st.text_input("Zip Code:")
+                zip_code = st.text_input("Zip Code:", key="zip_code")
 
             st.markdown("**Owner's Date of Birth**")
             dob_col1, dob_col2, dob_col3 = st.columns(3)
@@ -73,242 +97,468 @@ def main():
                 owner_year = st.selectbox("Year", list(range(1920, 2010)))
 
             prev_visit = st.selectbox("Have you been to our facility before?", ["Yes", "No"])
+            if prev_visit == "Yes":
+                _returning_client_lookup()
 
     # === ADD CANINE INDEX FOR SPECIES ===
     species_keys = sorted(species_map.keys())
     canine_index = species_keys.index("Canine") if "Canine" in species_keys else 0
 
     # === PATIENT AREA ===
-    with col2:
-        with st.container(border=True):
-            st.subheader("Pet Information")
-            pet_name = st.text_input("Pet Name:")
-            breed_options = sorted(breed_map.keys())
-            breed = st.selectbox("Breed", breed_options)
-            breed_non_listed = st.text_input("Breed (if not listed):")
-            color = st.text_input("Color")
-            st.markdown("**Patient's Date of Birth**")
-            dob_col1, dob_col2, dob_col3 = st.columns(3)
-            with dob_col1:
-                day = st.selectbox("Day", list(range(1, 32)), key="pet_day")
-            with dob_col2:
-                month = st.selectbox("Month", list(range(1, 13)), key="pet_month")
-            with dob_col3:
-                year = st.selectbox("Year", list(range(2000, 2027)), key="pet_year")
-            patient_sex = st.selectbox("Sex", sorted(sex_map.keys()))
-            patient_species = st.selectbox("Species", species_keys, index=canine_index)
-            pet_prev_visit = st.selectbox(
-                "Has this pet been at our facility before?", ["Yes", "No"]
+    if "pet_count" not in st.session_state:
+        st.session_state.pet_count = 1
+
+    with col2, block("pets"):
+        pets = [
+            _pet_section(index, breed_map, sex_map, species_keys, canine_index)
+            for index in range(st.session_state.pet_count)
+        ]
+        add_col, remove_col = st.columns(2)
+        with add_col:
+            st.button(
+                "Add another pet",
+                on_click=_add_pet,
+                disabled=st.session_state.pet_count >= MAX_PETS,
+            )
+        with remove_col:
+            st.button(
+                "Remove last pet",
+                on_click=_remove_pet,
+                disabled=st.session_state.pet_count <= 1,
             )
 
-            # PRIMARY CARE VETERINARIAN INFO
-            doctor = st.text_input("Doctor")
-            clinic_name = st.text_input("Clinic Name")
+    owner = {
+        "owner_name": owner_name,
+        "sec_owner_name": sec_owner_name,
+        "email": email,
+        "cell_no": cell_no,
+        "work_no": work_no,
+        "alt_no": alt_no,
+        "employer": employer,
+        "drive_lic": drive_lic,
+        "owner_address": owner_address,
+        "city": city,
+        "state": state,
+        "zip_code": zip_code,
+        "owner_day": owner_day,
+        "owner_month": owner_month,
+        "owner_year": owner_year,
+        "prev_visit": prev_visit,
+    }
+    if st.toggle("Preview the filled form before submitting", key="show_preview"):
+        with block("preview"):
+            _show_preview(owner, pets, species_map, breed_map, sex_map)
 
+    urgent = st.checkbox("This visit is urgent (notify the front desk immediately).")
     agree = st.checkbox("I confirm the information is correct.")
     submit_button = st.button("Submit")
 
     if submit_button:
-        _handle_submit(
-            owner_name=owner_name,
-            sec_owner_name=sec_owner_name,
-            email=email,
-            cell_no=cell_no,
-            work_no=work_no,
-            alt_no=alt_no,
-            employer=employer,
-            drive_lic=drive_lic,
-            owner_address=owner_address,
-            city=city,
-            state=state,
-            zip_code=zip_code,
-            owner_day=owner_day,
-            owner_month=owner_month,
-            owner_year=owner_year,
-            prev_visit=prev_visit,
-            pet_name=pet_name,
-            breed=breed,
-            breed_non_listed=breed_non_listed,
-            color=color,
-            day=day,
-            month=month,
-            year=year,
-            patient_sex=patient_sex,
-            patient_species=patient_species,
-            pet_prev_visit=pet_prev_visit,
-            doctor=doctor,
-            clinic_name=clinic_name,
-            agree=agree,
-            species_map=species_map,
-            breed_map=breed_map,
-            sex_map=sex_map,
+        with trace(), block("submit"):
+            _handle_submit(
+                owner=owner,
+                pets=pets,
+                agree=agree,
+                urgent=urgent,
+                species_map=species_map,
+                breed_map=breed_map,
+                sex_map=sex_map,
+            )
+
+
+def _returning_client_lookup():
+    """Offer to prefill the owner fields from the client's previous intake."""
+    lookup_col, name_col, button_col = st.columns([2, 2, 1], vertical_alignment="bottom")
+    with lookup_col:
+        st.text_input("Phone or email from your last visit:", key="lookup_value")
+    with name_col:
+        st.text_input("Your last name:", key="lookup_last_name")
+    with button_col:
+        st.button("Fill in my details", on_click=_prefill_owner)
+    message = st.session_state.pop("lookup_message", None)
+    if message:
+        st.info(message)
+
+
+def _prefill_owner():
+    """Button callback: look up the client and set the owner widgets before the rerun."""
+    try:
+        get_lookup_limiter().acquire(client_key())
+    except AdmissionRejected:
+        st.session_state.lookup_message = "Please fill in your details below."
+        return
+
+    try:
+        record = get_intake_store().returning_owner(
+            st.session_state.get("lookup_value", ""),
+            st.session_state.get("lookup_last_name", ""),
+        )
+    except Exception as e:
+        st.session_state.lookup_message = f"Lookup is unavailable right now ({e})."
+        return
+    if record is None:
+        st.session_state.lookup_message = "No previous visit found; please fill in your details."
+        return
+    for key, value in _owner_prefill(record["payload"], record["extra_fields"]).items():
+        if value:
+            st.session_state[key] = value
+    st.session_state.lookup_message = "Welcome back! Please check your details below."
+
+
+def _owner_prefill(payload: dict, extra_fields: dict) -> dict:
+    """
+    Owner widget values from a previous intake, keyed by widget key.
+
+    Only returned for a matching phone or email and last name (see
+    ``IntakeStore.returning_owner``); the driver's license and date of birth are
+    never prefilled.
+    """
+    return {
+        "owner_name": f"{payload.get('patient_owner_firstname', '')} "
+        f"{payload.get('patient_owner_lastname', '')}".strip(),
+        "sec_owner_name": f"{extra_fields.get('sec_owner_firstname', '')} "
+        f"{extra_fields.get('sec_owner_lastname', '')}".strip(),
+        "email": payload.get("email", ""),
+        "cell_no": payload.get("phone", ""),
+        "work_no": extra_fields.get("work_no", ""),
+        "alt_no": extra_fields.get("alt_no", ""),
+        "employer": extra_fields.get("employer", ""),
+        "owner_address": payload.get("address", ""),
+        "city": payload.get("city", ""),
+        "state": payload.get("state", ""),
+        "zip_code": payload.get("zip", ""),
+    }
+
+
+def _add_pet():
+    st.session_state.pet_count = min(st.session_state.pet_count + 1, MAX_PETS)
+
+
+def _remove_pet():
+    st.session_state.pet_count = max(st.session_state.pet_count - 1, 1)
+
+
+def _pet_section(
+    index: int, breed_map: dict, sex_map: dict, species_keys: list, canine_index: int
+) -> dict:
+    """Render the inputs for one pet and return their values."""
+    # The first pet keeps the unsuffixed keys (e.g. "pet_day") used before multi-pet support
+    suffix = "" if index == 0 else f"_{index + 1}"
+    with st.container(border=True):
+        st.subheader("Pet Information" if index == 0 else f"Pet {index + 1} Information")
+        pet: dict = {}
+        pet["pet_name"] = st.text_input("Pet Name:", key=f"pet_name{suffix}")
+        with block("pets.breed"):
+            breed_options = sorted(breed_map.keys())
+            pet["breed"] = st.selectbox("Breed", breed_options, key=f"pet_breed{suffix}")
+        pet["breed_non_listed"] = st.text_input(
+            "Breed (if not listed):", key=f"pet_breed_non_listed{suffix}"
+        )
+        pet["color"] = st.text_input("Color", key=f"pet_color{suffix}")
+        st.markdown("**Patient's Date of Birth**")
+        dob_col1, dob_col2, dob_col3 = st.columns(3)
+        with dob_col1:
+            pet["day"] = st.selectbox("Day", list(range(1, 32)), key=f"pet_day{suffix}")
+        with dob_col2:
+            pet["month"] = st.selectbox("Month", list(range(1, 13)), key=f"pet_month{suffix}")
+        with dob_col3:
+            pet["year"] = st.selectbox("Year", list(range(2000, 2027)), key=f"pet_year{suffix}")
+        pet["patient_sex"] = st.selectbox("Sex", sorted(sex_map.keys()), key=f"pet_sex{suffix}")
+        pet["patient_species"] = st.selectbox(
+            "Species", species_keys, index=canine_index, key=f"pet_species{suffix}"
+        )
+        pet["pet_prev_visit"] = st.selectbox(
+            "Has this pet been at our facility before?",
+            ["Yes", "No"],
+            key=f"pet_prev_visit{suffix}",
+        )
+
+        # PRIMARY CARE VETERINARIAN INFO
+        pet["doctor"] = st.text_input("Doctor", key=f"pet_doctor{suffix}")
+        pet["clinic_name"] = st.text_input("Clinic Name", key=f"pet_clinic_name{suffix}")
+    return pet
+
+
+def _build_visit(
+    owner: dict, pets: list[dict], species_map: dict, breed_map: dict, sex_map: dict
+) -> tuple[list[dict], list[dict]]:
+    """
+    Build the backend payload and the extra PDF/email fields for each pet.
+
+    Catalogue IDs are looked up but not checked; one that is not found is None.
+
+    Returns:
+        (payloads, extra_fields_list), one entry per pet
+    """
+    first, _, last = owner["owner_name"].partition(" ")
+    sec_first, _, sec_last = owner["sec_owner_name"].partition(" ")
+
+    payloads = []
+    extra_fields_list = []
+    for pet in pets:
+        breed_id = breed_map.get(pet["breed"])
+        if pet["breed_non_listed"].strip():
+            # A typed breed that is just a misspelled catalogue breed gets its ID
+            match = get_breed_matcher(breed_map).match(pet["breed_non_listed"])
+            if match:
+                breed_id = match.breed_id
+
+        payloads.append(
+            {
+                "company_id": 1,
+                "patient_name": pet["pet_name"],
+                "patient_species": species_map.get(pet["patient_species"]),
+                "patient_breed": breed_id,
+                "patient_sex": sex_map.get(pet["patient_sex"]),
+                "birthday_day": pet["day"],
+                "birthday_month": pet["month"],
+                "birthday_year": pet["year"],
+                "patient_owner_firstname": first,
+                "patient_owner_lastname": last,
+                "patient_address": owner["owner_address"],
+                "patient_email": owner["email"],
+                "patient_phone": owner["cell_no"],
+                "address": owner["owner_address"],
+                "email": owner["email"],
+                "phone": owner["cell_no"],
+                "city": owner["city"],
+                "state": owner["state"],
+                "zip": owner["zip_code"],
+            }
         )
+        # Collect extra fields for PDF/Email
+        extra_fields_list.append(
+            {
+                "sec_owner_firstname": sec_first,
+                "sec_owner_lastname": sec_last,
+                "work_no": owner["work_no"],
+                "alt_no": owner["alt_no"],
+                "employer": owner["employer"],
+                "drive_lic": owner["drive_lic"],
+                "owner_day": owner["owner_day"],
+                "owner_month": owner["owner_month"],
+                "owner_year": owner["owner_year"],
+                "prev_visit": owner["prev_visit"],
+                "color": pet["color"],
+                "breed_not_listed": pet["breed_non_listed"],
+                "pet_prev_visit": pet["pet_prev_visit"],
+                "doctor": pet["doctor"],
+                "clinic_name": pet["clinic_name"],
+            }
+        )
+    return payloads, extra_fields_list
+
+
+def _show_preview(owner: dict, pets: list[dict], species_map: dict, breed_map: dict, sex_map: dict):
+    """Show a low-resolution image of each pet's filled intake form."""
+    payloads, extra_fields_list = _build_visit(owner, pets, species_map, breed_map, sex_map)
+    cache = get_preview_cache()
+    columns = st.columns(min(len(payloads), 3))
+    pets_fields = zip(payloads, extra_fields_list, strict=True)
+    for index, (payload, extra_fields) in enumerate(pets_fields):
+        try:
+            png = cache.preview(payload, extra_fields, species_map, breed_map, sex_map)
+        except Exception as e:
+            st.warning(f"Preview unavailable: {e}")
+            return
+        caption = payload["patient_name"] or f"Pet {index + 1}"
+        columns[index % len(columns)].image(png, caption=caption)
 
 
 def _handle_submit(
-    owner_name: str,
-    sec_owner_name: str,
-    email: str,
-    cell_no: str,
-    work_no: str,
-    alt_no: str,
-    employer: str,
-    drive_lic: str,
-    owner_address: str,
-    city: str,
-    state: str,
-    zip_code: str,
-    owner_day: int,
-    owner_month: int,
-    owner_year: int,
-    prev_visit: str,
-    pet_name: str,
-    breed: str,
-    breed_non_listed: str,
-    color: str,
-    day: int,
-    month: int,
-    year: int,
-    patient_sex: str,
-    patient_species: str,
-    pet_prev_visit: str,
-    doctor: str,
-    clinic_name: str,
+    owner: dict,
+    pets: list[dict],
     agree: bool,
+    urgent: bool,
     species_map: dict,
     breed_map: dict,
     sex_map: dict,
 ):
     """Handle form submission."""
+    # One budget for the whole submission; each stage gets whatever is left
+    deadline = Deadline(SUBMIT_DEADLINE_SECONDS)
+    event("submission.start", pets=len(pets))
     all_valid = True
     st.write("Form submitted")
 
-    if not re.fullmatch(r"[A-Za-z'-]+ [A-Za-z'-]+([A-Za-z'-]+)*", owner_name):
+    if not re.fullmatch(r"[A-Za-z'-]+ [A-Za-z'-]+([A-Za-z'-]+)*", owner["owner_name"]):
         st.warning("Please enter your full name (first and last).")
         all_valid = False
 
-    if not re.fullmatch(r"\d{10}", cell_no):
+    if not re.fullmatch(r"\d{10}", owner["cell_no"]):
         st.warning("Please enter a valid phone number (10 digits only).")
         all_valid = False
 
-    if not re.fullmatch(r"[A-Za-z ]+", pet_name):
-        st.warning("Please enter a valid pet name (letters and spaces only).")
-        all_valid = False
+    for number, pet in enumerate(pets, 1):
+        label = "pet name" if len(pets) == 1 else f"name for pet {number}"
+        if not re.fullmatch(r"[A-Za-z ]+", pet["pet_name"]):
+            st.warning(f"Please enter a valid {label} (letters and spaces only).")
+            all_valid = False
 
     if not agree:
         st.warning("Please check the confirmation box.")
         all_valid = False
 
-    if not zip_code:
+    if not owner["zip_code"]:
         all_valid = False
 
     if not all_valid:
+        event("submission.invalid", pets=len(pets))
         return
 
-    first, last = owner_name.split(" ", 1)
+    payloads, extra_fields_list = _build_visit(owner, pets, species_map, breed_map, sex_map)
+    for pet, payload in zip(pets, payloads, strict=True):
+        # Validate dropdowns to ensure IDs exist
+        if payload["patient_species"] is None:
+            st.error("Please select a Species.")
+            st.stop()
+        if payload["patient_sex"] is None:
+            st.error("Please select Sex.")
+            st.stop()
+        if payload["patient_breed"] is None and not pet["breed_non_listed"].strip():
+            st.error("Please select a Breed or fill 'Breed (if not listed)'.")
+            st.stop()
 
-    # Validate dropdowns to ensure IDs exist
-    species_id = species_map.get(patient_species)
-    breed_id = breed_map.get(breed)
-    sex_id = sex_map.get(patient_sex)
+        event(
+            "pet.validated",
+            species_id=payload["patient_species"],
+            breed_id=payload["patient_breed"],
+            sex_id=payload["patient_sex"],
+        )
 
-    if species_id is None:
-        st.error("Please select a Species.")
-        st.stop()
-    if sex_id is None:
-        st.error("Please select Sex.")
-        st.stop()
-    if breed_id is None and not breed_non_listed.strip():
-        st.error("Please select a Breed or fill 'Breed (if not listed)'.")
+    # Cheap rejection before the backend POST, rendering and SMTP; only a valid
+    # form is charged against the rate limits
+    admission = get_admission_controller()
+    try:
+        admission.acquire(client_key())
+    except AdmissionRejected as e:
+        event("submission.rejected", logging.WARNING, reason=e.reason)
+        st.error(
+            f"Too many submissions right now ({e.reason}). "
+            f"Please try again in {max(1, math.ceil(min(e.retry_after, 3600)))} seconds."
+        )
         st.stop()
+    try:
+        _send_visit(payloads, extra_fields_list, urgent, species_map, breed_map, sex_map, deadline)
+    finally:
+        admission.release()
 
-    payload = {
-        "company_id": 1,
-        "patient_name": pet_name,
-        "patient_species": species_id,
-        "patient_breed": breed_id if breed_id is not None else None,
-        "patient_sex": sex_id,
-        "birthday_day": day,
-        "birthday_month": month,
-        "birthday_year": year,
-        "patient_owner_firstname": first,
-        "patient_owner_lastname": last,
-        "patient_address": owner_address,
-        "patient_email": email,
-        "patient_phone": cell_no,
-        "address": owner_address,
-        "email": email,
-        "phone": cell_no,
-        "city": city,
-        "state": state,
-        "zip": zip_code,
-    }
-
-    st.write("DEBUG IDs", {"species_id": species_id, "breed_id": breed_id, "sex_id": sex_id})
 
+def _send_visit(
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    urgent: bool,
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    deadline: Deadline,
+):
+    """POST, save, render, archive and email a validated, admitted visit."""
+    # Render speculatively while the POSTs are in flight; only the status check
+    # depends on the response, so the PDF is thrown away if any pet is rejected.
+    pdf_future = render_visit_pdf_async(
+        payloads, extra_fields_list, species_map, breed_map, sex_map
+    )
     try:
-        response = submit_patient(payload)
-        st.write("DEBUG status:", response.status_code)
+        responses = submit_patients(payloads, deadline)
+    except Exception as e:
+        pdf_future.cancel()
+        event("submission.failed", logging.ERROR, stage="backend", error=type(e).__name__)
+        st.error(f"Request failed: {e}")
+        st.stop()
+
+    saved_payloads = []
+    saved_extra_fields = []
+    patient_ids = []
+    for payload, extra_fields, response in zip(payloads, extra_fields_list, responses, strict=True):
+        if isinstance(response, Exception):
+            st.error(f"Request failed for {payload['patient_name']}: {response}")
+            continue
         try:
             result = response.json()
-            st.write("DEBUG json:", result)
         except Exception:
-            st.write("DEBUG text:", response.text[:400])
-            st.error("Server did not return JSON.")
-            st.stop()
+            event(
+                "backend.response.invalid",
+                logging.WARNING,
+                status=response.status_code,
+                content_type=response.headers.get("Content-Type"),
+                length=len(response.content),
+            )
+            st.error(f"Server did not return JSON for {payload['patient_name']}.")
+            continue
+        event(
+            "backend.response",
+            status=response.status_code,
+            result=result.get("result"),
+            patient_id=result.get("patient_id"),
+        )
 
         if response.status_code == 200 and result.get("result") == "success":
-            # Collect extra fields for PDF/Email
-            sec_first, sec_last = ("", "")
-            if sec_owner_name and " " in sec_owner_name:
-                sec_first, sec_last = sec_owner_name.split(" ", 1)
-            elif sec_owner_name:
-                sec_first = sec_owner_name
-
-            extra_fields = {
-                "sec_owner_firstname": sec_first,
-                "sec_owner_lastname": sec_last,
-                "work_no": work_no,
-                "alt_no": alt_no,
-                "employer": employer,
-                "drive_lic": drive_lic,
-                "owner_day": owner_day,
-                "owner_month": owner_month,
-                "owner_year": owner_year,
-                "prev_visit": prev_visit,
-                "color": color,
-                "breed_not_listed": breed_non_listed,
-                "pet_prev_visit": pet_prev_visit,
-                "doctor": doctor,
-                "clinic_name": clinic_name,
-            }
+            saved_payloads.append(payload)
+            saved_extra_fields.append(extra_fields)
+            patient_ids.append(result.get("patient_id", "?"))
+        else:
+            message = result.get("message", response.text)
+            st.error(f"API Error ({payload['patient_name']}): {message}")
 
-            pdf_filled = fill_pdf_with_fitz(
-                payload, extra_fields, species_map, breed_map, sex_map
-            )
-            ok = send_email_with_pdf(
-                pdf_bytes=pdf_filled.getvalue(),
-                filename=f"{payload['patient_name']}_intake_form.pdf",
-                patient_name=payload["patient_name"],
-                payload=payload,
-                extra_fields=extra_fields,
-                species_map=species_map,
-                breed_map=breed_map,
-                sex_map=sex_map,
-            )
-            if not ok:
-                st.warning("Patient saved; email failed (see error above).")
+    if not saved_payloads:
+        pdf_future.cancel()
+        event("submission.failed", logging.WARNING, stage="backend", pets=len(payloads))
+        st.stop()
 
-            st.success(f"Patient uploaded successfully! ID: {result.get('patient_id', '?')}")
-            st.balloons()
-        else:
-            st.error(f"API Error: {result.get('message', response.text)}")
-            st.stop()
+    try:
+        get_intake_store().append_visit(saved_payloads, saved_extra_fields)
+    except Exception as e:
+        st.warning(f"Could not save the intake to local history: {e}")
 
+    try:
+        if len(saved_payloads) < len(payloads):
+            pdf_future.cancel()
+            pdf_future = render_visit_pdf_async(
+                saved_payloads, saved_extra_fields, species_map, breed_map, sex_map
+            )
+        # The buffer wraps the rendered bytes, so getvalue() does not copy
+        pdf_bytes = deadline.result(pdf_future, "PDF render").getvalue()
+        try:
+            get_archive().archive_visit(
+                pdf_bytes,
+                saved_payloads,
+                saved_extra_fields,
+                patient_ids,
+                species_map,
+                breed_map,
+                sex_map,
+            )
+        except Exception as e:
+            st.warning(f"Could not archive the intake PDF: {e}")
+        ok = dispatch_visit_email(
+            pdf_bytes=pdf_bytes,
+            filename=visit_filename(saved_payloads),
+            payloads=saved_payloads,
+            extra_fields_list=saved_extra_fields,
+            species_map=species_map,
+            breed_map=breed_map,
+            sex_map=sex_map,
+            urgent=urgent,
+            deadline=deadline,
+        )
+        if not ok:
+            st.warning("Patient saved; email failed (see error above).")
     except Exception as e:
+        event("submission.failed", logging.ERROR, stage="render/email", error=type(e).__name__)
         st.error(f"Request failed: {e}")
         st.stop()
 
+    event(
+        "submission.done",
+        pets=len(payloads),
+        saved=len(saved_payloads),
+        elapsed_ms=round((deadline.budget - deadline.remaining()) * 1000, 1),
+    )
+    for payload, patient_id in zip(saved_payloads, patient_ids, strict=True):
+        st.success(f"Patient {payload['patient_name']} uploaded successfully! ID: {patient_id}")
+    st.balloons()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,281 @@
+"""Content-addressed local archive of generated intake PDFs and payloads.
+
+Every rendered visit PDF and each pet's normalized payload is stored once under
+its SHA-256 (zlib-compressed, deduplicated) in ``ARCHIVE_DIR/objects``. A SQLite
+index maps patient name, intake date and backend ``patient_id`` to those
+objects, so re-sending or auditing an intake is a lookup, not a re-render.
+
+Usage:
+    python -m patient_intake.archive find --patient-name Fluffy
+    python -m patient_intake.archive export <pdf_hash> out.pdf
+    python -m patient_intake.archive resend <visit_id>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+import zlib
+from collections.abc import Iterator
+from contextlib import closing
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from patient_intake.config import ARCHIVE_DIR
+from patient_intake.email_sender import send_visit_email_with_pdf, visit_filename
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intakes (
+    id INTEGER PRIMARY KEY,
+    visit_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    intake_date TEXT NOT NULL,
+    patient_name TEXT NOT NULL,
+    patient_name_key TEXT NOT NULL,
+    owner_name TEXT NOT NULL,
+    patient_id TEXT,
+    payload_hash TEXT NOT NULL,
+    pdf_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intakes_patient_name ON intakes (patient_name_key);
+CREATE INDEX IF NOT EXISTS intakes_date ON intakes (intake_date);
+CREATE INDEX IF NOT EXISTS intakes_patient_id ON intakes (patient_id);
+CREATE INDEX IF NOT EXISTS intakes_visit ON intakes (visit_id);
+"""
+
+
+def normalize_payload(
+    payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict
+) -> dict:
+    """
+    Build the self-contained record stored for one pet.
+
+    Only the catalogue entries the intake refers to are kept, so the record can be
+    re-rendered later without the live catalogue.
+    """
+
+    def used(mapping: dict, _id) -> dict:
+        return {name: value for name, value in mapping.items() if value == _id}
+
+    return {
+        "payload": payload,
+        "extra_fields": extra_fields,
+        "catalogue": {
+            "species": used(species_map, payload.get("patient_species")),
+            "breed": used(breed_map, payload.get("patient_breed")),
+            "sex": used(sex_map, payload.get("patient_sex")),
+        },
+    }
+
+
+def _canonical_json(record: dict) -> bytes:
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+class IntakeArchive:
+    """Content-addressed object store plus a SQLite lookup index."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.sqlite3"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.index_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def put(self, data: bytes | memoryview) -> str:
+        """Store bytes under their SHA-256 unless already present; return the hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if path.exists():
+            return digest
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(zlib.compress(data, 6))
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Read an object back by hash.
+
+        Raises:
+            FileNotFoundError: If no object has that hash
+        """
+        return zlib.decompress(self._object_path(digest).read_bytes())
+
+    def read_pdf(self, pdf_hash: str) -> bytes:
+        """Return an archived visit PDF."""
+        return self.get(pdf_hash)
+
+    def read_payload(self, payload_hash: str) -> dict:
+        """Return an archived normalized payload (see ``normalize_payload``)."""
+        record: dict = json.loads(self.get(payload_hash))
+        return record
+
+    def archive_visit(
+        self,
+        pdf_bytes: bytes | memoryview,
+        payloads: list[dict],
+        extra_fields_list: list[dict],
+        patient_ids: list,
+        species_map: dict,
+        breed_map: dict,
+        sex_map: dict,
+    ) -> str:
+        """
+        Store a visit's PDF and each pet's normalized payload, and index them.
+
+        Returns:
+            The new visit ID
+        """
+        visit_id = uuid.uuid4().hex
+        now = datetime.now()
+        pdf_hash = self.put(pdf_bytes)
+        rows = []
+        for payload, extra_fields, patient_id in zip(
+            payloads, extra_fields_list, patient_ids, strict=True
+        ):
+            record = normalize_payload(payload, extra_fields, species_map, breed_map, sex_map)
+            owner = f"{payload.get('patient_owner_firstname', '')} "
+            owner += payload.get("patient_owner_lastname", "") or ""
+            rows.append(
+                (
+                    visit_id,
+                    now.isoformat(timespec="seconds"),
+                    now.date().isoformat(),
+                    payload["patient_name"],
+                    payload["patient_name"].strip().lower(),
+                    owner.strip(),
+                    None if patient_id in (None, "?") else str(patient_id),
+                    self.put(_canonical_json(record)),
+                    pdf_hash,
+                )
+            )
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO intakes (visit_id, created_at, intake_date, patient_name,"
+                " patient_name_key, owner_name, patient_id, payload_hash, pdf_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return visit_id
+
+    def find(
+        self,
+        patient_name: str | None = None,
+        date: str | None = None,
+        patient_id: str | None = None,
+        visit_id: str | None = None,
+        limit: int = 100,
+    ) -> list[dict]:
+        """
+        Look up archived intakes; all given filters must match.
+
+        Args:
+            patient_name: Pet name (case-insensitive, exact)
+            date: Intake date as YYYY-MM-DD
+            patient_id: Backend patient ID
+            visit_id: Archive visit ID
+            limit: Maximum rows returned, newest first
+        """
+        clauses, params = [], []
+        if patient_name:
+            clauses.append("patient_name_key = ?")
+            params.append(patient_name.strip().lower())
+        if date:
+            clauses.append("intake_date = ?")
+            params.append(date)
+        if patient_id:
+            clauses.append("patient_id = ?")
+            params.append(str(patient_id))
+        if visit_id:
+            clauses.append("visit_id = ?")
+            params.append(visit_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM intakes {where} ORDER BY id DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield every index row, oldest first, without loading them all at once."""
+        with closing(self._connect()) as conn:
+            yield from (dict(row) for row in conn.execute("SELECT * FROM intakes ORDER BY id"))
+
+
+@lru_cache(maxsize=1)
+def get_archive() -> IntakeArchive:
+    """Process-wide archive under ``ARCHIVE_DIR``."""
+    return IntakeArchive(ARCHIVE_DIR)
+
+
+def _resend(archive: IntakeArchive, visit_id: str) -> bool:
+    rows = list(reversed(archive.find(visit_id=visit_id)))
+    if not rows:
+        raise SystemExit(f"No archived visit {visit_id}")
+    records = [archive.read_payload(row["payload_hash"]) for row in rows]
+    payloads = [record["payload"] for record in records]
+    species_map, breed_map, sex_map = {}, {}, {}
+    for record in records:
+        species_map.update(record["catalogue"]["species"])
+        breed_map.update(record["catalogue"]["breed"])
+        sex_map.update(record["catalogue"]["sex"])
+    return send_visit_email_with_pdf(
+        pdf_bytes=archive.read_pdf(rows[0]["pdf_hash"]),
+        filename=visit_filename(payloads),
+        payloads=payloads,
+        extra_fields_list=[record["extra_fields"] for record in records],
+        species_map=species_map,
+        breed_map=breed_map,
+        sex_map=sex_map,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line access to the archive: find, export and resend."""
+    parser = argparse.ArgumentParser(prog="python -m patient_intake.archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    find = commands.add_parser("find", help="list archived intakes")
+    find.add_argument("--patient-name")
+    find.add_argument("--date", help="YYYY-MM-DD")
+    find.add_argument("--patient-id")
+    find.add_argument("--limit", type=int, default=100)
+    export = commands.add_parser("export", help="write an archived PDF to a file")
+    export.add_argument("pdf_hash")
+    export.add_argument("output", type=Path)
+    resend = commands.add_parser("resend", help="email an archived visit again")
+    resend.add_argument("visit_id")
+    args = parser.parse_args(argv)
+
+    archive = get_archive()
+    if args.command == "find":
+        for row in archive.find(args.patient_name, args.date, args.patient_id, limit=args.limit):
+            print(json.dumps(row))
+    elif args.command == "export":
+        args.output.write_bytes(archive.read_pdf(args.pdf_hash))
+    elif args.command == "resend":
+        sys.exit(0 if _resend(archive, args.visit_id) else 1)
+
+
+if __name__ == "__main__":
+    main()
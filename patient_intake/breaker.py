@@ -0,0 +1,124 @@
+"""Circuit breakers for the backend API and the SMTP server.
+
+After ``failure_threshold`` consecutive failures a breaker opens and calls fail
+fast with ``CircuitOpenError`` instead of waiting out a timeout. Once
+``reset_seconds`` have passed it goes half-open and lets a single probe call
+through: success closes it, failure opens it again.
+
+State is published as the ``intake_circuit_breaker_state`` gauge
+(0 closed, 1 half-open, 2 open).
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from functools import cache
+
+from patient_intake import metrics
+from patient_intake.config import get_breaker_config
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_state_gauge = metrics.gauge(
+    "intake_circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)"
+)
+_rejected = metrics.counter(
+    "intake_circuit_breaker_rejected_total", "Calls failed fast by an open circuit breaker"
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} unavailable; retry in {max(1, round(retry_after))}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with single-probe half-open state."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        _state_gauge.set(0, breaker=name)
+
+    @property
+    def state(self) -> str:
+        """Current state, moving open -> half-open once the reset period has passed."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        _state_gauge.set(_STATE_VALUES[state], breaker=self.name)
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._set_state(HALF_OPEN)
+            self._probing = False
+
+    def before_call(self) -> None:
+        """
+        Check the breaker before calling the dependency.
+
+        Raises:
+            CircuitOpenError: If open, or half-open with a probe already in flight
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            _rejected.inc(breaker=self.name)
+            retry_after = self.reset_seconds - (self._clock() - self._opened_at)
+            raise CircuitOpenError(self.name, max(retry_after, 0))
+
+    def record_success(self) -> None:
+        """The call reached the dependency and it answered."""
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def release(self) -> None:
+        """The call was abandoned before it learnt anything about the dependency."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """The call failed in a way that points at the dependency (timeout, refused, 5xx)."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+
+
+@cache
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a dependency (``"backend"`` or ``"smtp"``)."""
+    config = get_breaker_config()
+    return CircuitBreaker(name, config["failure_threshold"], config["reset_seconds"])
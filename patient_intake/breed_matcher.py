@@ -0,0 +1,100 @@
+"""Fuzzy matching of free-text breeds ("Breed (if not listed)") to catalogue IDs.
+
+Catalogue breed names are split into character trigrams once per catalogue load
+and kept as an L2-normalised trigram x breed matrix, so scoring a query is a sum
+of the handful of rows for the trigrams it contains (cosine similarity), well
+under a millisecond for a few hundred breeds. ``match_many`` gathers and sums the
+rows for a whole batch at once.
+"""
+
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from patient_intake.config import BREED_MATCH_THRESHOLD
+
+# Texts scored per pass in ``match_many``, to bound memory on big imports
+_BATCH_ROWS = 1024
+
+
+@dataclass(frozen=True)
+class BreedMatch:
+    """Best catalogue breed for a free-text breed."""
+
+    breed_id: int
+    name: str
+    score: float
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {_normalize(text)} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class BreedMatcher:
+    """Trigram cosine-similarity index over one catalogue's breed names."""
+
+    def __init__(self, breed_map: dict, threshold: float = BREED_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._names = list(breed_map)
+        self._ids = [breed_map[name] for name in self._names]
+        grams = [_trigrams(name) for name in self._names]
+        self._vocab = {gram: i for i, gram in enumerate(sorted(set().union(*grams)))}
+        # One row per trigram, one column per breed: a query's trigrams are contiguous rows
+        self._weights = np.zeros((len(self._vocab), len(self._names)), dtype=np.float32)
+        for column, name_grams in enumerate(grams):
+            rows = [self._vocab[gram] for gram in name_grams]
+            self._weights[rows, column] = 1 / np.sqrt(len(name_grams))
+
+    def _best(self, scores: np.ndarray) -> BreedMatch | None:
+        row = int(scores.argmax())
+        score = float(scores[row])
+        if score < self.threshold:
+            return None
+        return BreedMatch(self._ids[row], self._names[row], score)
+
+    def match(self, text: str) -> BreedMatch | None:
+        """
+        Resolve one free-text breed.
+
+        Returns:
+            The best match, or None if nothing scores at least ``threshold``
+        """
+        return self.match_many([text])[0]
+
+    def match_many(self, texts: list[str]) -> list[BreedMatch | None]:
+        """Resolve a batch of free-text breeds (e.g. a bulk import), one result per text."""
+        results: list[BreedMatch | None] = []
+        for start in range(0, len(texts), _BATCH_ROWS):
+            rows: list[int] = []
+            offsets, norms = [], []
+            for text in texts[start : start + _BATCH_ROWS]:
+                grams = _trigrams(text) if _normalize(text) else set()
+                known = [self._vocab[gram] for gram in grams if gram in self._vocab]
+                offsets.append(len(rows) if known else -1)
+                norms.append(np.sqrt(len(grams)))
+                rows.extend(known)
+            if not rows:
+                results.extend(None for _ in offsets)
+                continue
+            # Sum each query's trigram rows in one pass; queries with no known trigram
+            # are skipped in reduceat and answered with None
+            starts = [offset for offset in offsets if offset >= 0]
+            sums = iter(np.add.reduceat(self._weights[rows], starts, axis=0))
+            results.extend(
+                self._best(next(sums) / norm) if offset >= 0 else None
+                for offset, norm in zip(offsets, norms, strict=True)
+            )
+        return results
+
+
+@st.cache_resource(ttl=3600)
+def get_breed_matcher(breed_map: dict) -> BreedMatcher:
+    """Matcher for the current catalogue, built once per catalogue load."""
+    return BreedMatcher(breed_map)
@@ -0,0 +1,392 @@
+"""Record backend and SMTP traffic to a cassette file and replay it locally."""
+
+import argparse
+import json
+import logging
+import re
+import smtplib
+import socketserver
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+import requests
+
+from patient_intake.config import CASSETTE_RECORD_PATH
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+_PHONE = re.compile(r"\b\d{10}\b")
+_IPV4 = re.compile(r"\b\d{1,3}(\.\d{1,3}){3}\b")
+_SMTP_VERBS = {"HELO", "EHLO", "STARTTLS", "AUTH", "MAIL", "RCPT", "DATA", "RSET", "NOOP", "QUIT"}
+_DEFAULT_REPLIES = {
+    "CONNECT": (220, "cassette replay ESMTP"),
+    "EHLO": (250, "cassette replay\nAUTH PLAIN LOGIN"),
+    "AUTH": (235, "Authentication succeeded"),
+    "DATA": (354, "End data with <CR><LF>.<CR><LF>"),
+    "QUIT": (221, "Bye"),
+}
+
+
+def scrub(text: str) -> str:
+    """Mask email addresses, phone numbers and IP addresses."""
+    text = _EMAIL.sub("<email>", text)
+    text = _IPV4.sub("<ip>", text)
+    return _PHONE.sub("<phone>", text)
+
+
+class Cassette:
+    """A cassette file: one JSON line per HTTP exchange or SMTP session."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _append(self, entry: dict) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as out:
+            out.write(json.dumps(entry) + "\n")
+
+    def record_http(
+        self, method: str, url: str, response: requests.Response, elapsed: float
+    ) -> None:
+        """
+        Append one backend exchange and the latency the client saw.
+
+        Of the request only the method, path and size are kept (no body, headers or
+        service token); the response body is stored scrubbed (see ``scrub``).
+        """
+        self._append(
+            {
+                "kind": "http",
+                "method": method.upper(),
+                "path": urlsplit(url).path,
+                "request_bytes": len(response.request.body or b""),
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", ""),
+                "body": scrub(response.text),
+                "elapsed": round(elapsed, 6),
+            }
+        )
+
+    def record_smtp(self, exchanges: list[dict]) -> None:
+        """
+        Append one SMTP session, as recorded by ``RecordingSMTP``.
+
+        Only command verbs and server replies are kept; arguments, credentials and
+        message content never reach the file.
+        """
+        self._append({"kind": "smtp", "exchanges": exchanges})
+
+    def load(self) -> tuple[list[dict], list[list[dict]]]:
+        """
+        Read the cassette.
+
+        Returns:
+            (HTTP exchanges, SMTP sessions), each in recording order
+        """
+        http, smtp = [], []
+        with open(self.path, encoding="utf-8") as cassette:
+            for line in cassette:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["kind"] == "http":
+                    http.append(entry)
+                elif entry["kind"] == "smtp":
+                    smtp.append(entry["exchanges"])
+        return http, smtp
+
+
+@lru_cache(maxsize=1)
+def get_recorder() -> Cassette | None:
+    """
+    The cassette named by ``CASSETTE_RECORD_PATH``, or None when not recording.
+
+    While recording, ``api_client`` appends every backend request and
+    ``email_sender`` every SMTP session to it.
+    """
+    return Cassette(Path(CASSETTE_RECORD_PATH)) if CASSETTE_RECORD_PATH else None
+
+
+class RecordingSMTP(smtplib.SMTP):
+    """``smtplib.SMTP`` that records each reply's verb, code, text and latency."""
+
+    def __init__(self, *args, cassette: Cassette, **kwargs):
+        self._cassette = cassette
+        self._exchanges: list[dict] = []
+        self._command = "CONNECT"
+        self._started: float | None = time.perf_counter()
+        self._sent = 0
+        self._replied = 0.0
+        super().__init__(*args, **kwargs)
+
+    def connect(self, *args, **kwargs):
+        self._command, self._started = "CONNECT", time.perf_counter()
+        return super().connect(*args, **kwargs)
+
+    def putcmd(self, cmd, args=""):
+        # Anything that is not a verb is an AUTH continuation (a credential)
+        self._command = cmd.upper() if cmd.upper() in _SMTP_VERBS else "AUTH"
+        self._started = time.perf_counter()
+        super().putcmd(cmd, args)
+
+    def send(self, s):
+        # Once a reply is in, further sends without a command are the message body
+        if self._started is None:
+            self._started = time.perf_counter()
+        if self._command == ".":
+            self._sent += len(s)
+        super().send(s)
+
+    def getreply(self):
+        code, text = super().getreply()
+        exchange = {
+            "command": self._command,
+            "code": code,
+            "text": scrub(text.decode("utf-8", "replace")),
+            "elapsed": round(time.perf_counter() - (self._started or time.perf_counter()), 6),
+        }
+        if self._command == ".":
+            exchange["bytes"] = self._sent
+        self._exchanges.append(exchange)
+        self._command, self._started, self._sent = ".", None, 0
+        self._replied = time.perf_counter()
+        return code, text
+
+    def starttls(self, *args, **kwargs):
+        result = super().starttls(*args, **kwargs)
+        # Count the TLS handshake (everything since the reply) as part of the STARTTLS round trip
+        if self._exchanges and self._exchanges[-1]["command"] == "STARTTLS":
+            handshake = time.perf_counter() - self._replied
+            self._exchanges[-1]["elapsed"] = round(self._exchanges[-1]["elapsed"] + handshake, 6)
+        return result
+
+    def close(self):
+        super().close()
+        if self._exchanges:
+            self._cassette.record_smtp(self._exchanges)
+            self._exchanges = []
+
+
+def _plain(exchanges: list[dict]) -> list[dict]:
+    """
+    A recorded SMTP session as replayed without TLS.
+
+    The EHLO before STARTTLS and STARTTLS itself are folded into the EHLO after
+    it, which keeps the combined delay and drops STARTTLS from the capabilities.
+    """
+    replayed: list[dict] = []
+    carried = 0.0
+    for exchange in exchanges:
+        if exchange["command"] == "STARTTLS":
+            if replayed and replayed[-1]["command"] == "EHLO":
+                carried += replayed.pop()["elapsed"]
+            carried += exchange["elapsed"]
+            continue
+        if exchange["command"] == "EHLO" and carried:
+            lines = [line for line in exchange["text"].split("\n") if line.upper() != "STARTTLS"]
+            exchange = {**exchange, "text": "\n".join(lines)}
+            exchange["elapsed"] += carried
+            carried = 0.0
+        replayed.append(exchange)
+    return replayed
+
+
+class ReplayServer:
+    """Local HTTP and SMTP servers answering from a cassette with the recorded timing."""
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        host: str = "127.0.0.1",
+        http_port: int = 0,
+        smtp_port: int = 0,
+        speed: float = 1.0,
+    ):
+        http, smtp = cassette.load()
+        self.speed = speed
+        self._http: dict[tuple[str, str], list[dict]] = {}
+        for exchange in http:
+            self._http.setdefault((exchange["method"], exchange["path"]), []).append(exchange)
+        self._smtp = [_plain(exchanges) for exchanges in smtp]
+        self._turns: dict[object, int] = {}
+        self._lock = threading.Lock()
+
+        self.host = host
+        self.http_server = _ReplayHTTPServer((host, http_port), _ReplayHTTPHandler)
+        self.smtp_server = _ReplaySMTPServer((host, smtp_port), _ReplaySMTPHandler)
+        self.http_server.replay = self.smtp_server.replay = self
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.http_server.server_port}"
+
+    @property
+    def smtp_port(self) -> int:
+        return self.smtp_server.server_address[1]
+
+    def _next(self, key, recordings: list[_T]) -> _T | None:
+        if not recordings:
+            return None
+        with self._lock:
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+        return recordings[turn % len(recordings)]
+
+    def next_http(self, method: str, path: str) -> dict | None:
+        """The next recorded exchange for ``method`` and ``path``, cycling; None if never seen."""
+        return self._next((method, path), self._http.get((method, path), []))
+
+    def next_smtp(self) -> list[dict]:
+        """The next recorded SMTP session, cycling; empty if none were recorded."""
+        return self._next("smtp", self._smtp) or []
+
+    def delay(self, exchange: dict | None, since: float) -> None:
+        """Sleep out what is left of an exchange's recorded latency."""
+        if exchange:
+            time.sleep(max(0.0, exchange["elapsed"] / self.speed - (time.monotonic() - since)))
+
+    def start(self) -> "ReplayServer":
+        """Serve HTTP and SMTP on daemon threads."""
+        for name, server in (("replay-http", self.http_server), ("replay-smtp", self.smtp_server)):
+            threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+        return self
+
+    def shutdown(self) -> None:
+        for server in (self.http_server, self.smtp_server):
+            server.shutdown()
+            server.server_close()
+
+
+class _ReplayHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    replay: ReplayServer
+
+
+class _ReplaySMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    replay: ReplayServer
+
+
+class _ReplayHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _ReplayHTTPServer
+
+    def _replay(self) -> None:
+        received = time.monotonic()
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        replay = self.server.replay
+        exchange = replay.next_http(self.command, urlsplit(self.path).path)
+        if exchange is None:
+            status, content_type = 404, "application/json"
+            body = json.dumps({"error": f"{self.command} {self.path} is not on the cassette"})
+        else:
+            status, content_type, body = (
+                exchange["status"],
+                exchange["content_type"],
+                exchange["body"],
+            )
+        replay.delay(exchange, received)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_HEAD = _replay
+
+    def log_message(self, format, *args) -> None:
+        logger.debug("replay http: " + format, *args)
+
+
+class _ReplaySMTPHandler(socketserver.StreamRequestHandler):
+    server: _ReplaySMTPServer
+
+    def handle(self) -> None:
+        replay = self.server.replay
+        replies: dict[str, deque] = {}
+        for exchange in replay.next_smtp():
+            replies.setdefault(exchange["command"], deque()).append(exchange)
+
+        self._reply(replies, "CONNECT", time.monotonic())
+        while line := self.rfile.readline():
+            received = time.monotonic()
+            verb = line.split(b" ", 1)[0].strip().decode("ascii", "replace").upper()
+            if verb not in _SMTP_VERBS:
+                verb = "AUTH"
+            code = self._reply(replies, verb, received)
+            if verb == "DATA" and code == 354:
+                body_started = None
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    body_started = body_started or time.monotonic()
+                self._reply(replies, ".", body_started or time.monotonic())
+            if verb == "QUIT":
+                return
+
+    def _reply(self, replies: dict[str, deque], verb: str, since: float) -> int:
+        queue = replies.get(verb)
+        exchange = queue.popleft() if queue else None
+        code, text = (
+            (exchange["code"], exchange["text"])
+            if exchange
+            else _DEFAULT_REPLIES.get(verb, (250, "OK"))
+        )
+        self.server.replay.delay(exchange, since)
+        lines = text.split("\n")
+        for line in lines[:-1]:
+            self.wfile.write(f"{code}-{line}\r\n".encode())
+        self.wfile.write(f"{code} {lines[-1]}\r\n".encode())
+        return code
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command-line replay of a cassette, e.g. for benchmarks without the real backend.
+
+    Replay speaks plain SMTP, so point the app at it with ``SMTP_STARTTLS=false``.
+
+    Usage:
+        CASSETTE_RECORD_PATH=backend.cassette streamlit run patient_intake/app.py
+        python -m patient_intake.cassette replay backend.cassette --smtp-port 2525
+    """
+    parser = argparse.ArgumentParser(description="Replay a recorded backend/SMTP cassette.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="serve a cassette over local HTTP and SMTP")
+    replay.add_argument("cassette", type=Path)
+    replay.add_argument("--host", default="127.0.0.1")
+    replay.add_argument("--http-port", type=int, default=8600)
+    replay.add_argument("--smtp-port", type=int, default=2525)
+    replay.add_argument(
+        "--speed", type=float, default=1.0, help="divide recorded delays by this factor"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = ReplayServer(
+        Cassette(args.cassette), args.host, args.http_port, args.smtp_port, args.speed
+    ).start()
+    paths = sorted({path for _, path in server._http})
+    logger.info("Replaying %s", args.cassette)
+    for path in paths:
+        logger.info("  HTTP  %s%s", server.http_url, path)
+    logger.info(
+        "  SMTP  SMTP_SERVER=%s SMTP_PORT=%d SMTP_STARTTLS=false", args.host, server.smtp_port
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Environment variables take precedence.
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 import streamlit as st
@@ -21,16 +22,121 @@ def _get_config(env_key: str, secrets_section: str, secrets_key: str) -> str:
         raise ValueError(f"Missing config: set {env_key} env var or {secrets_section}.{secrets_key} in secrets.toml")
 
 
+def _get_optional_config(env_key: str, secrets_section: str, secrets_key: str, default):
+    """Get optional config from environment variable or Streamlit secrets, else a default."""
+    value = os.environ.get(env_key)
+    if value:
+        return value
+    try:
+        return st.secrets[secrets_section][secrets_key]
+    except (KeyError, FileNotFoundError):
+        return default
+
+
+def _as_bool(value) -> bool:
+    """Interpret an env/secrets value as a boolean flag."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
 # === API CONFIGURATION ===
 SERVICE_TOKEN = _get_config("SERVICE_TOKEN", "api", "service_token")
 CATALOGUE_URL = _get_config("CATALOGUE_URL", "url", "catalogue_url")
 PATIENT_ADD_URL = _get_config("PATIENT_ADD_URL", "url", "patient_add_url")
+# Upgrade SMTP sessions with STARTTLS; turn off only for a local relay or cassette replay
+SMTP_STARTTLS = _as_bool(_get_optional_config("SMTP_STARTTLS", "email", "starttls", True))
 
 # === PATHS ===
 PACKAGE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = PACKAGE_DIR.parent
 TEMPLATES_DIR = PROJECT_ROOT / "templates"
 PDF_TEMPLATE_PATH = TEMPLATES_DIR / "intake_form_template.pdf"
+HISTORY_FORM_TEMPLATE_PATH = TEMPLATES_DIR / "history_form_template.pdf"
+LEGACY_DATA_PATH = PROJECT_ROOT / "files" / "data.json"
+INTAKE_DB_PATH = Path(
+    _get_optional_config(
+        "INTAKE_DB_PATH", "storage", "db_path", PROJECT_ROOT / "data" / "intakes.db"
+    )
+)
+ARCHIVE_DIR = Path(_get_optional_config("ARCHIVE_DIR", "archive", "dir", PROJECT_ROOT / "archive"))
+# Host-wide catalogue/template snapshot shared by all server and render processes (see snapshot)
+SNAPSHOT_ENABLED = _as_bool(_get_optional_config("SNAPSHOT_ENABLED", "snapshot", "enabled", True))
+SNAPSHOT_DIR = Path(
+    _get_optional_config(
+        "SNAPSHOT_DIR",
+        "snapshot",
+        "dir",
+        Path("/dev/shm" if Path("/dev/shm").is_dir() else tempfile.gettempdir()) / "patient-intake",
+    )
+)
+# Cassette file that backend and SMTP traffic is recorded to; empty disables recording
+CASSETTE_RECORD_PATH = str(
+    _get_optional_config("CASSETTE_RECORD_PATH", "cassette", "record_path", "")
+)
+
+# === TEMPLATES ===
+# Seconds between checks of a template file for changes (hot reload)
+TEMPLATE_RELOAD_SECONDS = float(
+    _get_optional_config("TEMPLATE_RELOAD_SECONDS", "templates", "reload_seconds", 5)
+)
+# Forms rendered for every pet in a visit, in order (see template_registry)
+VISIT_FORMS = [
+    form.strip()
+    for form in str(
+        _get_optional_config("VISIT_FORMS", "templates", "visit_forms", "intake")
+    ).split(",")
+    if form.strip()
+]
+
+# === CATALOGUE ===
+# Minimum trigram similarity (0-1) for resolving a free-text breed to a catalogue breed
+BREED_MATCH_THRESHOLD = float(
+    _get_optional_config("BREED_MATCH_THRESHOLD", "catalogue", "breed_match_threshold", 0.6)
+)
+
+# === PREVIEW ===
+# Resolution of the pre-submit form preview, and how many rendered previews to keep
+PREVIEW_DPI = int(_get_optional_config("PREVIEW_DPI", "preview", "dpi", 50))
+PREVIEW_CACHE_SIZE = int(_get_optional_config("PREVIEW_CACHE_SIZE", "preview", "cache_size", 256))
+
+# === SERVER ===
+HEALTH_PORT = int(_get_optional_config("HEALTH_PORT", "server", "health_port", 8502))
+# Upper bound, in seconds, on one submission: backend POSTs, PDF render and email
+SUBMIT_DEADLINE_SECONDS = float(
+    _get_optional_config("SUBMIT_DEADLINE_SECONDS", "server", "submit_deadline_seconds", 30)
+)
+# Seconds without a script run before a session is idle; 0 disables the reaper
+SESSION_IDLE_SECONDS = float(
+    _get_optional_config("SESSION_IDLE_SECONDS", "server", "session_idle_seconds", 1800)
+)
+# How often sessions are measured and idle ones reaped
+SESSION_REAP_INTERVAL_SECONDS = float(
+    _get_optional_config(
+        "SESSION_REAP_INTERVAL_SECONDS", "server", "session_reap_interval_seconds", 60
+    )
+)
+# Session state buffers at least this large are dropped from idle sessions
+SESSION_BUFFER_BYTES = int(
+    _get_optional_config("SESSION_BUFFER_BYTES", "server", "session_buffer_bytes", 262144)
+)
+
+# === LOGGING ===
+# Fraction (0-1) of submissions whose trace events are logged; warnings and errors always are
+TRACE_SAMPLE_RATE = float(_get_optional_config("TRACE_SAMPLE_RATE", "logging", "sample_rate", 1.0))
+# Trace events buffered for the log writer thread before new ones are dropped
+TRACE_QUEUE_SIZE = int(_get_optional_config("TRACE_QUEUE_SIZE", "logging", "queue_size", 10000))
+
+# === PROFILING ===
+# Time each rerun of the page script and its blocks (see profiler); off in production
+RERUN_PROFILE_ENABLED = _as_bool(
+    _get_optional_config("RERUN_PROFILE_ENABLED", "profiling", "enabled", False)
+)
+RERUN_PROFILE_PATH = Path(
+    _get_optional_config(
+        "RERUN_PROFILE_PATH", "profiling", "report_path", PROJECT_ROOT / "rerun-profile.json"
+    )
+)
 
 
 def get_email_config() -> dict:
@@ -53,3 +159,105 @@ def get_email_config() -> dict:
         return dict(st.secrets["email"])
     except (KeyError, FileNotFoundError):
         raise ValueError("Missing email config: set SMTP_* env vars or email section in secrets.toml")
+
+
+def get_digest_config() -> dict:
+    """Get digest-mode email configuration from environment or Streamlit secrets.
+
+    Digest mode is off unless DIGEST_ENABLED is set; intakes are then batched and
+    flushed every ``interval_seconds`` or once ``max_intakes`` are queued.
+    """
+    return {
+        "enabled": _as_bool(_get_optional_config("DIGEST_ENABLED", "digest", "enabled", False)),
+        "interval_seconds": float(
+            _get_optional_config("DIGEST_INTERVAL_SECONDS", "digest", "interval_seconds", 900)
+        ),
+        "max_intakes": int(_get_optional_config("DIGEST_MAX_INTAKES", "digest", "max_intakes", 20)),
+        "max_queued": int(_get_optional_config("DIGEST_MAX_QUEUED", "digest", "max_queued", 200)),
+        "merge_pdfs": _as_bool(
+            _get_optional_config("DIGEST_MERGE_PDFS", "digest", "merge_pdfs", False)
+        ),
+    }
+
+
+def get_rate_limit_config() -> dict:
+    """Get Submit admission-control limits from environment or Streamlit secrets.
+
+    Each client gets ``client_burst`` submissions, refilled at ``client_per_minute``;
+    the whole process gets ``process_burst`` refilled at ``process_per_minute``, and
+    at most ``max_in_flight`` submissions are processed at once.
+    """
+    return {
+        "client_per_minute": float(
+            _get_optional_config(
+                "RATE_LIMIT_CLIENT_PER_MINUTE", "rate_limit", "client_per_minute", 2
+            )
+        ),
+        "client_burst": int(
+            _get_optional_config("RATE_LIMIT_CLIENT_BURST", "rate_limit", "client_burst", 3)
+        ),
+        "process_per_minute": float(
+            _get_optional_config(
+                "RATE_LIMIT_PROCESS_PER_MINUTE", "rate_limit", "process_per_minute", 60
+            )
+        ),
+        "process_burst": int(
+            _get_optional_config("RATE_LIMIT_PROCESS_BURST", "rate_limit", "process_burst", 20)
+        ),
+        "max_in_flight": int(
+            _get_optional_config("MAX_IN_FLIGHT_SUBMITS", "rate_limit", "max_in_flight", 8)
+        ),
+    }
+
+
+def get_lookup_limit_config() -> dict:
+    """Get the returning-client lookup limit from environment or Streamlit secrets.
+
+    Each client gets ``burst`` lookups, refilled at ``per_hour``.
+    """
+    return {
+        "per_hour": float(
+            _get_optional_config("LOOKUP_LIMIT_PER_HOUR", "rate_limit", "lookups_per_hour", 20)
+        ),
+        "burst": int(_get_optional_config("LOOKUP_LIMIT_BURST", "rate_limit", "lookup_burst", 5)),
+    }
+
+
+def get_backend_limit_config() -> dict:
+    """Get the adaptive backend concurrency limit settings from environment or secrets.
+
+    Concurrent patient POSTs start at ``initial_limit`` and stay between ``min_limit``
+    and ``max_limit``; the limit is multiplied by ``backoff`` on overload, including
+    recent latency above ``latency_tolerance`` times the baseline.
+    """
+    return {
+        "initial_limit": int(
+            _get_optional_config("BACKEND_LIMIT_INITIAL", "backend_limit", "initial", 4)
+        ),
+        "min_limit": int(_get_optional_config("BACKEND_LIMIT_MIN", "backend_limit", "min", 1)),
+        "max_limit": int(_get_optional_config("BACKEND_LIMIT_MAX", "backend_limit", "max", 32)),
+        "backoff": float(
+            _get_optional_config("BACKEND_LIMIT_BACKOFF", "backend_limit", "backoff", 0.5)
+        ),
+        "latency_tolerance": float(
+            _get_optional_config(
+                "BACKEND_LIMIT_LATENCY_TOLERANCE", "backend_limit", "latency_tolerance", 2.0
+            )
+        ),
+    }
+
+
+def get_breaker_config() -> dict:
+    """Get circuit-breaker settings for the backend and SMTP from environment or secrets.
+
+    A breaker opens after ``failure_threshold`` consecutive failures and lets one probe
+    through after ``reset_seconds``.
+    """
+    return {
+        "failure_threshold": int(
+            _get_optional_config("BREAKER_FAILURE_THRESHOLD", "breaker", "failure_threshold", 5)
+        ),
+        "reset_seconds": float(
+            _get_optional_config("BREAKER_RESET_SECONDS", "breaker", "reset_seconds", 30)
+        ),
+    }
@@ -0,0 +1,58 @@
+"""Per-submission deadline shared by the POST, render and SMTP stages.
+
+``_handle_submit`` starts one ``Deadline`` for the whole submission and hands it
+down; every stage sizes its own timeouts from what is left, so a submission can
+never take much longer than ``SUBMIT_DEADLINE_SECONDS`` however slow the backend,
+renderer or mail server is.
+"""
+
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class DeadlineExceeded(TimeoutError):
+    """The submission ran out of time in ``stage``."""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"{stage} did not finish within the {budget:g}s submission deadline")
+        self.stage = stage
+
+
+class Deadline:
+    """A fixed point in time, ``seconds`` from creation."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.budget = seconds
+        self._clock = clock
+        self._expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)."""
+        return max(0.0, self._expires_at - self._clock())
+
+    def timeout(self, stage: str, cap: float | None = None) -> float:
+        """
+        Timeout for the next blocking call: the remaining budget, at most ``cap``.
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(stage, self.budget)
+        return remaining if cap is None else min(remaining, cap)
+
+    def result(self, future: Future, stage: str):
+        """
+        Wait for ``future`` within the remaining budget.
+
+        Raises:
+            DeadlineExceeded: If it is not done in time (the future is cancelled if possible)
+        """
+        try:
+            return future.result(timeout=self.timeout(stage))
+        except FutureTimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(stage, self.budget) from None
@@ -0,0 +1,245 @@
+"""Digest mode: batch completed intakes into periodic summary emails.
+
+Instead of one email (and one SMTP connect/TLS/login) per intake, completed intakes
+are queued in-process and flushed as a single message when either the configured
+count is reached or the flush interval elapses. Urgent intakes bypass the queue.
+
+Sends always happen on the queue's timer thread, never on a visitor's request.
+A failed digest is put back in the queue, which holds at most ``max_queued``
+intakes: during a long SMTP outage further visits are refused (the caller reports
+the email as failed; the visit is still archived and can be resent).
+"""
+
+import atexit
+import logging
+import threading
+from collections.abc import Callable
+from datetime import datetime
+
+import streamlit as st
+
+from patient_intake.breaker import OPEN, get_breaker
+from patient_intake.config import get_digest_config
+from patient_intake.deadline import Deadline
+from patient_intake.email_sender import (
+    format_digest_table,
+    format_visit_email_body,
+    label_from_id,
+    send_digest_email,
+    send_visit_email_with_pdf,
+)
+from patient_intake.pdf_generator import merge_pdfs_async
+
+logger = logging.getLogger(__name__)
+
+
+def build_digest_entry(
+    pdf_bytes: bytes,
+    filename: str,
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+) -> dict:
+    """Capture everything a digest needs from one visit, detached from the session."""
+    received = datetime.now().strftime("%Y-%m-%d %H:%M")
+    rows = [
+        {
+            "received": received,
+            "owner": f"{payload.get('patient_owner_firstname', '')} "
+            f"{payload.get('patient_owner_lastname', '')}".strip(),
+            "patient_name": payload.get("patient_name", ""),
+            "species": label_from_id(species_map, payload.get("patient_species")),
+            "breed": label_from_id(breed_map, payload.get("patient_breed"))
+            or extra_fields.get("breed_not_listed", ""),
+            "phone": payload.get("phone", ""),
+        }
+        for payload, extra_fields in zip(payloads, extra_fields_list, strict=True)
+    ]
+    return {
+        "filename": filename,
+        "pdf_bytes": pdf_bytes,
+        "body": format_visit_email_body(
+            payloads, extra_fields_list, species_map, breed_map, sex_map
+        ),
+        "rows": rows,
+    }
+
+
+def send_digest(entries: list[dict], merge: bool = False) -> None:
+    """
+    Send one digest email for the given entries.
+
+    Args:
+        entries: Entries built by ``build_digest_entry``
+        merge: Attach a single merged PDF instead of one PDF per intake
+    """
+    sections = [format_digest_table([row for entry in entries for row in entry["rows"]])]
+    sections.extend(entry["body"] for entry in entries)
+    body = ("\n\n" + "=" * 40 + "\n\n").join(sections)
+
+    if merge:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M")
+        # PyMuPDF only runs on the render thread
+        merged = merge_pdfs_async([entry["pdf_bytes"] for entry in entries]).result()
+        attachments = [(f"intake_digest_{stamp}.pdf", merged.getvalue())]
+    else:
+        attachments = [(entry["filename"], entry["pdf_bytes"]) for entry in entries]
+
+    send_digest_email(body, attachments, sum(len(entry["rows"]) for entry in entries))
+
+
+class DigestQueue:
+    """Thread-safe, bounded queue of intakes flushed by count or on a timer."""
+
+    def __init__(
+        self,
+        max_intakes: int,
+        interval_seconds: float,
+        merge_pdfs: bool = False,
+        send: Callable[[list[dict], bool], None] = send_digest,
+        max_queued: int = 200,
+    ):
+        self.max_intakes = max(1, max_intakes)
+        self.interval_seconds = interval_seconds
+        self.merge_pdfs = merge_pdfs
+        self.max_queued = max(self.max_intakes, max_queued)
+        self._send = send
+        self._entries: list[dict] = []
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._full = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _count(self) -> int:
+        return sum(len(entry["rows"]) for entry in self._entries)
+
+    def __len__(self) -> int:
+        """Number of queued intakes (pets), not visits."""
+        with self._lock:
+            return self._count()
+
+    def add(self, entry: dict) -> bool:
+        """
+        Queue an entry; once the intake threshold is reached the timer thread flushes early.
+
+        Returns:
+            False if the queue is already holding ``max_queued`` intakes (nothing queued)
+        """
+        with self._lock:
+            if self._count() + len(entry["rows"]) > self.max_queued:
+                return False
+            self._entries.append(entry)
+            full = self._count() >= self.max_intakes
+        if full:
+            self._full.set()
+        return True
+
+    def flush(self) -> int:
+        """
+        Send everything queued so far as one digest.
+
+        Returns:
+            Number of visits sent (0 if the queue was empty or the send failed).
+        """
+        with self._send_lock:
+            with self._lock:
+                batch, self._entries = self._entries, []
+            if not batch:
+                return 0
+            try:
+                self._send(batch, self.merge_pdfs)
+            except Exception:
+                logger.exception("Digest send failed; re-queueing %d visits", len(batch))
+                with self._lock:
+                    self._entries[:0] = batch
+                return 0
+            return len(batch)
+
+    def start(self) -> None:
+        """Start the background flush timer (idempotent)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="intake-digest", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the timer and flush whatever is still queued."""
+        self._stopped.set()
+        self._full.set()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            early = self._full.wait(self.interval_seconds)
+            self._full.clear()
+            if self._stopped.is_set():
+                return
+            if not self.flush() and early:
+                # Still failing: wait out the interval rather than retry on every add
+                self._stopped.wait(self.interval_seconds)
+
+
+@st.cache_resource
+def get_digest_queue() -> DigestQueue:
+    """Process-wide digest queue shared by all sessions."""
+    config = get_digest_config()
+    queue = DigestQueue(
+        max_intakes=config["max_intakes"],
+        interval_seconds=config["interval_seconds"],
+        merge_pdfs=config["merge_pdfs"],
+        max_queued=config["max_queued"],
+    )
+    queue.start()
+    atexit.register(queue.stop)
+    return queue
+
+
+def dispatch_visit_email(
+    pdf_bytes: bytes,
+    filename: str,
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    urgent: bool = False,
+    deadline: Deadline | None = None,
+) -> bool:
+    """
+    Queue the visit for the next digest, or send it right away.
+
+    Visits are sent immediately when digest mode is off or the visit is urgent. While
+    the SMTP circuit breaker is open they are held in the digest queue instead, which
+    retries on its timer until the server is back. ``deadline`` bounds an immediate
+    send; queued visits are sent later, outside the submission.
+
+    Returns:
+        bool: True if the visit was queued or sent, False if an immediate send failed
+        or the digest queue is full.
+    """
+    if urgent or not get_digest_config()["enabled"]:
+        if get_breaker("smtp").state != OPEN:
+            return send_visit_email_with_pdf(
+                pdf_bytes=pdf_bytes,
+                filename=filename,
+                payloads=payloads,
+                extra_fields_list=extra_fields_list,
+                species_map=species_map,
+                breed_map=breed_map,
+                sex_map=sex_map,
+                deadline=deadline,
+            )
+        logger.warning("SMTP circuit open; holding %s in the digest queue", filename)
+
+    queued = get_digest_queue().add(
+        build_digest_entry(
+            pdf_bytes, filename, payloads, extra_fields_list, species_map, breed_map, sex_map
+        )
+    )
+    if not queued:
+        logger.error("Digest queue full; %s was not emailed (it is archived)", filename)
+        st.error("Email is unavailable right now and its queue is full.")
+    return queued
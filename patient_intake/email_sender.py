@@ -1,11 +1,32 @@
 """Email sending functionality for patient intake forms."""
 
+import base64
+import io
+import logging
+import re
 import smtplib
+import time
+import uuid
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from email.generator import BytesGenerator
 from email.message import EmailMessage
+from email.utils import getaddresses, parseaddr
+from functools import partial
 
 import streamlit as st
 
-from patient_intake.config import get_email_config
+from patient_intake.breaker import get_breaker
+from patient_intake.cassette import RecordingSMTP, get_recorder
+from patient_intake.config import SMTP_STARTTLS, get_email_config
+from patient_intake.deadline import Deadline, DeadlineExceeded
+from patient_intake.tracing import correlation_id, event
+
+# 57 raw bytes encode to one 76-character base64 line (RFC 2045); stream 256 lines at a time
+_BASE64_CHUNK = 57 * 256
+_LEADING_DOT = re.compile(rb"(?m)^\.")
+# Seconds to wait on the SMTP server for any one connect/read before giving up
+SMTP_TIMEOUT = 20
 
 
 def label_from_id(mapping: dict, _id, default: str = "") -> str:
@@ -14,14 +35,8 @@ def label_from_id(mapping: dict, _id, default: str = "") -> str:
     return inv.get(_id, default)
 
 
-def format_email_body(
-    payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict
-) -> str:
-    """Format the email body with form data."""
-    species_label = label_from_id(species_map, payload.get("patient_species"))
-    breed_label = label_from_id(breed_map, payload.get("patient_breed"))
-    sex_label = label_from_id(sex_map, payload.get("patient_sex"))
-
+def _owner_lines(payload: dict, extra_fields: dict) -> list[str]:
+    """Owner section of the email body."""
     lines = []
     lines.append("**Owner Information**")
     lines.append(
@@ -48,8 +63,24 @@ def format_email_body(
         f"{extra_fields.get('owner_day')}/{extra_fields.get('owner_year')}"
     )
     lines.append(f"Previous Client: {extra_fields.get('prev_visit')}")
+    return lines
+
+
+def _patient_lines(
+    payload: dict,
+    extra_fields: dict,
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    heading: str = "Patient Information",
+) -> list[str]:
+    """Patient and referring-vet sections of the email body."""
+    species_label = label_from_id(species_map, payload.get("patient_species"))
+    breed_label = label_from_id(breed_map, payload.get("patient_breed"))
+    sex_label = label_from_id(sex_map, payload.get("patient_sex"))
 
-    lines.append("\n**Patient Information**")
+    lines = []
+    lines.append(f"\n**{heading}**")
     lines.append(f"Pet Name: {payload['patient_name']}")
     lines.append(f"Species: {species_label}")
     lines.append(f"Breed: {breed_label}")
@@ -65,11 +96,260 @@ def format_email_body(
     lines.append("\n**Referring Veterinarian**")
     lines.append(f"Doctor: {extra_fields.get('doctor', '')}")
     lines.append(f"Clinic: {extra_fields.get('clinic_name', '')}")
+    return lines
+
+
+def format_email_body(
+    payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict
+) -> str:
+    """Format the email body with form data."""
+    lines = _owner_lines(payload, extra_fields)
+    lines.extend(_patient_lines(payload, extra_fields, species_map, breed_map, sex_map))
+    return "\n".join(lines)
+
+
+def format_visit_email_body(
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+) -> str:
+    """Format one email body for a visit: owner section once, then each pet."""
+    if len(payloads) == 1:
+        return format_email_body(
+            payloads[0], extra_fields_list[0], species_map, breed_map, sex_map
+        )
+
+    lines = _owner_lines(payloads[0], extra_fields_list[0])
+    pets = zip(payloads, extra_fields_list, strict=True)
+    for number, (payload, extra_fields) in enumerate(pets, 1):
+        lines.extend(
+            _patient_lines(
+                payload,
+                extra_fields,
+                species_map,
+                breed_map,
+                sex_map,
+                heading=f"Patient {number} Information",
+            )
+        )
     return "\n".join(lines)
 
 
+def visit_filename(payloads: list[dict]) -> str:
+    """Attachment name for a visit's merged PDF."""
+    if len(payloads) == 1:
+        return f"{payloads[0]['patient_name']}_intake_form.pdf"
+    owner = payloads[0]["patient_owner_lastname"] or payloads[0]["patient_owner_firstname"]
+    return f"{owner}_{len(payloads)}_pets_intake_form.pdf"
+
+
+def format_digest_table(rows: list[dict]) -> str:
+    """Format a fixed-width summary table with one line per queued intake."""
+    columns = [
+        ("Received", "received"),
+        ("Owner", "owner"),
+        ("Pet", "patient_name"),
+        ("Species", "species"),
+        ("Breed", "breed"),
+        ("Phone", "phone"),
+    ]
+    widths = [
+        max([len(title)] + [len(str(row.get(key, ""))) for row in rows]) for title, key in columns
+    ]
+    layout = list(zip(columns, widths, strict=True))
+    lines = [
+        "  ".join(title.ljust(width) for (title, _), width in layout),
+        "  ".join("-" * width for width in widths),
+    ]
+    for row in rows:
+        lines.append(
+            "  ".join(str(row.get(key, "")).ljust(width) for (_, key), width in layout).rstrip()
+        )
+    return "\n".join(lines)
+
+
+def _apply_deadline(server: smtplib.SMTP, deadline: Deadline | None) -> None:
+    """Cap the socket timeout for the next SMTP exchange at the time left."""
+    if deadline is not None and server.sock is not None:
+        server.sock.settimeout(deadline.timeout("Email send", SMTP_TIMEOUT))
+
+
+@contextmanager
+def _smtp_session(email_config: dict, deadline: Deadline | None = None) -> Iterator[smtplib.SMTP]:
+    """
+    Open one authenticated SMTP session (connect, STARTTLS unless disabled, login).
+
+    Runs through the SMTP circuit breaker: any error during the session counts as a
+    failure, and while the breaker is open no connection is attempted. Running out
+    of submission time is not the server's fault: it frees the breaker's probe slot
+    without counting as a failure. When
+    recording is on, the session is appended to the cassette (see ``cassette``).
+
+    Args:
+        email_config: SMTP settings from ``get_email_config``
+        deadline: Submission deadline; each socket operation waits at most the time left
+
+    Raises:
+        CircuitOpenError: If the SMTP breaker is open
+        DeadlineExceeded: If the deadline passes before the session is set up
+    """
+    timeout = deadline.timeout("Email send", SMTP_TIMEOUT) if deadline else SMTP_TIMEOUT
+    breaker = get_breaker("smtp")
+    breaker.before_call()
+    recorder = get_recorder()
+    smtp = partial(RecordingSMTP, cassette=recorder) if recorder else smtplib.SMTP
+    try:
+        with smtp(
+            email_config["smtp_server"], email_config["smtp_port"], timeout=timeout
+        ) as server:
+            _apply_deadline(server, deadline)
+            if SMTP_STARTTLS:
+                server.starttls()
+                _apply_deadline(server, deadline)
+            server.login(email_config["sender_email"], email_config["sender_password"])
+            yield server
+    except DeadlineExceeded:
+        breaker.release()
+        raise
+    except TimeoutError:
+        # A socket timeout cut short by the deadline says nothing about the server
+        if deadline is not None and deadline.remaining() <= 0:
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+
+
+def _attach_pdf_placeholder(msg: EmailMessage, filename: str) -> str:
+    """
+    Attach an empty application/pdf part and return the token standing in for its body.
+
+    The real PDF is base64-encoded straight onto the socket by ``_send_streaming``,
+    so the message never holds an encoded copy of it.
+    """
+    token = f"pdf-attachment-{uuid.uuid4().hex}"
+    part = EmailMessage(policy=msg.policy)
+    part["Content-Type"] = "application/pdf"
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    part.set_payload(token)
+    if msg.get_content_type() != "multipart/mixed":
+        msg.make_mixed()
+    msg.attach(part)
+    return token
+
+
+def _send_base64(
+    server: smtplib.SMTP, data: bytes | memoryview, deadline: Deadline | None = None
+) -> None:
+    """Write ``data`` as CRLF-separated base64 lines, one small chunk at a time."""
+    view = memoryview(data)
+    for offset in range(0, len(view), _BASE64_CHUNK):
+        _apply_deadline(server, deadline)
+        encoded = base64.encodebytes(view[offset : offset + _BASE64_CHUNK])
+        encoded = encoded.replace(b"\n", b"\r\n")
+        if offset + _BASE64_CHUNK >= len(view):
+            encoded = encoded.rstrip(b"\r\n")
+        server.send(encoded)
+
+
+def _send_streaming(
+    server: smtplib.SMTP,
+    msg: EmailMessage,
+    attachments: Mapping[str, bytes | memoryview],
+    deadline: Deadline | None = None,
+) -> None:
+    """
+    Send ``msg`` over an open session, streaming each placeholder's PDF into DATA.
+
+    Equivalent to ``server.send_message(msg)`` but without flattening, dot-quoting
+    and concatenating full copies of the attachments in memory.
+
+    Args:
+        server: Authenticated SMTP session
+        msg: Message whose attachments were added with ``_attach_pdf_placeholder``
+        attachments: Placeholder token -> raw PDF bytes
+        deadline: Submission deadline, re-applied to the socket before each stage
+    """
+    buffer = io.BytesIO()
+    BytesGenerator(buffer, policy=msg.policy.clone(linesep="\r\n")).flatten(msg)
+    # Only headers, text body and tokens here; base64 lines never start with "."
+    flat = _LEADING_DOT.sub(b"..", buffer.getvalue())
+
+    sender = parseaddr(msg["From"])[1]
+    recipients = [address for _, address in getaddresses(msg.get_all("To", []))]
+    _apply_deadline(server, deadline)
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(sender)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+    for recipient in recipients:
+        code, resp = server.rcpt(recipient)
+        if code not in (250, 251):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused({recipient: (code, resp)})
+    code, resp = server.docmd("data")
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+
+    position = 0
+    for token, data in attachments.items():
+        start = flat.index(token.encode("ascii"), position)
+        _apply_deadline(server, deadline)
+        server.send(flat[position:start])
+        _send_base64(server, data, deadline)
+        position = start + len(token)
+    _apply_deadline(server, deadline)
+    server.send(flat[position:])
+    server.send(b".\r\n" if flat.endswith(b"\r\n") else b"\r\n.\r\n")
+    code, resp = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+
+def _send_intake_email(
+    subject: str,
+    body: str,
+    pdf_bytes: bytes | memoryview,
+    filename: str,
+    deadline: Deadline | None = None,
+) -> bool:
+    """Compose and send one intake email with a single PDF attachment."""
+    email_config = get_email_config()
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = email_config["sender_email"]
+    msg["To"] = email_config["recipient_email"]
+    if correlation_id():
+        msg["X-Correlation-ID"] = correlation_id()
+    started = time.perf_counter()
+    try:
+        msg.set_content(body)
+        token = _attach_pdf_placeholder(msg, filename)
+        with _smtp_session(email_config, deadline) as server:
+            _send_streaming(server, msg, {token: pdf_bytes}, deadline)
+    except Exception as e:
+        event("email.send.failed", logging.ERROR, error=type(e).__name__)
+        st.error(f"Email compose/send failed: {e}")
+        return False
+    event(
+        "email.send",
+        pdf_bytes=len(pdf_bytes),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+    return True
+
+
 def send_email_with_pdf(
-    pdf_bytes: bytes,
+    pdf_bytes: bytes | memoryview,
     filename: str,
     patient_name: str,
     payload: dict,
@@ -79,23 +359,55 @@ def send_email_with_pdf(
     sex_map: dict,
 ) -> bool:
     """Send email with PDF attachment."""
+    return _send_intake_email(
+        f"New Patient Intake: {patient_name}",
+        format_email_body(payload, extra_fields, species_map, breed_map, sex_map),
+        pdf_bytes,
+        filename,
+    )
+
+
+def send_visit_email_with_pdf(
+    pdf_bytes: bytes | memoryview,
+    filename: str,
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    deadline: Deadline | None = None,
+) -> bool:
+    """Send one email for a whole visit (one or more pets) with the merged PDF attached."""
+    patient_names = ", ".join(payload["patient_name"] for payload in payloads)
+    return _send_intake_email(
+        f"New Patient Intake: {patient_names}",
+        format_visit_email_body(payloads, extra_fields_list, species_map, breed_map, sex_map),
+        pdf_bytes,
+        filename,
+        deadline,
+    )
+
+
+def send_digest_email(body: str, attachments: list[tuple[str, bytes]], count: int) -> None:
+    """
+    Send one digest email covering several intakes over a single SMTP session.
+
+    Args:
+        body: Plain-text body (summary table followed by per-intake details)
+        attachments: (filename, pdf_bytes) pairs to attach
+        count: Number of intakes covered, used in the subject line
+
+    Raises:
+        Exception: Any compose/SMTP error, so the caller can re-queue the batch.
+    """
     email_config = get_email_config()
     msg = EmailMessage()
-    msg["Subject"] = f"New Patient Intake: {patient_name}"
+    msg["Subject"] = f"Patient Intake Digest: {count} new intake{'s' if count != 1 else ''}"
     msg["From"] = email_config["sender_email"]
     msg["To"] = email_config["recipient_email"]
-    try:
-        msg.set_content(
-            format_email_body(payload, extra_fields, species_map, breed_map, sex_map)
-        )
-        msg.add_attachment(
-            pdf_bytes, maintype="application", subtype="pdf", filename=filename
-        )
-        with smtplib.SMTP(email_config["smtp_server"], email_config["smtp_port"]) as server:
-            server.starttls()
-            server.login(email_config["sender_email"], email_config["sender_password"])
-            server.send_message(msg)
-        return True
-    except Exception as e:
-        st.error(f"Email compose/send failed: {e}")
-        return False
+    msg.set_content(body)
+    tokens = {
+        _attach_pdf_placeholder(msg, filename): pdf_bytes for filename, pdf_bytes in attachments
+    }
+    with _smtp_session(email_config) as server:
+        _send_streaming(server, msg, tokens)
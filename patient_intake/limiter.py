@@ -0,0 +1,155 @@
+"""Adaptive (AIMD) concurrency limit on backend submissions.
+
+Every ``submit_patient`` POST takes a slot from one process-wide limiter, so
+bulk replays and busy periods cannot overload the backend however many visits
+are submitted at once. The limit is not fixed: like TCP congestion control it
+grows additively while the backend is healthy and is cut multiplicatively when
+it shows strain.
+
+- A healthy response sent while the limiter was at least half full raises the
+  limit by ``1 / limit``, i.e. by about one slot per limit's worth of requests.
+- A 429, a 5xx, a failed request, or recent latency above ``latency_tolerance``
+  times the baseline, multiplies the limit by ``backoff``. Only requests sent
+  after the previous cut can cut it again, so one overloaded burst counts once.
+
+Recent latency is a moving average of response times; the baseline is their
+minimum, drifting slowly upwards so that a backend that has become slower for
+good is eventually accepted as the new normal. The current limit and in-flight
+count are published as ``intake_backend_concurrency_limit`` and
+``intake_backend_in_flight``.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from functools import cache
+
+from patient_intake import metrics
+from patient_intake.config import get_backend_limit_config
+
+# Fraction of the gap to a slower latency that the baseline moves per response
+BASELINE_DRIFT = 0.01
+# Weight of the newest response in the recent-latency moving average
+RECENT_WEIGHT = 0.2
+
+_limit_gauge = metrics.gauge(
+    "intake_backend_concurrency_limit", "Current adaptive limit on concurrent backend POSTs"
+)
+_in_flight_gauge = metrics.gauge("intake_backend_in_flight", "Backend POSTs currently in flight")
+_decreases = metrics.counter(
+    "intake_backend_limit_decreases_total", "Cuts of the backend concurrency limit, by reason"
+)
+
+
+class LimiterTimeout(TimeoutError):
+    """No backend slot freed up in time."""
+
+    def __init__(self, waited: float):
+        super().__init__(f"Backend busy: no submission slot within {waited:g}s")
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease limit on concurrent calls."""
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._clock = clock
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._baseline: float | None = None
+        self._recent = 0.0
+        self._last_cut = clock()
+        self._available = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        """Calls currently allowed at once."""
+        with self._available:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Calls holding a slot."""
+        with self._available:
+            return self._in_flight
+
+    def _publish(self) -> None:
+        _limit_gauge.set(int(self._limit))
+        _in_flight_gauge.set(self._in_flight)
+
+    def acquire(self, timeout: float) -> tuple[float, bool]:
+        """
+        Wait for a slot; pair with ``release()``.
+
+        Args:
+            timeout: Longest to wait, in seconds
+
+        Returns:
+            A ticket for ``release()``
+
+        Raises:
+            LimiterTimeout: If no slot freed up within ``timeout``
+        """
+        with self._available:
+            if not self._available.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                raise LimiterTimeout(timeout)
+            self._in_flight += 1
+            busy = self._in_flight * 2 >= self._limit
+            self._publish()
+            return self._clock(), busy
+
+    def release(self, ticket: tuple[float, bool], overloaded: bool | None = None) -> None:
+        """
+        Free a slot and adjust the limit from how the call went.
+
+        Args:
+            ticket: What ``acquire()`` returned
+            overloaded: True for a 429, 5xx or failed request, False for any other
+                response, None if nothing was sent (the limit is left as is)
+        """
+        started, busy = ticket
+        with self._available:
+            self._in_flight -= 1
+            if overloaded is not None:
+                self._adjust(started, busy, overloaded)
+            self._publish()
+            self._available.notify_all()
+
+    def _adjust(self, started: float, busy: bool, overloaded: bool) -> None:
+        latency = self._clock() - started
+        slow = False
+        if not overloaded:
+            if self._baseline is None:
+                self._baseline = self._recent = latency
+            self._recent += (latency - self._recent) * RECENT_WEIGHT
+            if latency < self._baseline:
+                self._baseline = latency
+            else:
+                self._baseline += (latency - self._baseline) * BASELINE_DRIFT
+            slow = self._recent > self._baseline * self.latency_tolerance
+        if overloaded or slow:
+            if started >= self._last_cut:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_cut = self._clock()
+                _decreases.inc(reason="error" if overloaded else "latency")
+            return
+        if busy:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+
+@cache
+def get_backend_limiter() -> AdaptiveLimiter:
+    """Process-wide limiter on backend submissions."""
+    return AdaptiveLimiter(**get_backend_limit_config())
@@ -0,0 +1,77 @@
+"""In-process metrics in the Prometheus text format.
+
+A deliberately small registry (no client library dependency): counters and
+gauges with labels, rendered by ``render()`` and served on ``/metrics`` by the
+health server in ``warmup``.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_metrics: dict[str, "Metric"] = {}
+
+
+class Metric:
+    """A counter or gauge, with one value per label set."""
+
+    def __init__(self, name: str, help_text: str, kind: str):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the value for a label set (gauges)."""
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Add to the value for a label set."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Current value for a label set (0 if never set)."""
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in self._values.items():
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+                series = f"{self.name}{{{labels}}}" if labels else self.name
+                lines.append(f"{series} {float(value)!r}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _get_or_create(name: str, help_text: str, kind: str) -> Metric:
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Metric(name, help_text, kind)
+        return metric
+
+
+def counter(name: str, help_text: str) -> Metric:
+    """Get or register a counter."""
+    return _get_or_create(name, help_text, "counter")
+
+
+def gauge(name: str, help_text: str) -> Metric:
+    """Get or register a gauge."""
+    return _get_or_create(name, help_text, "gauge")
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_metrics.values())
+    lines = [line for metric in metrics for line in metric.render()]
+    return "\n".join(lines) + "\n"
@@ -1,12 +1,86 @@
 """PDF generation for patient intake forms."""
 
 import io
+import itertools
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 
 import fitz
 
-from patient_intake.config import PDF_TEMPLATE_PATH
+from patient_intake.config import VISIT_FORMS
 from patient_intake.email_sender import label_from_id
+from patient_intake.template_registry import FormLayout, get_template_registry
+from patient_intake.tracing import event, with_trace
+
+# Render queue priorities: submissions first, then previews and digest merges
+SUBMIT_PRIORITY = 0
+BACKGROUND_PRIORITY = 1
+# Seconds a preview waits for the render thread before giving up
+PREVIEW_WAIT_SECONDS = 5
+
+
+class _RenderWorker:
+    """
+    The one thread that runs PyMuPDF (it is not thread-safe), taking jobs by priority.
+
+    A Submit render queued behind previews runs next, not after them; a queued
+    job whose future was cancelled (e.g. a preview nobody waits for) is skipped.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, /, *args, priority: int = SUBMIT_PRIORITY) -> Future:
+        """Queue ``fn(*args)``; jobs of equal priority run in the order submitted."""
+        future: Future = Future()
+        self._queue.put((priority, next(self._order), future, fn, args))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pdf-render", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            _, _, future, fn, args = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+_render_executor = _RenderWorker()
+
+
+def _open_template(form_type: str) -> tuple[fitz.Document, FormLayout]:
+    """Open a fresh, writable copy of a registered template from memory."""
+    data, layout = get_template_registry().get(form_type)
+    return fitz.open(stream=data, filetype="pdf"), layout
+
+
+def _to_buffer(doc: fitz.Document) -> io.BytesIO:
+    """
+    Serialise and close ``doc``, returning the PDF as a BytesIO.
+
+    The BytesIO shares the single ``bytes`` object produced by MuPDF, so
+    ``getvalue()`` hands that same object back without copying.
+    """
+    try:
+        return io.BytesIO(doc.tobytes())
+    finally:
+        doc.close()
 
 
 def fill_pdf_with_fitz(
@@ -25,78 +99,247 @@ def fill_pdf_with_fitz(
     Returns:
         BytesIO buffer containing the filled PDF
     """
-    doc = fitz.open(PDF_TEMPLATE_PATH)
-    page = doc[0]
+    return fill_visit_pdf(
+        [payload], [extra_fields], species_map, breed_map, sex_map, form_types=["intake"]
+    )
+
+
+def fill_visit_pdf(
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    form_types: Sequence[str] | None = None,
+    created_at: datetime | None = None,
+) -> io.BytesIO:
+    """
+    Fill the visit's forms for every pet and return them as a single PDF.
 
-    font_size = 10
-    font = "helv"
+    Args:
+        payloads: Main form data, one per pet (owner fields repeated)
+        extra_fields_list: Additional form fields, one per pet
+        species_map: Species name to ID mapping
+        breed_map: Breed name to ID mapping
+        sex_map: Sex name to ID mapping
+        form_types: Registered forms to fill for each pet, in order
+            (defaults to ``VISIT_FORMS``)
+        created_at: When the intake was submitted; the form's date and the pet's
+            age are as of then (defaults to now)
 
-    def draw(x: float, y: float, text) -> None:
-        if text is not None:
-            page.insert_text((x, y), str(text), fontsize=font_size, fontname=font)
-
-    # === CLIENT INFO ===
-    draw(207, 173, f"{payload['patient_owner_firstname']}")
-    draw(391, 173, payload.get("patient_owner_lastname", ""))
-    draw(207, 193, extra_fields.get("sec_owner_firstname", ""))
-    draw(391, 193, extra_fields.get("sec_owner_lastname", ""))
-    draw(91, 217, payload.get("patient_address", ""))
-    draw(330, 217, f"{payload.get('city', '')}")
-    draw(448, 217, payload.get("state", ""))
-    draw(511, 217, payload.get("zip", ""))
-    draw(121, 236, payload.get("phone", ""))
-    draw(116, 298, payload.get("email", ""))
-    draw(386, 233, extra_fields.get("work_no", ""))
-    draw(137, 254, extra_fields.get("alt_no", ""))
-    draw(442, 254, extra_fields.get("employer", ""))
-    draw(213, 276, extra_fields.get("drive_lic", ""))
-    draw(
-        493,
-        277,
-        f"{extra_fields.get('owner_month')}/"
-        f"{extra_fields.get('owner_day')}/{extra_fields.get('owner_year')}",
+    Returns:
+        BytesIO buffer containing the filled multi-page PDF
+    """
+    output = None
+    for payload, extra_fields in zip(payloads, extra_fields_list, strict=True):
+        values = _field_values(
+            payload, extra_fields, species_map, breed_map, sex_map, created_at or datetime.now()
+        )
+        for form_type in form_types or VISIT_FORMS:
+            doc, layout = _open_template(form_type)
+            _apply_layout(doc, layout, values)
+            if output is None:
+                output = doc
+            else:
+                output.insert_pdf(doc)
+                doc.close()
+    return _to_buffer(output)
+
+
+def render_visit_pdf_async(
+    payloads: list[dict],
+    extra_fields_list: list[dict],
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+) -> Future:
+    """
+    Start ``fill_visit_pdf`` on the render worker thread.
+
+    Lets the caller overlap rendering with other I/O (e.g. the backend POST) and
+    drop the result with ``Future.cancel()`` or by ignoring it.
+
+    Returns:
+        Future resolving to the BytesIO buffer from ``fill_visit_pdf``
+    """
+    return _render_executor.submit(
+        with_trace(_render_visit_pdf), payloads, extra_fields_list, species_map, breed_map, sex_map
     )
-    owner_visit_coord = {"Yes": (230, 318), "No": (270, 318)}
-    coords_owner = owner_visit_coord.get(extra_fields.get("prev_visit"))
-    if coords_owner:
-        draw(*coords_owner, "X")
 
-    # === PET INFO ===
-    species_label = label_from_id(species_map, payload.get("patient_species"))
-    breed_label = label_from_id(breed_map, payload.get("patient_breed"))
-    draw(85, 358, payload["patient_name"])
-    draw(483, 359, species_label)
-    draw(80, 379, breed_label)
-    draw(175, 379, extra_fields.get("breed_not_listed", ""))
-    draw(
-        483,
-        401,
-        f"{payload['birthday_month']}/{payload['birthday_day']}/{payload['birthday_year']}",
+
+def _render_visit_pdf(*args) -> io.BytesIO:
+    """``fill_visit_pdf`` for the current submission, with a "pdf.render" trace event."""
+    started = time.perf_counter()
+    buffer = fill_visit_pdf(*args)
+    event(
+        "pdf.render",
+        pets=len(args[0]),
+        bytes=len(buffer.getvalue()),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
     )
-    age = datetime.now().year - payload["birthday_year"]
-    draw(400, 380, f"{age}")
-    draw(287, 378, extra_fields.get("color", ""))
-    pet_visit_coord = {"Yes": (260, 420), "No": (296, 420)}
-    coords_pet = pet_visit_coord.get(extra_fields.get("pet_prev_visit"))
-    if coords_pet:
-        draw(*coords_pet, "X")
-    draw(88, 458, extra_fields.get("doctor", ""))
-    draw(308, 458, extra_fields.get("clinic_name", ""))
-
-    sex_coords = {
-        "Male": [(136, 403), (335, 403)],
-        "Female": [(82, 403), (335, 403)],
-        "Castrated male": [(136, 403), (299, 403)],
-        "Spayed female": [(82, 403), (299, 403)],
+    return buffer
+
+
+def render_preview_png(
+    payload: dict,
+    extra_fields: dict,
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    dpi: int,
+) -> bytes:
+    """
+    Fill one pet's intake form and rasterize it to a PNG at ``dpi``.
+
+    Runs on the render worker thread, behind any Submit renders, and waits for it
+    at most ``PREVIEW_WAIT_SECONDS``; a preview given up on is never rendered.
+
+    Returns:
+        PNG image of the filled intake form's first page
+
+    Raises:
+        TimeoutError: If the render thread is too busy
+    """
+    future = _render_executor.submit(
+        _rasterize_intake,
+        payload,
+        extra_fields,
+        species_map,
+        breed_map,
+        sex_map,
+        dpi,
+        priority=BACKGROUND_PRIORITY,
+    )
+    try:
+        png: bytes = future.result(timeout=PREVIEW_WAIT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError("the form renderer is busy; try again shortly") from None
+    return png
+
+
+def _rasterize_intake(
+    payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict, dpi: int
+) -> bytes:
+    pdf = fill_pdf_with_fitz(payload, extra_fields, species_map, breed_map, sex_map)
+    with fitz.open(stream=pdf.getvalue(), filetype="pdf") as doc:
+        png: bytes = doc[0].get_pixmap(dpi=dpi).tobytes("png")
+    return png
+
+
+def warm_up_renderer() -> None:
+    """Load every template and run one throwaway render so fonts and MuPDF are initialised."""
+    registry = get_template_registry()
+    registry.warm()
+    payload = {
+        "patient_owner_firstname": "",
+        "patient_name": "",
+        "birthday_day": 1,
+        "birthday_month": 1,
+        "birthday_year": datetime.now().year,
+    }
+    _render_executor.submit(
+        fill_visit_pdf, [payload], [{}], {}, {}, {}, registry.form_types()
+    ).result()
+
+
+def _field_values(
+    payload: dict,
+    extra_fields: dict,
+    species_map: dict,
+    breed_map: dict,
+    sex_map: dict,
+    created_at: datetime,
+) -> dict:
+    """Flatten one pet's intake, submitted at ``created_at``, into ``FormLayout`` field names."""
+    first = payload["patient_owner_firstname"]
+    last = payload.get("patient_owner_lastname", "")
+    breed_label = label_from_id(breed_map, payload.get("patient_breed"))
+    city_line = f"{payload.get('city', '')}, {payload.get('state', '')} {payload.get('zip', '')}"
+    return {
+        # === CLIENT INFO ===
+        "owner_firstname": f"{first}",
+        "owner_lastname": last,
+        "owner_name": f"{first} {last or ''}".strip(),
+        "sec_owner_firstname": extra_fields.get("sec_owner_firstname", ""),
+        "sec_owner_lastname": extra_fields.get("sec_owner_lastname", ""),
+        "address": payload.get("patient_address", ""),
+        "full_address": ", ".join(
+            part for part in (payload.get("patient_address", ""), city_line.strip(" ,")) if part
+        ),
+        "city": f"{payload.get('city', '')}",
+        "state": payload.get("state", ""),
+        "zip": payload.get("zip", ""),
+        "phone": payload.get("phone", ""),
+        "email": payload.get("email", ""),
+        "work_no": extra_fields.get("work_no", ""),
+        "alt_no": extra_fields.get("alt_no", ""),
+        "employer": extra_fields.get("employer", ""),
+        "drive_lic": extra_fields.get("drive_lic", ""),
+        "owner_dob": f"{extra_fields.get('owner_month')}/"
+        f"{extra_fields.get('owner_day')}/{extra_fields.get('owner_year')}",
+        "prev_visit": extra_fields.get("prev_visit"),
+        # === PET INFO ===
+        "patient_name": payload["patient_name"],
+        "species": label_from_id(species_map, payload.get("patient_species")),
+        "breed": breed_label,
+        "breed_not_listed": extra_fields.get("breed_not_listed", ""),
+        "breed_or_unlisted": breed_label or extra_fields.get("breed_not_listed", ""),
+        "sex": label_from_id(sex_map, payload.get("patient_sex")),
+        "birthday": f"{payload['birthday_month']}/{payload['birthday_day']}/"
+        f"{payload['birthday_year']}",
+        "age": f"{created_at.year - payload['birthday_year']}",
+        "color": extra_fields.get("color", ""),
+        "pet_prev_visit": extra_fields.get("pet_prev_visit"),
+        "doctor": extra_fields.get("doctor", ""),
+        "clinic_name": extra_fields.get("clinic_name", ""),
+        "date": created_at.strftime("%m/%d/%Y"),
     }
-    sex_label = label_from_id(sex_map, payload.get("patient_sex"))
-    coords = sex_coords.get(sex_label)
-    if coords:
-        for coord in coords:
+
+
+def _apply_layout(doc: fitz.Document, layout: FormLayout, values: dict) -> None:
+    """Draw/fill one pet's field values onto a template according to its layout."""
+    page = doc[layout.page]
+
+    def draw(x: float, y: float, text) -> None:
+        if text is not None:
+            page.insert_text((x, y), str(text), fontsize=layout.font_size, fontname="helv")
+
+    for name, (x, y) in layout.text.items():
+        draw(x, y, values.get(name))
+    for name, positions in layout.marks.items():
+        for coord in positions.get(values.get(name), []):
             draw(*coord, "X")
 
-    # Save to in-memory PDF buffer
-    output = io.BytesIO()
-    doc.save(output)
-    output.seek(0)
-    return output
+    if layout.widgets:
+        for widget_page in doc:
+            for widget in widget_page.widgets():
+                field = layout.widgets.get(widget.field_name)
+                if field is not None and values.get(field) is not None:
+                    widget.field_value = str(values[field])
+                    widget.update()
+        # Flatten so several filled copies can be merged without field-name clashes
+        doc.bake()
+
+
+def merge_pdfs(pdf_buffers: list[bytes]) -> io.BytesIO:
+    """
+    Concatenate several filled PDFs into one multi-page document.
+
+    Args:
+        pdf_buffers: Rendered PDF documents, in page order
+
+    Returns:
+        BytesIO buffer containing the merged PDF
+    """
+    merged = fitz.open()
+    for pdf_bytes in pdf_buffers:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as part:
+            merged.insert_pdf(part)
+
+    return _to_buffer(merged)
+
+
+def merge_pdfs_async(pdf_buffers: list[bytes]) -> Future:
+    """``merge_pdfs`` on the render thread, for callers on other threads."""
+    return _render_executor.submit(merge_pdfs, pdf_buffers, priority=BACKGROUND_PRIORITY)
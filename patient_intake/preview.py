@@ -0,0 +1,91 @@
+"""Low-resolution preview of each pet's filled intake form, shown before Submit.
+
+Streamlit reruns the whole script on every keystroke, so previews are memoized
+on a hash of the normalized form values (``preview_key``): a rerun that leaves a
+pet's fields unchanged costs one hash, and only a pet whose fields changed is
+re-rendered. Rendered PNGs are kept in a process-wide LRU of
+``PREVIEW_CACHE_SIZE`` entries shared by all sessions.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from patient_intake import metrics
+from patient_intake.archive import normalize_payload
+from patient_intake.config import PREVIEW_CACHE_SIZE, PREVIEW_DPI
+from patient_intake.pdf_generator import render_preview_png
+
+_lookups = metrics.counter("intake_preview_lookups_total", "Form preview lookups, by result")
+
+
+def _stripped(fields: dict) -> dict:
+    return {
+        name: value.strip() if isinstance(value, str) else value for name, value in fields.items()
+    }
+
+
+def preview_key(
+    payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict
+) -> str:
+    """
+    Hash of everything that shows on one pet's filled form.
+
+    Surrounding whitespace is ignored, and only the catalogue entries the pet
+    refers to are included, so a catalogue refresh does not invalidate previews.
+    """
+    record = normalize_payload(
+        _stripped(payload), _stripped(extra_fields), species_map, breed_map, sex_map
+    )
+    encoded = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class PreviewCache:
+    """Thread-safe LRU of preview key -> PNG bytes."""
+
+    def __init__(self, max_entries: int = PREVIEW_CACHE_SIZE, dpi: int = PREVIEW_DPI):
+        self.max_entries = max_entries
+        self.dpi = dpi
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def preview(
+        self, payload: dict, extra_fields: dict, species_map: dict, breed_map: dict, sex_map: dict
+    ) -> bytes:
+        """
+        PNG preview of one pet's filled intake form, rendered only on a cache miss.
+
+        Returns:
+            PNG image bytes
+        """
+        key = preview_key(payload, extra_fields, species_map, breed_map, sex_map)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+        if png is not None:
+            _lookups.inc(result="hit")
+            return png
+
+        _lookups.inc(result="miss")
+        png = render_preview_png(
+            _stripped(payload), _stripped(extra_fields), species_map, breed_map, sex_map, self.dpi
+        )
+        with self._lock:
+            self._entries[key] = png
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return png
+
+
+@lru_cache(maxsize=1)
+def get_preview_cache() -> PreviewCache:
+    """Process-wide preview cache shared by all sessions."""
+    return PreviewCache()
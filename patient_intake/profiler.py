@@ -0,0 +1,231 @@
+"""Opt-in profiler for reruns of the Streamlit page script.
+
+Streamlit runs ``app.main`` top to bottom on every widget interaction, so UI-side
+CPU cost is paid per rerun. With ``RERUN_PROFILE_ENABLED`` set, each rerun and
+each named block inside it (``with block("pets"):``) is timed, in wall-clock and
+thread CPU seconds, and reruns are counted per session. Block times are
+inclusive of nested blocks.
+
+Results go to ``/metrics`` (``intake_rerun_seconds_total{block}`` and friends)
+and, at most every ``REPORT_INTERVAL`` seconds and at exit, to a JSON report at
+``RERUN_PROFILE_PATH`` listing the costliest blocks first. Print it with:
+
+    python -m patient_intake.profiler [REPORT]
+
+When disabled, ``block`` and ``profiled_rerun`` cost one flag check.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from patient_intake import metrics
+from patient_intake.config import RERUN_PROFILE_ENABLED, RERUN_PROFILE_PATH
+
+# Seconds between report file writes
+REPORT_INTERVAL = 10.0
+# Blocks listed in the report
+REPORT_TOP = 10
+# Sessions whose rerun counts are kept; the least recently seen are forgotten first
+MAX_TRACKED_SESSIONS = 10_000
+RERUN = "rerun"
+
+_reruns = metrics.counter("intake_reruns_total", "Page script reruns profiled")
+_wall = metrics.counter(
+    "intake_rerun_seconds_total", "Wall-clock seconds spent per profiled block (rerun = whole run)"
+)
+_cpu = metrics.counter(
+    "intake_rerun_cpu_seconds_total", "Thread CPU seconds spent per profiled block"
+)
+_slowest = metrics.gauge("intake_rerun_seconds_max", "Slowest profiled run of each block")
+_busiest = metrics.gauge("intake_session_reruns_max", "Most reruns by a single session")
+
+_disabled = nullcontext()
+
+
+@dataclass
+class BlockStats:
+    """Accumulated timings of one block."""
+
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    max_wall: float = 0.0
+
+
+class RerunProfiler:
+    """Process-wide block timings and per-session rerun counts."""
+
+    def __init__(
+        self, report_path: Path | None = None, clock: Callable[[], float] = time.monotonic
+    ):
+        self.report_path = Path(report_path) if report_path else None
+        self._clock = clock
+        self._blocks: dict[str, BlockStats] = {}
+        self._sessions: OrderedDict[str, int] = OrderedDict()
+        self._written_at = clock()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, wall: float, cpu: float) -> None:
+        """Add one run of block ``name``."""
+        with self._lock:
+            stats = self._blocks.setdefault(name, BlockStats())
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.max_wall = max(stats.max_wall, wall)
+            slowest = stats.max_wall
+        _wall.inc(wall, block=name)
+        _cpu.inc(cpu, block=name)
+        _slowest.set(slowest, block=name)
+
+    def record_rerun(self, session_id: str, wall: float, cpu: float) -> None:
+        """Add one whole rerun by ``session_id``, and write the report if it is due."""
+        self.record(RERUN, wall, cpu)
+        with self._lock:
+            count = self._sessions.pop(session_id, 0) + 1
+            self._sessions[session_id] = count
+            if len(self._sessions) > MAX_TRACKED_SESSIONS:
+                self._sessions.popitem(last=False)
+            due = self._clock() - self._written_at >= REPORT_INTERVAL
+            if due:
+                self._written_at = self._clock()
+        _reruns.inc()
+        _busiest.set(max(_busiest.value(), count))
+        if due:
+            self.write()
+
+    def report(self, top: int = REPORT_TOP) -> dict:
+        """
+        Summary of reruns and the ``top`` blocks by total wall-clock time.
+
+        Returns:
+            Dict with ``reruns``, ``sessions`` and ``blocks`` (costliest first)
+        """
+        with self._lock:
+            blocks = {name: BlockStats(**vars(stats)) for name, stats in self._blocks.items()}
+            counts = list(self._sessions.values())
+        rerun = blocks.pop(RERUN, BlockStats())
+        ranked = sorted(blocks.items(), key=lambda item: item[1].wall, reverse=True)[:top]
+        return {
+            "reruns": {
+                "count": rerun.calls,
+                "mean_ms": round(rerun.wall / rerun.calls * 1000, 3) if rerun.calls else 0,
+                "cpu_mean_ms": round(rerun.cpu / rerun.calls * 1000, 3) if rerun.calls else 0,
+                "max_ms": round(rerun.max_wall * 1000, 3),
+            },
+            "sessions": {
+                "count": len(counts),
+                "reruns_mean": round(sum(counts) / len(counts), 1) if counts else 0,
+                "reruns_max": max(counts, default=0),
+            },
+            "blocks": [
+                {
+                    "block": name,
+                    "calls": stats.calls,
+                    "total_ms": round(stats.wall * 1000, 3),
+                    "mean_ms": round(stats.wall / stats.calls * 1000, 3),
+                    "cpu_mean_ms": round(stats.cpu / stats.calls * 1000, 3),
+                    "max_ms": round(stats.max_wall * 1000, 3),
+                    "share_of_rerun": round(stats.wall / rerun.wall, 4) if rerun.wall else None,
+                }
+                for name, stats in ranked
+            ],
+        }
+
+    def write(self) -> None:
+        """Atomically replace the report file."""
+        if self.report_path is None:
+            return
+        partial = self.report_path.with_name(f"{self.report_path.name}.partial")
+        try:
+            partial.write_text(json.dumps(self.report(), indent=2))
+            os.replace(partial, self.report_path)
+        except OSError:
+            partial.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def get_profiler() -> RerunProfiler:
+    """Process-wide profiler, writing to ``RERUN_PROFILE_PATH``."""
+    profiler = RerunProfiler(RERUN_PROFILE_PATH)
+    atexit.register(profiler.write)
+    return profiler
+
+
+@contextmanager
+def _timed(name: str):
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        get_profiler().record(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+def block(name: str):
+    """Context manager timing one block of the page script, when profiling is on."""
+    return _timed(name) if RERUN_PROFILE_ENABLED else _disabled
+
+
+def profiled_rerun(fn):
+    """Time each call of the page script's entry point as one rerun, when profiling is on."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not RERUN_PROFILE_ENABLED:
+            return fn(*args, **kwargs)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            # st.stop() and st.rerun() end a run by raising; they still count
+            return fn(*args, **kwargs)
+        finally:
+            ctx = get_script_run_ctx()
+            get_profiler().record_rerun(
+                ctx.session_id if ctx else "unknown",
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+            )
+
+    return wrapper
+
+
+def format_report(report: dict) -> str:
+    """Plain-text table of a report."""
+    reruns, sessions = report["reruns"], report["sessions"]
+    lines = [
+        f"{reruns['count']} reruns, mean {reruns['mean_ms']:.1f} ms "
+        f"(CPU {reruns['cpu_mean_ms']:.1f} ms), max {reruns['max_ms']:.1f} ms",
+        f"{sessions['count']} sessions, {sessions['reruns_mean']} reruns each on average, "
+        f"at most {sessions['reruns_max']}",
+        "",
+        f"{'block':<24}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'CPU ms':>10}{'share':>8}",
+    ]
+    for row in report["blocks"]:
+        share = f"{row['share_of_rerun']:.0%}" if row["share_of_rerun"] is not None else "-"
+        lines.append(
+            f"{row['block']:<24}{row['calls']:>8}{row['total_ms']:>12.1f}"
+            f"{row['mean_ms']:>10.2f}{row['cpu_mean_ms']:>10.2f}{share:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Show the rerun profile report.")
+    parser.add_argument("report", type=Path, nargs="?", default=RERUN_PROFILE_PATH)
+    args = parser.parse_args(argv)
+    print(format_report(json.loads(args.report.read_text())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Bulk re-render of archived intakes, e.g. after a template or layout change.
+
+Streams every pet payload from the intake archive and renders it, dated as of its
+original submission, on a process pool (PyMuPDF is not thread-safe, so processes
+are what scale with cores). Identical payloads submitted on the same day share
+one PDF. A ``manifest.json`` in the output directory records the template hash
+behind each PDF; intakes whose template hash is unchanged are skipped on the
+next run.
+
+Usage:
+    python -m patient_intake.regenerate OUTPUT_DIR [--workers 8] [--forms intake,history]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from patient_intake.archive import IntakeArchive, get_archive
+from patient_intake.config import VISIT_FORMS
+from patient_intake.pdf_generator import fill_visit_pdf
+from patient_intake.template_registry import get_template_registry
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+# Bumped when rendering changes in a way that makes earlier outputs stale
+# (2: date and age as of the original submission, not the day of the run)
+RENDER_VERSION = 2
+# Completed renders between manifest saves, so an interrupted run keeps its progress
+_MANIFEST_EVERY = 200
+
+_worker_archive: IntakeArchive | None = None
+
+
+def template_hash(form_types: Sequence[str]) -> str:
+    """Hash of the template bytes and layouts that a render with ``form_types`` uses."""
+    digest = hashlib.sha256(f"render-v{RENDER_VERSION}".encode())
+    registry = get_template_registry()
+    for form_type in form_types:
+        data, layout = registry.get(form_type)
+        digest.update(form_type.encode())
+        digest.update(hashlib.sha256(data).digest())
+        digest.update(repr(layout).encode())
+    return digest.hexdigest()
+
+
+def _render_key(row: dict) -> str:
+    """Manifest key for an index row: its payload as rendered on its intake date."""
+    return f"{row['payload_hash']}@{row['intake_date']}"
+
+
+def _output_name(patient_name: str, payload_hash: str, intake_date: str) -> str:
+    safe_name = re.sub(r"[^\w-]+", "_", patient_name).strip("_") or "patient"
+    return f"{safe_name}_{payload_hash[:12]}_{intake_date}.pdf"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _load_manifest(output_dir: Path) -> dict:
+    path = output_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    manifest: dict = json.loads(path.read_text())
+    return manifest
+
+
+def _save_manifest(output_dir: Path, manifest: dict) -> None:
+    _write_atomic(output_dir / MANIFEST_NAME, json.dumps(manifest, indent=1).encode())
+
+
+def _init_worker(archive_root: str) -> None:
+    global _worker_archive
+    _worker_archive = IntakeArchive(Path(archive_root))
+    get_template_registry().warm()
+
+
+def _render_one(
+    payload_hash: str, created_at: str, output_path: str, form_types: list[str]
+) -> None:
+    """Worker: render one archived payload, as submitted at ``created_at``, to ``output_path``."""
+    assert _worker_archive is not None, "_init_worker has not run"
+    record = _worker_archive.read_payload(payload_hash)
+    catalogue = record["catalogue"]
+    pdf = fill_visit_pdf(
+        [record["payload"]],
+        [record["extra_fields"]],
+        catalogue["species"],
+        catalogue["breed"],
+        catalogue["sex"],
+        form_types=form_types,
+        created_at=datetime.fromisoformat(created_at),
+    )
+    _write_atomic(Path(output_path), pdf.getvalue())
+
+
+def regenerate(
+    archive: IntakeArchive,
+    output_dir: Path,
+    form_types: Sequence[str] = VISIT_FORMS,
+    workers: int | None = None,
+    force: bool = False,
+) -> dict[str, int]:
+    """
+    Re-render every archived pet payload into ``output_dir``.
+
+    Args:
+        archive: Archive to read payloads from
+        output_dir: Directory for the PDFs and ``manifest.json``
+        form_types: Forms to fill for each pet
+        workers: Render processes (defaults to the CPU count)
+        force: Re-render even when the template hash is unchanged
+
+    Returns:
+        Counts of ``rendered``, ``skipped`` and ``failed`` renders (one per
+        distinct payload and intake date)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    form_types = list(form_types)
+    current_template = template_hash(form_types)
+    manifest = _load_manifest(output_dir)
+    workers = workers or os.cpu_count() or 1
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    seen: set[str] = set()
+    pending: dict[Future, tuple[str, str]] = {}
+
+    def collect(done) -> None:
+        for future in done:
+            key, name = pending.pop(future)
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Failed to render payload %s", key)
+                counts["failed"] += 1
+                continue
+            manifest[key] = {"file": name, "template_hash": current_template}
+            counts["rendered"] += 1
+            if counts["rendered"] % _MANIFEST_EVERY == 0:
+                _save_manifest(output_dir, manifest)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(str(archive.root),)
+    ) as pool:
+        for row in archive.iter_records():
+            key = _render_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = manifest.get(key)
+            if (
+                not force
+                and entry
+                and entry["template_hash"] == current_template
+                and (output_dir / entry["file"]).exists()
+            ):
+                counts["skipped"] += 1
+                continue
+            name = _output_name(row["patient_name"], row["payload_hash"], row["intake_date"])
+            future = pool.submit(
+                _render_one,
+                row["payload_hash"],
+                row["created_at"],
+                str(output_dir / name),
+                form_types,
+            )
+            pending[future] = (key, name)
+            # Bound the queue so thousands of intakes stream instead of piling up
+            if len(pending) >= workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending).done)
+
+    _save_manifest(output_dir, manifest)
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m patient_intake.regenerate")
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--workers", type=int, help="render processes (default: CPU count)")
+    parser.add_argument(
+        "--forms", default=",".join(VISIT_FORMS), help="comma-separated form types to fill"
+    )
+    parser.add_argument("--force", action="store_true", help="re-render unchanged intakes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    form_types = [form.strip() for form in args.forms.split(",") if form.strip()]
+    counts = regenerate(get_archive(), args.output_dir, form_types, args.workers, args.force)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
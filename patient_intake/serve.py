@@ -0,0 +1,25 @@
+"""Server entry point: start warm-up and the readiness probe, then run Streamlit.
+
+Usage:
+    python -m patient_intake.serve [streamlit options, e.g. --server.port=8501]
+"""
+
+import sys
+
+from streamlit.web import cli as stcli
+
+from patient_intake import warmup
+from patient_intake.config import PACKAGE_DIR
+
+APP_PATH = PACKAGE_DIR / "app.py"
+
+
+def main() -> None:
+    """Boot the warm-up thread and health server, then hand over to ``streamlit run``."""
+    warmup.start()
+    sys.argv = ["streamlit", "run", str(APP_PATH), *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Per-session memory accounting and the idle-session reaper."""
+
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from streamlit import runtime
+
+from patient_intake import metrics
+from patient_intake.config import (
+    SESSION_BUFFER_BYTES,
+    SESSION_IDLE_SECONDS,
+    SESSION_REAP_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_sessions = metrics.gauge("intake_sessions", "Streamlit sessions held, by state")
+_state_bytes = metrics.gauge(
+    "intake_session_state_bytes", "Estimated session state size, summed over sessions"
+)
+_largest = metrics.gauge(
+    "intake_session_state_bytes_max", "Estimated session state size of the largest session"
+)
+_reaped = metrics.counter("intake_sessions_reaped_total", "Idle sessions reaped, by action")
+_resident = metrics.gauge("intake_process_resident_bytes", "Resident set size of this process")
+
+# Set once Streamlit turns out not to have the private internals the sweeps use
+_unsupported = threading.Event()
+
+
+def value_bytes(value) -> int:
+    """Approximate memory held by a session state value, including what it contains."""
+    if isinstance(value, io.BytesIO) and not value.closed:
+        # getvalue() shares the buffer; getbuffer() would copy a shared one
+        return sys.getsizeof(value) + len(value.getvalue())
+    if isinstance(value, memoryview):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_bytes(key) + value_bytes(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(value_bytes(item) for item in value)
+    return size
+
+
+def _is_buffer(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview, io.BytesIO))
+
+
+def _state_items(state) -> list[tuple[str, object]]:
+    """(key, value) pairs of a session's state, or none if it changed under us."""
+    values = getattr(state, "filtered_state", state)
+    try:
+        return list(values.items())
+    except RuntimeError:
+        # A script run mutated the state mid-copy; measure it on the next sweep
+        return []
+
+
+@dataclass
+class _Seen:
+    """What the reaper knows about one session between sweeps."""
+
+    runs: int
+    active_at: float
+    trimmed: bool = False
+
+
+@dataclass
+class Sweep:
+    """Outcome of one pass over the sessions."""
+
+    close: list[str]
+    trimmed: list[str]
+    state_bytes: dict[str, int]
+
+
+class SessionReaper:
+    """Track session activity across sweeps and decide which sessions to reap."""
+
+    def __init__(
+        self,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        buffer_bytes: int = SESSION_BUFFER_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.idle_seconds = idle_seconds
+        self.buffer_bytes = buffer_bytes
+        self._clock = clock
+        self._seen: dict[str, _Seen] = {}
+
+    def sweep(self, infos: Iterable) -> Sweep:
+        """
+        Measure every session, trim connected idle ones and pick disconnected idle ones.
+
+        A session is active whenever its script run count has moved since the
+        previous sweep, and idle once it has not been for ``idle_seconds``. A
+        disconnected idle session is to be closed outright; a connected one (a tab
+        left open) keeps its form but loses state buffers of ``buffer_bytes`` or
+        more, and is rebuilt on the visitor's next interaction.
+
+        Args:
+            infos: Streamlit ``SessionInfo`` objects (client, session, script_run_count)
+
+        Returns:
+            The sessions to close, those trimmed, and each session's state size
+        """
+        now = self._clock()
+        result = Sweep(close=[], trimmed=[], state_bytes={})
+        seen: dict[str, _Seen] = {}
+        connected = 0
+        for info in infos:
+            session_id = info.session.id
+            previous = self._seen.get(session_id)
+            if previous is None or previous.runs != info.script_run_count:
+                previous = _Seen(info.script_run_count, now)
+            seen[session_id] = previous
+            connected += info.client is not None
+
+            idle = self.idle_seconds > 0 and now - previous.active_at >= self.idle_seconds
+            if idle and info.client is None:
+                result.close.append(session_id)
+                continue
+            if idle and not previous.trimmed:
+                self._trim(info.session.session_state)
+                previous.trimmed = True
+                result.trimmed.append(session_id)
+            result.state_bytes[session_id] = sum(
+                value_bytes(value) for _, value in _state_items(info.session.session_state)
+            )
+        self._seen = seen
+
+        _sessions.set(connected, state="connected")
+        _sessions.set(len(seen) - connected, state="disconnected")
+        _state_bytes.set(sum(result.state_bytes.values()))
+        _largest.set(max(result.state_bytes.values(), default=0))
+        _reaped.inc(len(result.close), action="closed")
+        _reaped.inc(len(result.trimmed), action="trimmed")
+        return result
+
+    def _trim(self, state) -> None:
+        """Drop large buffers from an idle session's state."""
+        for key, value in _state_items(state):
+            if _is_buffer(value) and value_bytes(value) >= self.buffer_bytes:
+                del state[key]
+
+
+def resident_bytes() -> int | None:
+    """Resident set size of this process, where ``/proc`` provides it."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _runtime_sessions():
+    """
+    The running Streamlit runtime and all the sessions it holds, connected or not.
+
+    Streamlit has no public API for listing sessions, so this reads the runtime's
+    session manager directly; pyproject.toml bounds Streamlit to the versions
+    checked to have it.
+    """
+    instance = runtime.get_instance()
+    return instance, instance._session_mgr.list_sessions()
+
+
+def _runtime_loop():
+    """The running Streamlit runtime's event loop."""
+    return runtime.get_instance()._get_async_objs().eventloop
+
+
+def _disable(error: AttributeError) -> None:
+    """Stop sweeping: this Streamlit version lacks the internals the reaper relies on."""
+    if not _unsupported.is_set():
+        _unsupported.set()
+        logger.warning("Session reaper disabled; unsupported Streamlit version (%s)", error)
+
+
+def _reap(reaper: SessionReaper) -> None:
+    """
+    One sweep; runs on the runtime's event loop, as Streamlit requires.
+
+    Trimmed sessions also lose their media files (preview images).
+    """
+    try:
+        instance, infos = _runtime_sessions()
+        result = reaper.sweep(infos)
+        for session_id in result.trimmed:
+            instance.media_file_mgr.clear_session_refs(session_id)
+        if result.trimmed:
+            instance.media_file_mgr.remove_orphaned_files()
+        for session_id in result.close:
+            instance.close_session(session_id)
+    except AttributeError as e:
+        _disable(e)
+        return
+    except Exception:
+        logger.exception("Session sweep failed")
+        return
+    if result.close or result.trimmed:
+        logger.info(
+            "Reaped idle sessions: %d closed, %d trimmed", len(result.close), len(result.trimmed)
+        )
+
+
+def run_reaper(
+    reaper: SessionReaper | None = None, interval: float = SESSION_REAP_INTERVAL_SECONDS
+) -> None:
+    """
+    Sweep the sessions every ``interval`` seconds, forever, and publish the resident size.
+
+    If this Streamlit version lacks the private internals the sweeps use, they stop
+    after one warning; the resident size is still published.
+    """
+    reaper = reaper or SessionReaper()
+    while True:
+        time.sleep(interval)
+        resident = resident_bytes()
+        if resident is not None:
+            _resident.set(resident)
+        if _unsupported.is_set() or not runtime.exists():
+            continue
+        try:
+            _runtime_loop().call_soon_threadsafe(_reap, reaper)
+        except AttributeError as e:
+            _disable(e)
+        except RuntimeError:
+            # Runtime not started yet, or already shutting down
+            continue
+
+
+def start_reaper() -> threading.Thread:
+    """Run the session reaper on a daemon thread."""
+    thread = threading.Thread(target=run_reaper, name="session-reaper", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,212 @@
+"""Host-wide read-only snapshot of the catalogue and PDF templates, shared via mmap."""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from patient_intake.config import CATALOGUE_URL, SNAPSHOT_DIR, SNAPSHOT_ENABLED
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so no shared snapshot
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# File layout: _MAGIC, the header length, a JSON header (catalogue maps and one
+# entry per template with its source path, file signature, offset and length),
+# then the template bytes
+_MAGIC = b"PISNAP1\n"
+_PREFIX = struct.Struct("<8sQ")
+
+
+class _View:
+    """One attached (mapped) snapshot file."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as handle:
+            stat = os.fstat(handle.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = _PREFIX.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        self.header = json.loads(self._map[_PREFIX.size : _PREFIX.size + length])
+        self._blobs = memoryview(self._map)[_PREFIX.size + length :]
+
+    def blob(self, entry: dict) -> memoryview:
+        return self._blobs[entry["offset"] : entry["offset"] + entry["length"]]
+
+
+def _check_private(directory: Path) -> None:
+    """
+    Make sure ``directory`` is a real directory owned by this user with mode 0700.
+
+    Templates read from the snapshot are not validated again, and ``/dev/shm`` is
+    world-writable, so a directory someone else could have created or written to
+    is refused rather than trusted.
+
+    Raises:
+        PermissionError: If it is not, e.g. another user created it first
+    """
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or (hasattr(os, "getuid") and info.st_uid != os.getuid())
+        or stat.S_IMODE(info.st_mode) != 0o700
+    ):
+        raise PermissionError(f"{directory} must be a directory owned by this user with mode 0700")
+
+
+class SharedSnapshot:
+    """Attach to, read from and publish the snapshot file for ``key`` in ``directory``."""
+
+    def __init__(self, directory: Path, key: str = ""):
+        self.directory = Path(directory)
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        _check_private(self.directory)
+        name = f"snapshot-{hashlib.sha256(key.encode()).hexdigest()[:16]}" if key else "snapshot"
+        self.path = self.directory / f"{name}.bin"
+        self._lock_path = self.directory / f"{name}.lock"
+        self._lock = threading.Lock()
+        self._view: _View | None = None
+
+    def _attach(self) -> _View | None:
+        """The current snapshot, remapped if the file has been replaced since last time."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._view is None or self._view.key != key:
+            try:
+                self._view = _View(self.path)
+            except (OSError, ValueError):
+                logger.exception("Ignoring unreadable snapshot %s", self.path)
+                return None
+        return self._view
+
+    def catalogue(self, max_age: float) -> tuple[dict, dict, dict] | None:
+        """
+        The shared (species_map, breed_map, sex_map), if published less than ``max_age`` ago.
+
+        Returns:
+            The maps, or None if there is no catalogue or it is too old
+        """
+        with self._lock:
+            view = self._attach()
+        if view is None or "catalogue" not in view.header:
+            return None
+        if time.time() - view.header["catalogue_at"] >= max_age:
+            return None
+        catalogue = view.header["catalogue"]
+        return dict(catalogue["species"]), dict(catalogue["breed"]), dict(catalogue["sex"])
+
+    def template(self, form_type: str, path: Path, signature: tuple[int, int]) -> memoryview | None:
+        """
+        Shared bytes of a template, if published from the same file version.
+
+        The bytes are a slice of the mapping, so every process reads the same
+        physical pages.
+
+        Args:
+            form_type: Registered form type
+            path: Template file the caller would otherwise read
+            signature: (mtime_ns, size) of that file
+
+        Returns:
+            A read-only view of the template bytes, or None if not shared
+        """
+        with self._lock:
+            view = self._attach()
+        if view is None:
+            return None
+        entry = view.header.get("templates", {}).get(form_type)
+        if entry is None or entry["path"] != str(path) or tuple(entry["signature"]) != signature:
+            return None
+        return view.blob(entry)
+
+    def publish(
+        self,
+        catalogue: tuple[dict, dict, dict] | None = None,
+        templates: dict[str, tuple[Path, tuple[int, int], bytes]] | None = None,
+    ) -> None:
+        """
+        Atomically replace the snapshot, keeping whatever is not being updated.
+
+        A complete new file is written under a temporary name and ``os.replace``d
+        over the old one, under an exclusive ``flock`` so concurrent publishers
+        merge rather than overwrite each other. Readers remap on their next lookup;
+        views of the old file stay valid until they are dropped.
+
+        Args:
+            catalogue: New (species_map, breed_map, sex_map)
+            templates: Form type -> (path, (mtime_ns, size), bytes) to add or replace
+        """
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self._attach()
+            header = dict(current.header) if current else {}
+            if catalogue:
+                species_map, breed_map, sex_map = catalogue
+                header["catalogue"] = {"species": species_map, "breed": breed_map, "sex": sex_map}
+                header["catalogue_at"] = time.time()
+            sources: dict[str, tuple[str, list[int], bytes | memoryview]] = {}
+            if current:
+                for form_type, entry in header.get("templates", {}).items():
+                    sources[form_type] = (entry["path"], entry["signature"], current.blob(entry))
+            for form_type, (path, signature, data) in (templates or {}).items():
+                sources[form_type] = (str(path), list(signature), data)
+
+            header["templates"], blobs, offset = {}, [], 0
+            for form_type, (source_path, source_signature, blob) in sources.items():
+                length = memoryview(blob).nbytes
+                header["templates"][form_type] = {
+                    "path": source_path,
+                    "signature": source_signature,
+                    "offset": offset,
+                    "length": length,
+                }
+                blobs.append(blob)
+                offset += length
+            encoded = json.dumps(header).encode()
+
+            fd, partial = tempfile.mkstemp(dir=self.directory, prefix=".snapshot-")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(_PREFIX.pack(_MAGIC, len(encoded)))
+                    out.write(encoded)
+                    for blob in blobs:
+                        out.write(blob)
+                os.replace(partial, self.path)
+            except BaseException:
+                Path(partial).unlink(missing_ok=True)
+                raise
+            self._attach()
+
+
+@lru_cache(maxsize=1)
+def get_snapshot() -> SharedSnapshot | None:
+    """
+    Process-wide handle on the host snapshot in ``SNAPSHOT_DIR``, or None if disabled.
+
+    The file is keyed by ``CATALOGUE_URL``, so deployments against different backends
+    on one host never share a catalogue.
+    """
+    if not SNAPSHOT_ENABLED or fcntl is None:
+        return None
+    try:
+        return SharedSnapshot(SNAPSHOT_DIR, key=CATALOGUE_URL)
+    except OSError:
+        logger.exception("Shared snapshot disabled; cannot use %s", SNAPSHOT_DIR)
+        return None
@@ -0,0 +1,333 @@
+"""Local intake history: an indexed SQLite store (WAL mode).
+
+Replaces the legacy ``files/data.json`` list, which was loaded and rewritten whole
+for every intake. Each saved pet is one row, appended in its own short
+transaction, so concurrent sessions never overwrite each other, and lookups by
+phone, email or pet name use indexes instead of scanning the history.
+
+The legacy ``data.json`` is imported once, the first time the store is opened.
+
+Returning-client lookups go through SHA-256 hashes of the normalized phone and
+email (``lookup_key``), indexed and cached in an LRU that is cleared on append.
+The hashes are fixed-width index keys over the normalized values, not a privacy
+measure: the plaintext phone and email stay in their columns and in the payload.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from patient_intake.config import INTAKE_DB_PATH, LEGACY_DATA_PATH
+
+SCHEMA_VERSION = 3
+# Returning-client lookups kept in memory per process
+LOOKUP_CACHE_SIZE = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intakes (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    owner_firstname TEXT NOT NULL,
+    owner_lastname TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT NOT NULL,
+    patient_name TEXT NOT NULL,
+    patient_name_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    extra_fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intakes_phone ON intakes (phone);
+CREATE INDEX IF NOT EXISTS intakes_email ON intakes (email);
+CREATE INDEX IF NOT EXISTS intakes_patient_name ON intakes (patient_name_key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Applied in order to databases whose user_version is below the target version
+_MIGRATIONS = {
+    2: """
+ALTER TABLE intakes ADD COLUMN phone_hash TEXT NOT NULL DEFAULT '';
+ALTER TABLE intakes ADD COLUMN email_hash TEXT NOT NULL DEFAULT '';
+CREATE INDEX intakes_phone_hash ON intakes (phone_hash);
+CREATE INDEX intakes_email_hash ON intakes (email_hash);
+""",
+    3: """
+CREATE INDEX intakes_created_at ON intakes (created_at);
+""",
+}
+
+
+def normalize_phone(phone: str | None) -> str:
+    """Digits only, without a leading US country code."""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[1:] if len(digits) == 11 and digits.startswith("1") else digits
+
+
+def normalize_email(email: str | None) -> str:
+    """Trimmed, lower-case email address."""
+    return (email or "").strip().lower()
+
+
+def lookup_key(normalized: str) -> str:
+    """Hashed index key for a normalized phone or email ("" stays "")."""
+    return hashlib.sha256(normalized.encode()).hexdigest() if normalized else ""
+
+
+def _legacy_to_intake(record: dict) -> tuple[dict, dict]:
+    """Map one ``data.json`` entry (payload-shaped or old display-keyed) to payload/extras."""
+    if "patient_name" in record:
+        return record, {}
+    first, _, last = (record.get("Full Name") or "").strip().partition(" ")
+    payload = {
+        "patient_owner_firstname": first,
+        "patient_owner_lastname": last,
+        "address": record.get("Address", ""),
+        "email": record.get("Email", ""),
+        "phone": record.get("Phone number") or record.get("Phone", ""),
+        "patient_name": record.get("Patient name") or record.get("Pet Name", ""),
+    }
+    return payload, {"breed_not_listed": record.get("Breed", ""), "legacy": record}
+
+
+def _decode(row: sqlite3.Row) -> dict:
+    return {
+        **dict(row),
+        "payload": json.loads(row["payload"]),
+        "extra_fields": json.loads(row["extra_fields"]),
+    }
+
+
+class IntakeStore:
+    """SQLite-backed intake history with one connection per thread."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._returning_owner = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._latest_for_owner)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Create the base (version 1) schema, then apply pending ``_MIGRATIONS``."""
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        for target in range(2, SCHEMA_VERSION + 1):
+            # Take the write lock before checking, so concurrent processes migrate once
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                    conn.rollback()
+                    continue
+                for statement in filter(str.strip, _MIGRATIONS[target].split(";")):
+                    conn.execute(statement)
+                if target == 2:
+                    self._backfill_hashes(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @staticmethod
+    def _backfill_hashes(conn: sqlite3.Connection) -> None:
+        rows = conn.execute("SELECT id, phone, email FROM intakes").fetchall()
+        conn.executemany(
+            "UPDATE intakes SET phone_hash = ?, email_hash = ? WHERE id = ?",
+            [(lookup_key(row["phone"]), lookup_key(row["email"]), row["id"]) for row in rows],
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append_visit(
+        self, payloads: list[dict], extra_fields_list: list[dict], source: str = "app"
+    ) -> list[int]:
+        """
+        Append one row per pet of a visit in a single transaction.
+
+        Returns:
+            The new row IDs
+        """
+        with self._connection() as conn:
+            ids = self._insert(conn, payloads, extra_fields_list, source)
+        self._returning_owner.cache_clear()
+        return ids
+
+    @staticmethod
+    def _insert(
+        conn: sqlite3.Connection, payloads: list[dict], extra_fields_list: list[dict], source: str
+    ) -> list[int]:
+        created_at = datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for payload, extra_fields in zip(payloads, extra_fields_list, strict=True):
+            phone = normalize_phone(payload.get("phone") or payload.get("patient_phone"))
+            email = normalize_email(payload.get("email") or payload.get("patient_email"))
+            rows.append(
+                (
+                    created_at,
+                    source,
+                    payload.get("patient_owner_firstname", "") or "",
+                    payload.get("patient_owner_lastname", "") or "",
+                    phone,
+                    lookup_key(phone),
+                    email,
+                    lookup_key(email),
+                    payload.get("patient_name", "") or "",
+                    (payload.get("patient_name", "") or "").strip().lower(),
+                    json.dumps(payload),
+                    json.dumps(extra_fields),
+                )
+            )
+        ids = []
+        for row in rows:
+            cursor = conn.execute(
+                "INSERT INTO intakes (created_at, source, owner_firstname, owner_lastname,"
+                " phone, phone_hash, email, email_hash, patient_name, patient_name_key,"
+                " payload, extra_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            # Always set after an INSERT into a rowid table
+            assert cursor.lastrowid is not None
+            ids.append(cursor.lastrowid)
+        return ids
+
+    def _find(self, column: str, value: str, limit: int) -> list[dict]:
+        rows = self._connection().execute(
+            f"SELECT * FROM intakes WHERE {column} = ? ORDER BY id DESC LIMIT ?", (value, limit)
+        )
+        return [_decode(row) for row in rows]
+
+    def find_by_phone(self, phone: str, limit: int = 50) -> list[dict]:
+        """Intakes for a phone number (any formatting), newest first."""
+        key = lookup_key(normalize_phone(phone))
+        return self._find("phone_hash", key, limit) if key else []
+
+    def find_by_email(self, email: str, limit: int = 50) -> list[dict]:
+        """Intakes for an email address (case-insensitive), newest first."""
+        key = lookup_key(normalize_email(email))
+        return self._find("email_hash", key, limit) if key else []
+
+    def returning_owner(self, phone_or_email: str, last_name: str) -> dict | None:
+        """
+        Newest intake for a phone number or email address, for prefilling the owner.
+
+        The owner's last name must match too (case-insensitively), so knowing a phone
+        number or email alone is not enough. One indexed query on the hashed key;
+        results are LRU-cached until the next append.
+
+        Returns:
+            The intake row (as from ``find_by_phone``), or None if there is no match
+        """
+        value = phone_or_email.strip()
+        name = last_name.strip().casefold()
+        if "@" in value:
+            return self._returning_owner("email_hash", lookup_key(normalize_email(value)), name)
+        return self._returning_owner("phone_hash", lookup_key(normalize_phone(value)), name)
+
+    def _latest_for_owner(self, column: str, key: str, last_name: str) -> dict | None:
+        if not key or not last_name:
+            return None
+        rows = self._connection().execute(
+            f"SELECT * FROM intakes WHERE {column} = ? ORDER BY id DESC", (key,)
+        )
+        for row in rows:
+            if row["owner_lastname"].strip().casefold() == last_name:
+                return _decode(row)
+        return None
+
+    def find_by_pet_name(self, patient_name: str, limit: int = 50) -> list[dict]:
+        """Intakes for a pet name (case-insensitive, exact), newest first."""
+        key = patient_name.strip().lower()
+        return self._find("patient_name_key", key, limit) if key else []
+
+    def iter_intakes(
+        self, after_id: int = 0, start: date | None = None, end: date | None = None
+    ) -> Iterator[dict]:
+        """
+        Stream intakes with ``id > after_id`` created between ``start`` and ``end``.
+
+        Rows come from one cursor in index order (by date if a range is given, else by
+        ID), so memory stays constant however large the history is.
+
+        Args:
+            after_id: Only intakes stored after this row ID (0 for all)
+            start: First day to include
+            end: Last day to include
+
+        Yields:
+            Intake rows, as from ``find_by_phone``
+        """
+        clauses = ["id > ?"]
+        params: list[object] = [after_id]
+        if start:
+            clauses.append("created_at >= ?")
+            params.append(start.isoformat())
+        if end:
+            clauses.append("created_at < ?")
+            params.append((end + timedelta(days=1)).isoformat())
+        order = "created_at, id" if start or end else "id"
+        cursor = self._connection().execute(
+            f"SELECT * FROM intakes WHERE {' AND '.join(clauses)} ORDER BY {order}", params
+        )
+        while rows := cursor.fetchmany(500):
+            yield from map(_decode, rows)
+
+    def get_meta(self, key: str) -> str | None:
+        """Value stored under ``key`` in the meta table, if any."""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Store ``value`` under ``key`` in the meta table."""
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def count(self) -> int:
+        """Number of stored intakes (pets)."""
+        count: int = self._connection().execute("SELECT COUNT(*) FROM intakes").fetchone()[0]
+        return count
+
+    def import_legacy_json(self, path: Path) -> int:
+        """
+        Import a legacy ``data.json`` list once; later calls are no-ops.
+
+        Returns:
+            Number of records imported by this call
+        """
+        path = Path(path)
+        marker = f"legacy_import:{path.resolve()}"
+        conn = self._connection()
+        if not path.exists():
+            return 0
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+        pairs = [_legacy_to_intake(record) for record in json.loads(path.read_text() or "[]")]
+        with conn:
+            # Marker and rows commit together, so a second process can't import twice
+            claimed = conn.execute("INSERT OR IGNORE INTO meta VALUES (?, ?)", (marker, "1"))
+            if claimed.rowcount == 0:
+                return 0
+            self._insert(conn, [p for p, _ in pairs], [e for _, e in pairs], "legacy")
+        self._returning_owner.cache_clear()
+        return len(pairs)
+
+
+@lru_cache(maxsize=1)
+def get_intake_store() -> IntakeStore:
+    """Process-wide store at ``INTAKE_DB_PATH``, with the legacy data.json imported."""
+    store = IntakeStore(INTAKE_DB_PATH)
+    store.import_legacy_json(LEGACY_DATA_PATH)
+    return store
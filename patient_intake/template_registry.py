@@ -0,0 +1,236 @@
+"""Registry of clinic PDF forms and their layout specs, with hot reload.
+
+Each form type maps to a template PDF and a ``FormLayout`` saying where intake
+fields go. Template bytes are read and validated once and kept in memory; a
+changed file (mtime or size) is picked up on the next lookup after
+``TEMPLATE_RELOAD_SECONDS``, without restarting the server.
+
+The process-wide registry also goes through the host ``snapshot``: a template
+version another process has already validated is used straight from shared
+memory, and a newly loaded one is published there for the others.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+import fitz
+
+from patient_intake.config import (
+    HISTORY_FORM_TEMPLATE_PATH,
+    PDF_TEMPLATE_PATH,
+    TEMPLATE_RELOAD_SECONDS,
+)
+from patient_intake.snapshot import SharedSnapshot, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FormLayout:
+    """
+    Where intake fields go on a template.
+
+    Attributes:
+        text: Field name -> (x, y) baseline of overlaid text on ``page``
+        marks: Field name -> {value: [(x, y), ...]} where to draw "X" for that value
+        widgets: AcroForm widget name -> field name; filled, then flattened
+        page: Page index for ``text`` and ``marks``
+        font_size: Font size for overlaid text and marks
+    """
+
+    text: dict[str, tuple[float, float]] = field(default_factory=dict)
+    marks: dict[str, dict[str, list[tuple[float, float]]]] = field(default_factory=dict)
+    widgets: dict[str, str] = field(default_factory=dict)
+    page: int = 0
+    font_size: float = 10
+
+
+# Client Information Sheet (the "Client Information Sheet - CR, QC 2025" PDF)
+INTAKE_LAYOUT = FormLayout(
+    text={
+        # === CLIENT INFO ===
+        "owner_firstname": (207, 173),
+        "owner_lastname": (391, 173),
+        "sec_owner_firstname": (207, 193),
+        "sec_owner_lastname": (391, 193),
+        "address": (91, 217),
+        "city": (330, 217),
+        "state": (448, 217),
+        "zip": (511, 217),
+        "phone": (121, 236),
+        "email": (116, 298),
+        "work_no": (386, 233),
+        "alt_no": (137, 254),
+        "employer": (442, 254),
+        "drive_lic": (213, 276),
+        "owner_dob": (493, 277),
+        # === PET INFO ===
+        "patient_name": (85, 358),
+        "species": (483, 359),
+        "breed": (80, 379),
+        "breed_not_listed": (175, 379),
+        "birthday": (483, 401),
+        "age": (400, 380),
+        "color": (287, 378),
+        "doctor": (88, 458),
+        "clinic_name": (308, 458),
+    },
+    marks={
+        "prev_visit": {"Yes": [(230, 318)], "No": [(270, 318)]},
+        "pet_prev_visit": {"Yes": [(260, 420)], "No": [(296, 420)]},
+        "sex": {
+            "Male": [(136, 403), (335, 403)],
+            "Female": [(82, 403), (335, 403)],
+            "Castrated male": [(136, 403), (299, 403)],
+            "Spayed female": [(82, 403), (299, 403)],
+        },
+    },
+)
+
+# Animal Eye Iowa History Form: only the page-1 header fields come from the intake;
+# the medical history questions are left for the owner to complete.
+HISTORY_LAYOUT = FormLayout(
+    widgets={
+        "Text1": "owner_name",
+        "Text2": "full_address",
+        "Text3": "patient_name",
+        "Text4": "species",
+        "Text5": "breed_or_unlisted",
+        "Text6": "sex",
+        "Text7": "age",
+        "Text10": "date",
+        "Text11": "email",
+        "Text12": "phone",
+    },
+)
+
+
+@dataclass
+class _Template:
+    path: Path
+    layout: FormLayout
+    data: bytes | memoryview = b""
+    signature: tuple[int, int] | None = None
+    checked_at: float = 0.0
+
+
+class TemplateRegistry:
+    """Thread-safe map of form type -> (template bytes, layout) with hot reload."""
+
+    def __init__(
+        self,
+        reload_interval: float = TEMPLATE_RELOAD_SECONDS,
+        snapshot: SharedSnapshot | None = None,
+    ):
+        self.reload_interval = reload_interval
+        self.snapshot = snapshot
+        self._templates: dict[str, _Template] = {}
+        self._lock = threading.Lock()
+
+    def register(self, form_type: str, path: Path, layout: FormLayout) -> None:
+        """Register (or replace) a form type; the file is read on first use."""
+        with self._lock:
+            self._templates[form_type] = _Template(Path(path), layout)
+
+    def form_types(self) -> list[str]:
+        """Registered form types, in registration order."""
+        with self._lock:
+            return list(self._templates)
+
+    def get(self, form_type: str) -> tuple[bytes | memoryview, FormLayout]:
+        """
+        Return the in-memory template bytes and layout for a form type.
+
+        Raises:
+            KeyError: If the form type is not registered
+            ValueError: If the template has never loaded successfully
+        """
+        with self._lock:
+            if form_type not in self._templates:
+                raise KeyError(f"Unknown form type: {form_type!r}")
+            template = self._templates[form_type]
+            now = time.monotonic()
+            if not template.data or now - template.checked_at >= self.reload_interval:
+                template.checked_at = now
+                self._reload_if_changed(form_type, template)
+            return template.data, template.layout
+
+    def warm(self) -> None:
+        """Load every registered template now instead of on first render."""
+        for form_type in self.form_types():
+            self.get(form_type)
+
+    def _reload_if_changed(self, form_type: str, template: _Template) -> None:
+        stat = template.path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == template.signature:
+            return
+        # Already validated by the process that published it
+        shared = (
+            self.snapshot.template(form_type, template.path, signature) if self.snapshot else None
+        )
+        data: bytes | memoryview
+        if shared is not None:
+            data = shared
+        else:
+            data = template.path.read_bytes()
+            try:
+                _validate(data, template.layout)
+            except ValueError:
+                if not template.data:
+                    raise
+                logger.exception("Keeping previous %s template; reload failed", form_type)
+                return
+            data = self._share(form_type, template.path, signature, data)
+        if template.data:
+            logger.info("Reloaded %s template from %s", form_type, template.path)
+        template.data = data
+        template.signature = signature
+
+    def _share(
+        self, form_type: str, path: Path, signature: tuple[int, int], data: bytes
+    ) -> bytes | memoryview:
+        """
+        Publish a validated template to the snapshot.
+
+        Returns:
+            The shared copy, so this process holds no private one; ``data`` itself
+            if there is no snapshot or publishing failed
+        """
+        if not self.snapshot:
+            return data
+        try:
+            self.snapshot.publish(templates={form_type: (path, signature, data)})
+        except OSError:
+            logger.exception("Could not share the %s template", form_type)
+            return data
+        return self.snapshot.template(form_type, path, signature) or data
+
+
+def _validate(data: bytes, layout: FormLayout) -> None:
+    """Parse the template once and check it matches its layout."""
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+    except Exception as exc:
+        raise ValueError(f"Template is not a readable PDF: {exc}") from exc
+    with doc:
+        if layout.page >= len(doc):
+            raise ValueError(f"Template has no page {layout.page}")
+        if layout.widgets:
+            names = {widget.field_name for page in doc for widget in page.widgets()}
+            missing = set(layout.widgets) - names
+            if missing:
+                raise ValueError(f"Template is missing form fields: {sorted(missing)}")
+
+
+@lru_cache(maxsize=1)
+def get_template_registry() -> TemplateRegistry:
+    """Process-wide registry with the clinic's forms registered."""
+    registry = TemplateRegistry(snapshot=get_snapshot())
+    registry.register("intake", PDF_TEMPLATE_PATH, INTAKE_LAYOUT)
+    registry.register("history", HISTORY_FORM_TEMPLATE_PATH, HISTORY_LAYOUT)
+    return registry
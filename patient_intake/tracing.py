@@ -0,0 +1,154 @@
+"""Structured trace events tagged with a per-submission correlation ID."""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cache, partial
+from logging.handlers import QueueHandler, QueueListener
+
+from patient_intake import metrics
+from patient_intake.config import TRACE_QUEUE_SIZE, TRACE_SAMPLE_RATE
+
+logger = logging.getLogger("patient_intake.trace")
+
+_dropped = metrics.counter(
+    "intake_trace_events_dropped_total", "Trace events dropped because the log queue was full"
+)
+
+
+@dataclass(frozen=True)
+class _Trace:
+    correlation_id: str
+    sampled: bool
+
+
+_current: ContextVar[_Trace | None] = ContextVar("intake_trace", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, event, correlation ID and fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "event": getattr(record, "event", None) or record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller and leaves formatting to the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped.inc()
+
+
+@cache
+def _start_listener() -> QueueListener:
+    """
+    Attach the queue handler and start the writer thread, once per process.
+
+    Events are written as one JSON object per line on stderr. ``event()`` only puts
+    the record on a queue of ``TRACE_QUEUE_SIZE``; formatting and writing happen on
+    the listener thread, and events are dropped (and counted) rather than block
+    when the queue is full.
+    """
+    records: queue.Queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter())
+    listener = QueueListener(records, stream)
+    logger.addHandler(_DroppingQueueHandler(records))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def correlation_id() -> str | None:
+    """Correlation ID of the current submission, if any."""
+    current = _current.get()
+    return current.correlation_id if current else None
+
+
+@contextmanager
+def trace(
+    correlation_id: str | None = None, sample_rate: float = TRACE_SAMPLE_RATE
+) -> Iterator[str]:
+    """
+    Run the enclosed code as one traced submission.
+
+    The correlation ID is kept in a context variable, where ``event()`` and
+    ``correlation_id()`` find it; ``with_trace`` carries it into worker threads.
+    It is also sent to the backend and in the email headers as ``X-Correlation-ID``.
+    Sampling is decided once here, so a sampled submission is logged completely.
+
+    Args:
+        correlation_id: ID to use (default: a new random one)
+        sample_rate: Probability that this submission's info-level events are logged
+
+    Yields:
+        The correlation ID
+    """
+    current = _Trace(correlation_id or uuid.uuid4().hex[:16], random.random() < sample_rate)
+    token = _current.set(current)
+    try:
+        yield current.correlation_id
+    finally:
+        _current.reset(token)
+
+
+def with_trace(fn: Callable) -> Callable:
+    """``fn`` bound to a copy of the current context, for handing to an executor."""
+    return partial(copy_context().run, fn)
+
+
+def event(name: str, level: int = logging.INFO, **fields) -> None:
+    """
+    Log a structured event for the current submission.
+
+    Info-level events of unsampled submissions return before a log record is
+    built; outside ``trace()`` each event is sampled on its own.
+
+    Args:
+        name: Event name, e.g. "backend.post"
+        level: Logging level
+        **fields: JSON-serialisable values to include (no patient or owner data)
+    """
+    current = _current.get()
+    if level < logging.WARNING:
+        sampled = current.sampled if current else random.random() < TRACE_SAMPLE_RATE
+        if not sampled:
+            return
+    _start_listener()
+    logger.log(
+        level,
+        name,
+        extra={
+            "event": name,
+            "correlation_id": current.correlation_id if current else None,
+            "fields": fields,
+        },
+    )
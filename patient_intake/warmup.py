@@ -0,0 +1,144 @@
+"""Startup warm-up and readiness probe.
+
+At server boot the catalogue cache, the PDF template/renderer and the backend
+connections are primed in a background thread, so no visitor takes the cold path.
+A small HTTP server on ``HEALTH_PORT`` exposes:
+
+- ``/live``  200 as soon as the process is up
+- ``/ready`` 200 once warm-up has finished, 503 until then (for the ALB / Docker)
+- ``/metrics`` Prometheus text metrics (see ``metrics``)
+"""
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from streamlit import runtime
+
+from patient_intake import metrics, sessions
+from patient_intake.api_client import fetch_reference_data, warm_up_connections
+from patient_intake.config import HEALTH_PORT
+from patient_intake.pdf_generator import warm_up_renderer
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait between catalogue attempts while the backend is unreachable
+RETRY_DELAYS = (1, 2, 5, 10, 30)
+
+_ready = threading.Event()
+_steps: dict[str, str] = {}
+_started = threading.Lock()
+_start_done = False
+
+
+def is_ready() -> bool:
+    """Whether warm-up has completed and the app can take traffic."""
+    return _ready.is_set()
+
+
+def readiness() -> dict:
+    """Readiness summary: overall flag plus the status of each warm-up step."""
+    return {"ready": is_ready(), "steps": dict(_steps)}
+
+
+def _run_step(name: str, func) -> bool:
+    _steps[name] = "running"
+    started = time.monotonic()
+    try:
+        result = func()
+    except Exception:
+        logger.exception("Warm-up step %s failed", name)
+        _steps[name] = "failed"
+        return False
+    if result is False:
+        _steps[name] = "failed"
+        return False
+    _steps[name] = "ok"
+    logger.info("Warm-up step %s done in %.2fs", name, time.monotonic() - started)
+    return True
+
+
+def _prime_catalogue() -> bool:
+    species_map, breed_map, sex_map = fetch_reference_data()
+    if species_map and breed_map and sex_map:
+        return True
+    # Don't leave the empty failure result cached for the next hour
+    fetch_reference_data.clear()
+    return False
+
+
+def warm_up() -> None:
+    """
+    Prime the template, catalogue cache and backend connections, then mark ready.
+
+    The catalogue is retried with backoff until the backend answers, since the form
+    is unusable without it. Connection warm-up is best effort.
+    """
+    _run_step("template", warm_up_renderer)
+    attempt = 0
+    while not _run_step("catalogue", _prime_catalogue):
+        delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
+        attempt += 1
+        time.sleep(delay)
+    _run_step("connections", warm_up_connections)
+    _ready.set()
+
+
+def _wait_for_runtime(timeout: float = 60.0) -> None:
+    """Block until the Streamlit runtime exists, so caches land in its storage."""
+    deadline = time.monotonic() + timeout
+    while not runtime.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/live":
+            self._reply(200, {"live": True})
+        elif self.path == "/ready":
+            self._reply(200 if is_ready() else 503, readiness())
+        elif self.path == "/metrics":
+            self._send(200, metrics.render().encode(), "text/plain; version=0.0.4")
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _reply(self, status: int, body: dict) -> None:
+        self._send(status, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        # Probes hit this every few seconds; keep them out of the server log
+        pass
+
+
+def start_health_server(port: int = HEALTH_PORT) -> ThreadingHTTPServer:
+    """Serve /live, /ready and /metrics on a daemon thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _HealthHandler)
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    return server
+
+
+def start() -> None:
+    """Start the health server, the session reaper and the background warm-up (idempotent)."""
+    global _start_done
+    with _started:
+        if _start_done:
+            return
+        _start_done = True
+
+    start_health_server()
+    sessions.start_reaper()
+
+    def _boot() -> None:
+        _wait_for_runtime()
+        warm_up()
+
+    threading.Thread(target=_boot, name="warm-up", daemon=True).start()
@@ -2,6 +2,32 @@
 
 import pytest
 
+from patient_intake import snapshot
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    """Clock that only moves when a test sets ``now``."""
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    """Keep the shared snapshot out of the host's real ``SNAPSHOT_DIR``."""
+    directory = tmp_path / "snapshot"
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", directory)
+    snapshot.get_snapshot.cache_clear()
+    yield directory
+    snapshot.get_snapshot.cache_clear()
+
 
 @pytest.fixture
 def sample_form_data():
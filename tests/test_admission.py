@@ -0,0 +1,108 @@
+"""Tests for Submit admission control."""
+
+import pytest
+
+from patient_intake.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    LookupLimiter,
+    TokenBucket,
+)
+
+
+def _controller(clock, **overrides):
+    limits = {
+        "client_per_minute": 6,
+        "client_burst": 2,
+        "process_per_minute": 600,
+        "process_burst": 100,
+        "max_in_flight": 8,
+    }
+    return AdmissionController(**{**limits, **overrides}, clock=clock)
+
+
+def test_token_bucket_refills(fake_clock):
+    """Test that a drained bucket refills at its rate, capped at the burst size."""
+    bucket = TokenBucket(rate=0.5, burst=2, clock=fake_clock)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(2.0)
+
+    fake_clock.now = 2.0
+    assert bucket.try_acquire()
+    fake_clock.now = 100.0
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+
+def test_client_limit_is_per_client(fake_clock):
+    """Test that one client hitting its limit does not affect another."""
+    controller = _controller(fake_clock)
+    for _ in range(2):
+        controller.acquire("10.0.0.1")
+        controller.release()
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire("10.0.0.1")
+    assert excinfo.value.reason == "client rate limit"
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+
+    controller.acquire("10.0.0.2")
+    fake_clock.now = 10.0
+    controller.acquire("10.0.0.1")
+
+
+def test_process_limit_applies_across_clients(fake_clock):
+    """Test that the process bucket caps the total rate from many clients."""
+    controller = _controller(fake_clock, process_burst=3)
+    for n in range(3):
+        controller.acquire(f"client-{n}")
+        controller.release()
+    with pytest.raises(AdmissionRejected, match="server rate limit"):
+        controller.acquire("client-3")
+
+
+def test_in_flight_cap_released_on_finish(fake_clock):
+    """Test that the in-flight cap rejects overlap and frees slots on release."""
+    controller = _controller(fake_clock, max_in_flight=2)
+    controller.acquire("a")
+    controller.acquire("b")
+    with pytest.raises(AdmissionRejected, match="in progress"):
+        controller.acquire("c")
+    assert controller.in_flight == 2
+
+    controller.release()
+    controller.acquire("d")
+    assert controller.in_flight == 2
+
+
+def test_lookup_limit_is_per_client_not_per_session(fake_clock):
+    """Test that a client's lookups run out however many tabs it opens, and refill."""
+    limiter = LookupLimiter(per_hour=60, burst=3, clock=fake_clock)
+    for _ in range(3):
+        limiter.acquire("10.0.0.1")
+    with pytest.raises(AdmissionRejected, match="lookup") as excinfo:
+        limiter.acquire("10.0.0.1")
+    assert excinfo.value.retry_after == pytest.approx(60.0)
+
+    limiter.acquire("10.0.0.2")
+    fake_clock.now = 60.0
+    limiter.acquire("10.0.0.1")
+
+
+def test_rejected_submission_is_refunded(fake_clock):
+    """Test that tokens taken before a later check rejects are given back."""
+    controller = _controller(fake_clock, client_burst=2, process_burst=2, max_in_flight=1)
+    controller.acquire("a")
+    for _ in range(2):
+        with pytest.raises(AdmissionRejected, match="in progress"):
+            controller.acquire("b")
+    controller.release()
+
+    # The process bucket still had a token for "b", and "b" still has both of its own
+    controller.acquire("b")
+    controller.release()
+    with pytest.raises(AdmissionRejected, match="server rate limit"):
+        controller.acquire("b")
+    fake_clock.now = 0.1
+    controller.acquire("b")
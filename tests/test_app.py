@@ -0,0 +1,171 @@
+"""Tests for the Submit flow and returning-client prefill of the Streamlit app."""
+
+import io
+from concurrent.futures import Future
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from patient_intake import app
+from patient_intake.admission import AdmissionController, LookupLimiter
+from patient_intake.archive import IntakeArchive
+from patient_intake.storage import IntakeStore
+
+
+def _run_app():
+    from patient_intake import app
+
+    app.main()
+
+
+class _Response:
+    def __init__(self, status_code, result):
+        self.status_code = status_code
+        self._result = result
+        self.text = str(result)
+        self.headers = {"Content-Type": "application/json"}
+        self.content = self.text.encode()
+
+    def json(self):
+        return self._result
+
+
+class _Render(Future):
+    def __init__(self, payloads):
+        super().__init__()
+        self.payloads = payloads
+        self.cancel_called = False
+        self.set_result(io.BytesIO(b"%PDF-1.7 visit"))
+
+    def cancel(self):
+        self.cancel_called = True
+        return super().cancel()
+
+
+@pytest.fixture
+def stubs(monkeypatch, tmp_path):
+    """Stub the catalogue, backend, renderer and email; keep storage in tmp_path."""
+    calls = {"renders": [], "emails": [], "responses": {}}
+
+    def render(payloads, extra_fields_list, species_map, breed_map, sex_map):
+        calls["renders"].append(_Render([payload["patient_name"] for payload in payloads]))
+        return calls["renders"][-1]
+
+    def submit(payloads, deadline=None):
+        return [calls["responses"][payload["patient_name"]] for payload in payloads]
+
+    def dispatch(**kwargs):
+        calls["emails"].append(kwargs)
+        return True
+
+    store = IntakeStore(tmp_path / "intakes.db")
+    archive = IntakeArchive(tmp_path / "archive")
+    admission = AdmissionController(60, 10, 60, 10, 4)
+    lookups = LookupLimiter(per_hour=60, burst=10)
+    monkeypatch.setattr(
+        app,
+        "fetch_reference_data",
+        lambda: ({"Canine": 1, "Feline": 2}, {"Labrador": 1}, {"Male": 1}),
+    )
+    monkeypatch.setattr(app, "render_visit_pdf_async", render)
+    monkeypatch.setattr(app, "submit_patients", submit)
+    monkeypatch.setattr(app, "dispatch_visit_email", dispatch)
+    monkeypatch.setattr(app, "get_intake_store", lambda: store)
+    monkeypatch.setattr(app, "get_archive", lambda: archive)
+    monkeypatch.setattr(app, "get_admission_controller", lambda: admission)
+    monkeypatch.setattr(app, "get_lookup_limiter", lambda: lookups)
+    monkeypatch.setattr(app, "client_key", lambda: "test-client")
+    calls["store"] = store
+    return calls
+
+
+def _start():
+    at = AppTest.from_function(_run_app, default_timeout=30)
+    at.session_state["captcha_passed"] = True
+    return at.run()
+
+
+def _text_input(at, label):
+    return next(widget for widget in at.text_input if widget.label == label)
+
+
+def _fill_visit(at, pet_names):
+    for _ in pet_names[1:]:
+        next(button for button in at.button if button.label == "Add another pet").click().run()
+    _text_input(at, "Full Name (First and Last):").set_value("John Doe")
+    _text_input(at, "Phone number (10 digits):").set_value("5551234567")
+    _text_input(at, "Zip Code:").set_value("50309")
+    pets = [widget for widget in at.text_input if widget.label == "Pet Name:"]
+    for widget, name in zip(pets, pet_names, strict=True):
+        widget.set_value(name)
+    next(box for box in at.checkbox if box.label.startswith("I confirm")).check()
+    at.run()
+    return next(button for button in at.button if button.label == "Submit").click().run()
+
+
+def test_submit_emails_only_accepted_pets(stubs):
+    """Test that a pet the backend rejects is left out of the re-rendered PDF and email."""
+    stubs["responses"] = {
+        "Rex": _Response(200, {"result": "success", "patient_id": 101}),
+        "Tom": _Response(200, {"result": "error", "message": "duplicate patient"}),
+    }
+    at = _fill_visit(_start(), ["Rex", "Tom"])
+
+    assert not at.exception
+    assert [e.value for e in at.error] == ["API Error (Tom): duplicate patient"]
+    assert [s.value for s in at.success] == ["Patient Rex uploaded successfully! ID: 101"]
+    first, rerender = stubs["renders"]
+    assert first.payloads == ["Rex", "Tom"] and first.cancel_called
+    assert rerender.payloads == ["Rex"] and not rerender.cancel_called
+    (email,) = stubs["emails"]
+    assert [payload["patient_name"] for payload in email["payloads"]] == ["Rex"]
+    assert email["filename"] == "Rex_intake_form.pdf"
+    assert email["pdf_bytes"] == b"%PDF-1.7 visit"
+
+
+def test_all_pets_rejected_discards_the_render(stubs):
+    """Test that the speculative render is cancelled and nothing is emailed or saved."""
+    stubs["responses"] = {
+        "Rex": _Response(500, {"result": "error", "message": "backend down"}),
+        "Tom": ConnectionError("connection reset"),
+    }
+    at = _fill_visit(_start(), ["Rex", "Tom"])
+
+    assert not at.exception
+    assert len(at.error) == 2
+    assert not at.success
+    (render,) = stubs["renders"]
+    assert render.cancel_called
+    assert stubs["emails"] == []
+    assert stubs["store"].count() == 0
+
+
+def _look_up(at, value, last_name):
+    _text_input(at, "Phone or email from your last visit:").set_value(value)
+    _text_input(at, "Your last name:").set_value(last_name)
+    return (
+        next(button for button in at.button if button.label == "Fill in my details").click().run()
+    )
+
+
+def test_prefill_fills_owner_details_for_a_returning_client(
+    stubs, sample_form_data, sample_extra_fields
+):
+    """Test that a matching phone and last name fill in the owner fields."""
+    stubs["store"].append_visit([sample_form_data], [sample_extra_fields])
+    at = _look_up(_start(), "(555) 123-4567", "doe")
+
+    assert [i.value for i in at.info] == ["Welcome back! Please check your details below."]
+    assert _text_input(at, "Full Name (First and Last):").value == "John Doe"
+    assert _text_input(at, "Email address:").value == "john@example.com"
+    assert _text_input(at, "Employer:").value == "Acme Corp"
+    assert _text_input(at, "Driver's License (IF writing check):").value == ""
+
+
+def test_prefill_miss_leaves_the_form_empty(stubs, sample_form_data, sample_extra_fields):
+    """Test that a wrong last name finds nothing and prefills nothing."""
+    stubs["store"].append_visit([sample_form_data], [sample_extra_fields])
+    at = _look_up(_start(), "5551234567", "Smith")
+
+    assert [i.value for i in at.info] == ["No previous visit found; please fill in your details."]
+    assert _text_input(at, "Full Name (First and Last):").value == ""
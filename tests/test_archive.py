@@ -0,0 +1,132 @@
+"""Tests for the content-addressed intake archive."""
+
+from datetime import date
+
+import pytest
+
+from patient_intake import archive as archive_module
+from patient_intake.archive import IntakeArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return IntakeArchive(tmp_path / "archive")
+
+
+def _archive_visit(archive, payload, extra, species_map, breed_map, sex_map, pdf=b"%PDF-1.7 a"):
+    return archive.archive_visit(pdf, [payload], [extra], [42], species_map, breed_map, sex_map)
+
+
+def test_put_deduplicates(archive):
+    """Test that identical bytes are stored once under the same hash."""
+    first = archive.put(b"same bytes")
+    second = archive.put(b"same bytes")
+    assert first == second
+    assert len([p for p in archive.objects_dir.rglob("*") if p.is_file()]) == 1
+    assert archive.get(first) == b"same bytes"
+
+
+def test_archive_visit_lookup(
+    archive,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that an archived visit can be found by pet name, date and patient ID."""
+    visit_id = _archive_visit(
+        archive,
+        sample_form_data,
+        sample_extra_fields,
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+
+    by_name = archive.find(patient_name="fluffy")
+    assert [row["visit_id"] for row in by_name] == [visit_id]
+    assert by_name[0]["owner_name"] == "John Doe"
+    assert archive.find(date=date.today().isoformat()) == by_name
+    assert archive.find(patient_id="42") == by_name
+    assert archive.find(patient_name="Rex") == []
+    assert archive.read_pdf(by_name[0]["pdf_hash"]) == b"%PDF-1.7 a"
+
+
+def test_archived_payload_round_trip(
+    archive,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that the stored payload keeps only the catalogue entries it uses."""
+    _archive_visit(
+        archive,
+        sample_form_data,
+        sample_extra_fields,
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+    row = archive.find(patient_name="Fluffy")[0]
+    record = archive.read_payload(row["payload_hash"])
+
+    assert record["payload"] == sample_form_data
+    assert record["extra_fields"] == sample_extra_fields
+    assert record["catalogue"] == {
+        "species": {"Canine": 1},
+        "breed": {"Labrador": 1},
+        "sex": {"Male": 1},
+    }
+
+
+def test_repeat_visit_shares_objects(
+    archive,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that re-archiving the same intake adds index rows but no new objects."""
+    args = (sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map)
+    _archive_visit(archive, *args, sample_sex_map)
+    objects = sorted(archive.objects_dir.rglob("*"))
+    _archive_visit(archive, *args, sample_sex_map)
+
+    assert sorted(archive.objects_dir.rglob("*")) == objects
+    rows = archive.find(patient_name="Fluffy")
+    assert len(rows) == 2
+    assert rows[0]["payload_hash"] == rows[1]["payload_hash"]
+
+
+def test_resend_names_multi_pet_visit_like_submit(
+    archive,
+    monkeypatch,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that a resent multi-pet visit keeps the attachment name Submit gave it."""
+    payloads = [sample_form_data, {**sample_form_data, "patient_name": "Rex"}]
+    visit_id = archive.archive_visit(
+        b"%PDF-1.7 a",
+        payloads,
+        [sample_extra_fields, sample_extra_fields],
+        [42, 43],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+    sent = {}
+    monkeypatch.setattr(
+        archive_module, "send_visit_email_with_pdf", lambda **kwargs: sent.update(kwargs) or True
+    )
+
+    assert archive_module._resend(archive, visit_id)
+    assert sent["filename"] == "Doe_2_pets_intake_form.pdf"
+    assert [p["patient_name"] for p in sent["payloads"]] == ["Fluffy", "Rex"]
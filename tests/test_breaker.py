@@ -0,0 +1,90 @@
+"""Tests for the circuit breaker and its metrics."""
+
+import pytest
+import requests
+
+from patient_intake import metrics
+from patient_intake.api_client import _request
+from patient_intake.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_breaker,
+)
+
+
+class FailingSession:
+    """Stands in for requests.Session; every request times out."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise requests.exceptions.ConnectTimeout("timed out")
+
+
+def test_opens_after_threshold_and_fails_fast(fake_clock):
+    """Test that consecutive failures open the breaker and later calls are rejected."""
+    breaker = CircuitBreaker("test-open", failure_threshold=3, reset_seconds=30, clock=fake_clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == pytest.approx(30)
+
+
+def test_success_resets_failure_count(fake_clock):
+    """Test that only consecutive failures count towards opening."""
+    breaker = CircuitBreaker("test-reset", failure_threshold=2, clock=fake_clock)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe(fake_clock):
+    """Test that after the reset period one probe goes through and decides the state."""
+    breaker = CircuitBreaker("test-probe", failure_threshold=1, reset_seconds=10, clock=fake_clock)
+    breaker.record_failure()
+    fake_clock.now = 10
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    fake_clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_state_published_as_metric(fake_clock):
+    """Test that breaker state shows up in the Prometheus output."""
+    breaker = CircuitBreaker("test-metric", failure_threshold=1, clock=fake_clock)
+    breaker.record_failure()
+    assert 'intake_circuit_breaker_state{breaker="test-metric"} 2.0' in metrics.render()
+
+
+def test_backend_requests_fail_fast_once_open():
+    """Test that the backend breaker stops sending after repeated timeouts."""
+    breaker = get_breaker("backend")
+    session = FailingSession()
+    try:
+        for _ in range(breaker.failure_threshold):
+            with pytest.raises(requests.exceptions.ConnectTimeout):
+                _request(session, "POST", "http://backend.invalid", timeout=1)
+        with pytest.raises(CircuitOpenError):
+            _request(session, "POST", "http://backend.invalid", timeout=1)
+        assert session.calls == breaker.failure_threshold
+    finally:
+        breaker.record_success()
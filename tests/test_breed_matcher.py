@@ -0,0 +1,67 @@
+"""Tests for the fuzzy breed matcher."""
+
+import pytest
+
+from patient_intake.breed_matcher import BreedMatch, BreedMatcher
+
+
+@pytest.fixture
+def matcher():
+    return BreedMatcher(
+        {
+            "German Shepherd": 10,
+            "Golden Retriever": 11,
+            "Labrador Retriever": 12,
+            "Domestic Shorthair": 13,
+            "French Bulldog": 14,
+        },
+        threshold=0.6,
+    )
+
+
+def test_misspelled_breed_resolves_to_catalogue_id(matcher):
+    """Test that a typo'd breed maps to the nearest catalogue breed."""
+    match = matcher.match("German Shephard")
+    assert match.breed_id == 10
+    assert match.name == "German Shepherd"
+    assert 0.6 <= match.score < 1
+
+
+def test_exact_name_ignores_case_and_punctuation(matcher):
+    """Test that formatting differences alone give a perfect score."""
+    assert matcher.match("  golden-RETRIEVER ").score == pytest.approx(1)
+
+
+def test_unrelated_text_is_below_threshold(matcher):
+    """Test that nothing is returned when no breed is similar enough."""
+    assert matcher.match("Axolotl") is None
+    assert matcher.match("") is None
+    assert matcher.match("!!!") is None
+
+
+def test_match_many_resolves_a_mixed_batch(matcher):
+    """Test that a batch mixing typos, near misses and junk gets each text's own result."""
+    expected = {
+        "German Shephard": 10,
+        "qqq": None,
+        "": None,
+        "french bull dog": 14,
+        "labrador": 12,
+        "Axolotl": None,
+        "Golden Retreiver": 11,
+        "domestic short hair": 13,
+    }
+    results = matcher.match_many(list(expected))
+    assert [result.breed_id if result else None for result in results] == list(expected.values())
+    assert all(result.score >= 0.6 for result in results if result)
+
+
+def test_empty_catalogue():
+    """Test that a matcher over no breeds never matches."""
+    assert BreedMatcher({}).match("German Shepherd") is None
+    assert BreedMatcher({}).match_many(["German Shepherd", ""]) == [None, None]
+
+
+def test_result_is_a_breed_match(matcher):
+    """Test that matches carry the catalogue name and ID."""
+    assert matcher.match("french bulldog") == BreedMatch(14, "French Bulldog", pytest.approx(1))
@@ -0,0 +1,122 @@
+"""Tests for recording and replaying backend and SMTP traffic."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from patient_intake import api_client, email_sender
+from patient_intake.cassette import Cassette, ReplayServer
+from patient_intake.config import SERVICE_TOKEN
+
+
+class _SlowBackend(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.2)
+        body = b'{"result": "error", "message": "Duplicate owner jane@example.com 5551234567"}'
+        self.send_response(409)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/api/external_patient_add.php"
+    server.shutdown()
+
+
+def test_backend_exchange_replays_with_its_latency(
+    tmp_path, monkeypatch, backend, sample_form_data
+):
+    """Test that a recorded submission is sanitized and replayed with the same answer and delay."""
+    cassette = Cassette(tmp_path / "backend.cassette")
+    monkeypatch.setattr(api_client, "get_recorder", lambda: cassette)
+    monkeypatch.setattr(api_client, "PATIENT_ADD_URL", backend)
+    recorded = api_client.submit_patient(sample_form_data)
+
+    text = cassette.path.read_text()
+    assert SERVICE_TOKEN not in text
+    assert sample_form_data["patient_name"] not in text
+    assert "jane@example.com" not in text and "5551234567" not in text
+    (exchange,), smtp = cassette.load()
+    assert smtp == []
+    assert exchange["path"] == "/api/external_patient_add.php"
+    assert exchange["elapsed"] >= 0.2
+
+    replay = ReplayServer(cassette).start()
+    try:
+        monkeypatch.setattr(api_client, "get_recorder", lambda: None)
+        monkeypatch.setattr(api_client, "PATIENT_ADD_URL", replay.http_url + exchange["path"])
+        started = time.perf_counter()
+        replayed = api_client.submit_patient(sample_form_data)
+        assert time.perf_counter() - started >= 0.2
+    finally:
+        replay.shutdown()
+    assert replayed.status_code == recorded.status_code == 409
+    assert replayed.json()["message"] == "Duplicate owner <email> <phone>"
+
+
+def _exchange(command, code, text, elapsed=0.0):
+    return {"command": command, "code": code, "text": text, "elapsed": elapsed}
+
+
+def test_smtp_session_replays_without_tls(
+    tmp_path, monkeypatch, sample_form_data, sample_extra_fields
+):
+    """Test that a TLS session replays in plain SMTP and records back the same conversation."""
+    source = Cassette(tmp_path / "smtp.cassette")
+    source.record_smtp(
+        [
+            _exchange("CONNECT", 220, "smtp.example.com ESMTP"),
+            _exchange("EHLO", 250, "smtp.example.com\nSTARTTLS", 0.05),
+            _exchange("STARTTLS", 220, "Ready to start TLS", 0.1),
+            _exchange("EHLO", 250, "smtp.example.com\nAUTH LOGIN PLAIN", 0.05),
+            _exchange("AUTH", 235, "Accepted"),
+            _exchange("MAIL", 250, "OK"),
+            _exchange("RCPT", 250, "OK"),
+            _exchange("DATA", 354, "Go ahead"),
+            _exchange(".", 250, "OK queued"),
+            _exchange("QUIT", 221, "Bye"),
+        ]
+    )
+    replay = ReplayServer(source).start()
+    rerecorded = Cassette(tmp_path / "rerecorded.cassette")
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(replay.smtp_port))
+    monkeypatch.setenv("SENDER_EMAIL", "desk@example.com")
+    monkeypatch.setenv("SENDER_PASSWORD", "secret")
+    monkeypatch.setenv("RECIPIENT_EMAIL", "vet@example.com")
+    monkeypatch.setattr(email_sender, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(email_sender, "get_recorder", lambda: rerecorded)
+    try:
+        sent = email_sender.send_email_with_pdf(
+            b"%PDF" * 1000,
+            "Fluffy.pdf",
+            "Fluffy",
+            sample_form_data,
+            sample_extra_fields,
+            {},
+            {},
+            {},
+        )
+    finally:
+        replay.shutdown()
+
+    assert sent
+    text = rerecorded.path.read_text()
+    assert "@" not in json.dumps([json.loads(line) for line in text.splitlines()])
+    _, (session,) = rerecorded.load()
+    commands = [exchange["command"] for exchange in session]
+    assert commands == ["CONNECT", "EHLO", "AUTH", "MAIL", "RCPT", "DATA", ".", "QUIT"]
+    assert session[1]["elapsed"] >= 0.2
+    assert session[6]["bytes"] > 4000
@@ -0,0 +1,80 @@
+"""Tests for the per-submission deadline."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from patient_intake import api_client
+from patient_intake.breaker import CLOSED, CircuitBreaker
+from patient_intake.deadline import Deadline, DeadlineExceeded
+from patient_intake.limiter import AdaptiveLimiter
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        time.sleep(2)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def slow_backend(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(api_client, "PATIENT_ADD_URL", f"http://127.0.0.1:{server.server_port}/")
+    yield
+    server.shutdown()
+
+
+def test_timeout_is_remaining_budget_capped(fake_clock):
+    """Test that each stage gets what is left of the budget, at most its own cap."""
+    deadline = Deadline(30, clock=fake_clock)
+    assert deadline.timeout("POST", 20) == 20
+    fake_clock.now = 25
+    assert deadline.timeout("POST", 20) == 5
+    fake_clock.now = 31
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="POST did not finish within the 30s"):
+        deadline.timeout("POST", 20)
+
+
+def test_result_gives_up_at_deadline():
+    """Test that waiting on a slow stage stops when the budget runs out."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(time.sleep, 1)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            Deadline(0.1).result(future, "PDF render")
+        assert time.monotonic() - started < 0.5
+        assert excinfo.value.stage == "PDF render"
+
+
+def test_submit_patients_bounded_by_deadline(slow_backend, sample_form_data):
+    """Test that a hanging backend costs at most the remaining budget."""
+    started = time.monotonic()
+    results = api_client.submit_patients([sample_form_data] * 2, Deadline(0.3))
+    assert time.monotonic() - started < 1
+    assert all(isinstance(result, (DeadlineExceeded, OSError)) for result in results)
+
+
+def test_deadline_timeout_is_not_charged_to_backend(slow_backend, monkeypatch, sample_form_data):
+    """Test that POSTs cut short by the deadline neither trip the breaker nor cut the limit."""
+    breaker = CircuitBreaker("backend", failure_threshold=1)
+    limiter = AdaptiveLimiter(initial_limit=4)
+    monkeypatch.setattr(api_client, "get_breaker", lambda name: breaker)
+    monkeypatch.setattr(api_client, "get_backend_limiter", lambda: limiter)
+
+    api_client.submit_patients([sample_form_data] * 2, Deadline(0.3))
+    give_up = time.monotonic() + 2
+    while limiter.in_flight and time.monotonic() < give_up:
+        time.sleep(0.01)
+
+    assert limiter.in_flight == 0
+    assert breaker.state == CLOSED
+    assert limiter.limit == 4
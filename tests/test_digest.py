@@ -0,0 +1,111 @@
+"""Tests for digest-mode email batching."""
+
+import threading
+
+from patient_intake.digest import DigestQueue, build_digest_entry
+from patient_intake.email_sender import format_digest_table
+
+
+def _entry(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    return build_digest_entry(
+        b"%PDF-1.7",
+        "Fluffy_intake_form.pdf",
+        [sample_form_data],
+        [sample_extra_fields],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+
+
+def test_build_digest_entry(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    """Test that a digest entry carries the summary row and full body."""
+    entry = _entry(
+        sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+    )
+    assert entry["rows"] == [
+        {
+            "received": entry["rows"][0]["received"],
+            "owner": "John Doe",
+            "patient_name": "Fluffy",
+            "species": "Canine",
+            "breed": "Labrador",
+            "phone": "5551234567",
+        }
+    ]
+    assert "Dr. Smith" in entry["body"]
+
+
+def test_format_digest_table_aligns_columns():
+    """Test the summary table has a header, a rule and one line per intake."""
+    table = format_digest_table(
+        [
+            {"owner": "John Doe", "patient_name": "Fluffy", "phone": "5551234567"},
+            {"owner": "Al Li", "patient_name": "Rex", "phone": "5550000000"},
+        ]
+    )
+    lines = table.splitlines()
+    assert len(lines) == 4
+    assert lines[0].startswith("Received")
+    assert lines[2].index("Fluffy") == lines[3].index("Rex")
+
+
+def test_queue_flushes_when_full(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    """Test that reaching max_intakes sends one digest, from the timer thread."""
+    sent = []
+    done = threading.Event()
+
+    def send(batch, merge):
+        sent.append((batch, threading.current_thread().name))
+        done.set()
+
+    queue = DigestQueue(max_intakes=2, interval_seconds=60, send=send)
+    queue.start()
+    entry = _entry(
+        sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+    )
+
+    queue.add(entry)
+    queue.add(entry)
+    assert done.wait(5)
+    queue.stop()
+    assert len(sent) == 1
+    batch, thread_name = sent[0]
+    assert len(batch) == 2
+    assert thread_name == "intake-digest"
+    assert len(queue) == 0
+
+
+def test_queue_requeues_on_send_failure():
+    """Test that a failed digest keeps its intakes for the next flush."""
+
+    def failing_send(batch, merge):
+        raise OSError("SMTP down")
+
+    queue = DigestQueue(max_intakes=10, interval_seconds=60, send=failing_send)
+    queue.add({"rows": [{}], "body": "", "filename": "a.pdf", "pdf_bytes": b""})
+    assert queue.flush() == 0
+    assert len(queue) == 1
+
+
+def test_queue_is_bounded_and_never_sends_on_add():
+    """Test that during an outage adds neither block on SMTP nor grow the queue without limit."""
+    attempts = []
+
+    def failing_send(batch, merge):
+        attempts.append(batch)
+        raise OSError("SMTP down")
+
+    queue = DigestQueue(max_intakes=2, interval_seconds=60, send=failing_send, max_queued=3)
+    entry = {"rows": [{}], "body": "", "filename": "a.pdf", "pdf_bytes": b""}
+    assert [queue.add(entry) for _ in range(4)] == [True, True, True, False]
+    assert attempts == []
+    assert queue.flush() == 0
+    assert len(queue) == 3
+    assert not queue.add(entry)
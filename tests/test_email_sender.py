@@ -1,6 +1,11 @@
 """Tests for email sender module."""
 
-from patient_intake.email_sender import format_email_body, label_from_id
+import pytest
+
+from patient_intake import email_sender
+from patient_intake.breaker import CLOSED, HALF_OPEN, CircuitBreaker
+from patient_intake.deadline import Deadline, DeadlineExceeded
+from patient_intake.email_sender import format_email_body, format_visit_email_body, label_from_id
 
 
 def test_label_from_id_found():
@@ -34,3 +39,94 @@ def test_format_email_body(
     assert "Canine" in body
     assert "Dr. Smith" in body
     assert "Main St Vet" in body
+
+
+def test_format_visit_email_body_single_pet_matches_intake_body(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    """Test a one-pet visit produces the same body as a single intake."""
+    maps = (sample_species_map, sample_breed_map, sample_sex_map)
+    assert format_visit_email_body(
+        [sample_form_data], [sample_extra_fields], *maps
+    ) == format_email_body(sample_form_data, sample_extra_fields, *maps)
+
+
+def test_format_visit_email_body_multiple_pets(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    """Test a multi-pet visit lists the owner once and every pet."""
+    second_pet = {**sample_form_data, "patient_name": "Whiskers", "patient_species": 2}
+    body = format_visit_email_body(
+        [sample_form_data, second_pet],
+        [sample_extra_fields, sample_extra_fields],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+
+    assert body.count("**Owner Information**") == 1
+    assert "**Patient 1 Information**" in body
+    assert "**Patient 2 Information**" in body
+    assert "Whiskers" in body
+    assert "Feline" in body
+
+
+SMTP_CONFIG = {
+    "smtp_server": "smtp.invalid",
+    "smtp_port": 587,
+    "sender_email": "",
+    "sender_password": "",
+}
+
+
+class _FakeSMTP:
+    """Stands in for smtplib.SMTP; connects and logs in without a server."""
+
+    sock = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+
+@pytest.fixture
+def half_open_smtp(monkeypatch, fake_clock):
+    """A half-open SMTP breaker and an SMTP client that needs no server."""
+    breaker = CircuitBreaker("test-smtp", failure_threshold=1, reset_seconds=10, clock=fake_clock)
+    breaker.record_failure()
+    fake_clock.now = 10.0
+    monkeypatch.setattr(email_sender, "get_breaker", lambda name: breaker)
+    monkeypatch.setattr(email_sender, "get_recorder", lambda: None)
+    monkeypatch.setattr(email_sender.smtplib, "SMTP", _FakeSMTP)
+    return breaker
+
+
+def test_expired_deadline_leaves_half_open_breaker_probe_free(half_open_smtp):
+    """Test that a deadline that has already passed neither takes nor leaks the probe."""
+    with pytest.raises(DeadlineExceeded):
+        with email_sender._smtp_session(SMTP_CONFIG, Deadline(0)):
+            pass
+    assert half_open_smtp.state == HALF_OPEN
+    half_open_smtp.before_call()
+
+
+def test_deadline_during_session_is_not_an_smtp_failure(half_open_smtp):
+    """Test that running out of time mid-send frees the probe without reopening the breaker."""
+    with pytest.raises(DeadlineExceeded):
+        with email_sender._smtp_session(SMTP_CONFIG, Deadline(60)):
+            raise DeadlineExceeded("Email send", 60)
+    assert half_open_smtp.state == HALF_OPEN
+    half_open_smtp.before_call()
+    half_open_smtp.record_success()
+    assert half_open_smtp.state == CLOSED
@@ -0,0 +1,107 @@
+"""Tests for the streaming intake export."""
+
+import csv
+from datetime import date
+
+import pyarrow.parquet as pq
+import pytest
+
+from patient_intake import export
+from patient_intake.export import EXPORT_COLUMNS, export_intakes
+from patient_intake.storage import IntakeStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IntakeStore(tmp_path / "intakes.db")
+
+
+@pytest.fixture
+def reference_maps(sample_species_map, sample_breed_map, sample_sex_map):
+    return sample_species_map, sample_breed_map, sample_sex_map
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def test_csv_has_email_fields_with_labels(
+    store, tmp_path, reference_maps, sample_form_data, sample_extra_fields
+):
+    """Test that each pet becomes one row, with catalogue IDs turned into labels."""
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    stats = export_intakes(store, tmp_path / "out.csv", reference_maps)
+
+    rows = _read_csv(tmp_path / "out.csv")
+    assert stats == {"rows": 1, "last_id": 1}
+    assert list(rows[0]) == EXPORT_COLUMNS
+    assert rows[0]["patient_name"] == "Fluffy"
+    assert (rows[0]["species"], rows[0]["breed"], rows[0]["sex"]) == ("Canine", "Labrador", "Male")
+    assert rows[0]["birthday"] == "6/15/2020"
+    assert rows[0]["doctor"] == "Dr. Smith"
+    assert "IA12345" not in (tmp_path / "out.csv").read_text()
+
+
+def test_incremental_export_only_includes_new_intakes(
+    store, tmp_path, reference_maps, sample_form_data, sample_extra_fields
+):
+    """Test that a named export picks up where the previous one stopped."""
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    export_intakes(store, tmp_path / "first.csv", reference_maps, since_last="nightly")
+    rex = {**sample_form_data, "patient_name": "Rex"}
+    store.append_visit([rex], [sample_extra_fields])
+
+    stats = export_intakes(store, tmp_path / "second.csv", reference_maps, since_last="nightly")
+    assert stats == {"rows": 1, "last_id": 2}
+    assert [row["patient_name"] for row in _read_csv(tmp_path / "second.csv")] == ["Rex"]
+
+    stats = export_intakes(store, tmp_path / "third.csv", reference_maps, since_last="nightly")
+    assert stats == {"rows": 0, "last_id": 2}
+    assert _read_csv(tmp_path / "third.csv") == []
+
+
+def test_date_range(store, tmp_path, reference_maps, sample_form_data, sample_extra_fields):
+    """Test that only intakes received within the range are exported."""
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    today = date.today()
+    export_intakes(store, tmp_path / "in.csv", reference_maps, start=today, end=today)
+    export_intakes(store, tmp_path / "out.csv", reference_maps, end=date(2000, 1, 1))
+    assert len(_read_csv(tmp_path / "in.csv")) == 1
+    assert _read_csv(tmp_path / "out.csv") == []
+
+
+def test_parquet_written_in_row_groups(
+    store, tmp_path, reference_maps, sample_form_data, sample_extra_fields, monkeypatch
+):
+    """Test that Parquet output is written in batches with the same rows as CSV."""
+    monkeypatch.setattr("patient_intake.export.PARQUET_BATCH_ROWS", 2)
+    store.append_visit([sample_form_data] * 5, [sample_extra_fields] * 5)
+    export_intakes(store, tmp_path / "out.parquet", reference_maps)
+
+    parquet = pq.ParquetFile(tmp_path / "out.parquet")
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.column("intake_id").to_pylist() == [1, 2, 3, 4, 5]
+
+
+def test_unknown_format_rejected(store, tmp_path, reference_maps):
+    """Test that an unsupported format fails before anything is written."""
+    with pytest.raises(ValueError, match="Unsupported export format"):
+        export_intakes(store, tmp_path / "out.xlsx", reference_maps)
+    assert not list(tmp_path.glob("out.xlsx*"))
+
+
+def test_cli_aborts_without_catalogue(
+    store, tmp_path, monkeypatch, sample_form_data, sample_extra_fields
+):
+    """Test that a failed catalogue fetch exits non-zero without writing or moving the cursor."""
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    monkeypatch.setattr(export, "get_intake_store", lambda: store)
+    monkeypatch.setattr(export, "fetch_reference_data", lambda: ({}, {}, {}))
+    with pytest.raises(SystemExit) as excinfo:
+        export.main([str(tmp_path / "out.csv"), "--since-last", "nightly"])
+    assert excinfo.value.code != 0
+    assert not list(tmp_path.glob("out.csv*"))
+    assert store.get_meta("export_cursor:nightly") is None
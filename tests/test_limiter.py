@@ -0,0 +1,96 @@
+"""Tests for the adaptive backend concurrency limiter."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from patient_intake import api_client, limiter
+from patient_intake.breaker import get_breaker
+from patient_intake.limiter import AdaptiveLimiter, LimiterTimeout
+
+
+def _round(adaptive, clock, calls, latency=0.1, overloaded=False):
+    """Send ``calls`` concurrent requests that all take ``latency``."""
+    tickets = [adaptive.acquire(timeout=0) for _ in range(calls)]
+    clock.now += latency
+    for ticket in tickets:
+        adaptive.release(ticket, overloaded=overloaded)
+
+
+def test_limit_grows_while_healthy_and_busy(fake_clock):
+    """Test additive increase up to the maximum, and none while mostly idle."""
+    adaptive = AdaptiveLimiter(initial_limit=4, max_limit=6, clock=fake_clock)
+    for _ in range(20):
+        _round(adaptive, fake_clock, calls=1)
+    assert adaptive.limit == 4
+
+    for _ in range(50):
+        _round(adaptive, fake_clock, calls=adaptive.limit)
+    assert adaptive.limit == 6
+
+
+def test_overload_cuts_once_per_burst(fake_clock):
+    """Test that a 429/5xx burst halves the limit once, not once per response."""
+    adaptive = AdaptiveLimiter(initial_limit=8, clock=fake_clock)
+    _round(adaptive, fake_clock, calls=8, overloaded=True)
+    assert adaptive.limit == 4
+    _round(adaptive, fake_clock, calls=4, overloaded=True)
+    assert adaptive.limit == 2
+    assert limiter._decreases.value(reason="error") >= 2
+
+
+def test_rising_latency_cuts_the_limit(fake_clock):
+    """Test that responses slowing well past the baseline back the limit off."""
+    adaptive = AdaptiveLimiter(initial_limit=8, clock=fake_clock)
+    for _ in range(5):
+        _round(adaptive, fake_clock, calls=8, latency=0.1)
+    before = adaptive.limit
+    for _ in range(5):
+        _round(adaptive, fake_clock, calls=adaptive.limit, latency=0.5)
+    assert adaptive.limit < before
+
+
+def test_waits_for_a_free_slot():
+    """Test that a caller over the limit waits for a release, or times out."""
+    adaptive = AdaptiveLimiter(initial_limit=1)
+    ticket = adaptive.acquire(timeout=0)
+    with pytest.raises(LimiterTimeout):
+        adaptive.acquire(timeout=0.05)
+
+    threading.Timer(0.1, adaptive.release, (ticket,)).start()
+    started = time.monotonic()
+    adaptive.release(adaptive.acquire(timeout=2))
+    assert time.monotonic() - started >= 0.1
+    assert adaptive.in_flight == 0
+
+
+class _ThrottlingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_submit_patient_backs_off_on_429(monkeypatch, sample_form_data):
+    """Test that backend throttling lowers the limit and its gauge."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    adaptive = AdaptiveLimiter(initial_limit=8)
+    monkeypatch.setattr(api_client, "get_backend_limiter", lambda: adaptive)
+    monkeypatch.setattr(api_client, "PATIENT_ADD_URL", f"http://127.0.0.1:{server.server_port}/")
+    try:
+        response = api_client.submit_patient(sample_form_data)
+    finally:
+        server.shutdown()
+        get_breaker("backend").record_success()
+
+    assert response.status_code == 429
+    assert adaptive.limit == 4
+    assert adaptive.in_flight == 0
+    assert limiter._limit_gauge.value() == 4
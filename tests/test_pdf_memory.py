@@ -0,0 +1,142 @@
+"""Memory tests for the render-to-email path of one submission."""
+
+import email
+import tracemalloc
+from contextlib import contextmanager
+from email import policy
+
+import pytest
+
+from patient_intake import email_sender
+from patient_intake.pdf_generator import _render_visit_pdf, fill_visit_pdf
+
+
+class _RecordingSMTP:
+    """Stand-in for an authenticated smtplib.SMTP session that records DATA."""
+
+    def __init__(self, keep_data: bool = True):
+        self.keep_data = keep_data
+        self.data = bytearray()
+        self.size = 0
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        return 250, b"OK"
+
+    def rcpt(self, recipient):
+        return 250, b"OK"
+
+    def docmd(self, command):
+        return 354, b"End data with <CR><LF>.<CR><LF>"
+
+    def send(self, data):
+        self.size += len(data)
+        if self.keep_data:
+            self.data += data
+
+    def getreply(self):
+        return 250, b"Queued"
+
+    def rset(self):
+        pass
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    """Route email_sender through a recording SMTP session."""
+    sessions = []
+
+    @contextmanager
+    def _session(email_config, deadline=None):
+        sessions.append(_RecordingSMTP(keep_data=not tracemalloc.is_tracing()))
+        yield sessions[-1]
+
+    monkeypatch.setattr(email_sender, "_smtp_session", _session)
+    monkeypatch.setattr(
+        email_sender,
+        "get_email_config",
+        lambda: {"sender_email": "desk@example.com", "recipient_email": "vet@example.com"},
+    )
+    return sessions
+
+
+def _submit(payloads, extra_fields_list, species_map, breed_map, sex_map) -> int:
+    """Render and email one visit the way _handle_submit does; return the PDF size."""
+    pdf_filled = _render_visit_pdf(payloads, extra_fields_list, species_map, breed_map, sex_map)
+    pdf_bytes = pdf_filled.getvalue()
+    assert email_sender.send_visit_email_with_pdf(
+        pdf_bytes=pdf_bytes,
+        filename="visit_intake_form.pdf",
+        payloads=payloads,
+        extra_fields_list=extra_fields_list,
+        species_map=species_map,
+        breed_map=breed_map,
+        sex_map=sex_map,
+    )
+    return len(pdf_bytes)
+
+
+def test_streamed_attachment_round_trips(
+    fake_smtp,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test the streamed DATA parses back to the body and the exact PDF bytes."""
+    pdf_bytes = fill_visit_pdf(
+        [sample_form_data],
+        [sample_extra_fields],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    ).getvalue()
+    assert email_sender.send_visit_email_with_pdf(
+        pdf_bytes=pdf_bytes,
+        filename="Fluffy_intake_form.pdf",
+        payloads=[sample_form_data],
+        extra_fields_list=[sample_extra_fields],
+        species_map=sample_species_map,
+        breed_map=sample_breed_map,
+        sex_map=sample_sex_map,
+    )
+
+    data = bytes(fake_smtp[0].data)
+    assert data.endswith(b"\r\n.\r\n")
+    msg = email.message_from_bytes(data[: -len(b".\r\n")], policy=policy.default)
+    assert msg["Subject"] == "New Patient Intake: Fluffy"
+    assert "John Doe" in msg.get_body().get_content()
+    (attachment,) = list(msg.iter_attachments())
+    assert attachment.get_filename() == "Fluffy_intake_form.pdf"
+    assert attachment.get_content() == pdf_bytes
+
+
+def test_submission_peak_memory_is_bounded_by_pdf_size(
+    fake_smtp,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test one render + email keeps Python-side peak memory close to one PDF copy."""
+    maps = (sample_species_map, sample_breed_map, sample_sex_map)
+    # A three-pet visit, so the PDF dominates the fixed email-header overhead
+    payloads = [sample_form_data] * 3
+    extra_fields_list = [sample_extra_fields] * 3
+    # Warm up imports, template cache and fonts so only per-submission work is traced
+    _submit(payloads, extra_fields_list, *maps)
+
+    tracemalloc.start()
+    try:
+        pdf_size = _submit(payloads, extra_fields_list, *maps)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # The rendered bytes plus small fixed-size encode chunks; before streaming the
+    # attachment, getvalue(), base64 and send_message held about six copies.
+    assert peak < 2 * pdf_size
@@ -0,0 +1,93 @@
+"""Tests for the cached pre-submit form preview."""
+
+import threading
+
+import pytest
+
+from patient_intake import preview
+from patient_intake.pdf_generator import BACKGROUND_PRIORITY, SUBMIT_PRIORITY, _RenderWorker
+from patient_intake.preview import PreviewCache, preview_key
+
+
+@pytest.fixture
+def maps(sample_species_map, sample_breed_map, sample_sex_map):
+    return sample_species_map, sample_breed_map, sample_sex_map
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Record render calls instead of rasterizing."""
+    calls = []
+
+    def fake_render(payload, extra_fields, species_map, breed_map, sex_map, dpi):
+        calls.append(payload)
+        return f"png-{len(calls)}".encode()
+
+    monkeypatch.setattr(preview, "render_preview_png", fake_render)
+    return calls
+
+
+def test_renders_a_png(sample_form_data, sample_extra_fields, maps):
+    """Test that a preview is a real low-resolution PNG of the filled form."""
+    png = PreviewCache(dpi=30).preview(sample_form_data, sample_extra_fields, *maps)
+    assert png.startswith(b"\x89PNG")
+
+
+def test_unchanged_fields_are_not_rerendered(sample_form_data, sample_extra_fields, maps, renders):
+    """Test that only a change to what shows on the form causes a new render."""
+    cache = PreviewCache()
+    first = cache.preview(sample_form_data, sample_extra_fields, *maps)
+    padded = {**sample_form_data, "patient_name": " Fluffy  "}
+    assert cache.preview(padded, sample_extra_fields, *maps) == first
+    assert len(renders) == 1
+
+    renamed = {**sample_form_data, "patient_name": "Rex"}
+    assert cache.preview(renamed, sample_extra_fields, *maps) != first
+    assert len(renders) == 2
+    assert renders[0]["patient_name"] == "Fluffy"
+
+
+def test_key_ignores_unrelated_catalogue_entries(sample_form_data, sample_extra_fields, maps):
+    """Test that a catalogue refresh only matters if the pet's own labels change."""
+    species_map, breed_map, sex_map = maps
+    key = preview_key(sample_form_data, sample_extra_fields, species_map, breed_map, sex_map)
+    grown = {**breed_map, "Poodle": 9}
+    assert preview_key(sample_form_data, sample_extra_fields, species_map, grown, sex_map) == key
+    renamed = {"Labrador Retriever": 1}
+    assert preview_key(sample_form_data, sample_extra_fields, species_map, renamed, sex_map) != key
+
+
+def test_lru_bound(sample_form_data, sample_extra_fields, maps, renders):
+    """Test that the least recently used preview is evicted once the cache is full."""
+    cache = PreviewCache(max_entries=2)
+    pets = [{**sample_form_data, "patient_name": name} for name in ("Ace", "Bo", "Cy")]
+    cache.preview(pets[0], sample_extra_fields, *maps)
+    cache.preview(pets[1], sample_extra_fields, *maps)
+    cache.preview(pets[0], sample_extra_fields, *maps)
+    cache.preview(pets[2], sample_extra_fields, *maps)
+    assert len(cache) == 2
+
+    cache.preview(pets[0], sample_extra_fields, *maps)
+    assert len(renders) == 3
+    cache.preview(pets[1], sample_extra_fields, *maps)
+    assert len(renders) == 4
+
+
+def test_submit_renders_run_before_queued_previews():
+    """Test that a Submit render overtakes queued previews and given-up previews are skipped."""
+    worker = _RenderWorker()
+    release = threading.Event()
+    order = []
+    worker.submit(release.wait)
+    stale = worker.submit(order.append, "stale", priority=BACKGROUND_PRIORITY)
+    previews = [
+        worker.submit(order.append, f"preview-{n}", priority=BACKGROUND_PRIORITY) for n in (1, 2)
+    ]
+    submit = worker.submit(order.append, "submit", priority=SUBMIT_PRIORITY)
+    assert stale.cancel()
+
+    release.set()
+    submit.result(timeout=5)
+    for future in previews:
+        future.result(timeout=5)
+    assert order == ["submit", "preview-1", "preview-2"]
@@ -0,0 +1,80 @@
+"""Tests for the rerun profiler."""
+
+import json
+
+import pytest
+
+from patient_intake import profiler
+from patient_intake.profiler import REPORT_INTERVAL, RerunProfiler, block, profiled_rerun
+
+
+@pytest.fixture
+def enabled(monkeypatch, tmp_path):
+    """Profiling switched on, into a fresh profiler."""
+    fresh = RerunProfiler(tmp_path / "profile.json")
+    monkeypatch.setattr(profiler, "RERUN_PROFILE_ENABLED", True)
+    monkeypatch.setattr(profiler, "get_profiler", lambda: fresh)
+    return fresh
+
+
+def test_report_ranks_blocks_by_total_time():
+    """Test that the costliest blocks come first, with their share of the rerun."""
+    profile = RerunProfiler()
+    for session_id in ("a", "a", "b"):
+        profile.record("css", 0.002, 0.002)
+        profile.record("pets", 0.006, 0.005)
+        profile.record_rerun(session_id, 0.010, 0.008)
+
+    report = profile.report(top=1)
+    assert report["reruns"]["count"] == 3
+    assert report["reruns"]["mean_ms"] == pytest.approx(10)
+    assert report["sessions"] == {"count": 2, "reruns_mean": 1.5, "reruns_max": 2}
+    (pets,) = report["blocks"]
+    assert pets["block"] == "pets"
+    assert pets["calls"] == 3
+    assert pets["share_of_rerun"] == pytest.approx(0.6)
+
+
+def test_report_file_written_when_due(tmp_path, fake_clock):
+    """Test that the report is rewritten at most once per interval."""
+    path = tmp_path / "profile.json"
+    profile = RerunProfiler(path, clock=fake_clock)
+    profile.record_rerun("a", 0.01, 0.01)
+    assert not path.exists()
+
+    fake_clock.now = REPORT_INTERVAL
+    profile.record_rerun("a", 0.01, 0.01)
+    assert json.loads(path.read_text())["reruns"]["count"] == 2
+    assert not path.with_name("profile.json.partial").exists()
+
+
+def test_stopped_rerun_is_still_counted(enabled):
+    """Test that a rerun ended by st.stop()/st.rerun() (an exception) is timed too."""
+    before = profiler._reruns.value()
+
+    @profiled_rerun
+    def page():
+        with block("captcha"):
+            raise RuntimeError("stop")
+
+    with pytest.raises(RuntimeError):
+        page()
+    report = enabled.report()
+    assert report["reruns"]["count"] == 1
+    assert report["blocks"][0]["block"] == "captcha"
+    assert profiler._reruns.value() == before + 1
+    assert profiler._wall.value(block="captcha") > 0
+
+
+def test_disabled_records_nothing(monkeypatch, enabled):
+    """Test that with profiling off the page runs unprofiled."""
+    monkeypatch.setattr(profiler, "RERUN_PROFILE_ENABLED", False)
+
+    @profiled_rerun
+    def page():
+        with block("css"):
+            return "ran"
+
+    assert page() == "ran"
+    assert enabled.report()["reruns"]["count"] == 0
+    assert enabled.report()["blocks"] == []
@@ -0,0 +1,114 @@
+"""Tests for bulk re-rendering of archived intakes."""
+
+import sqlite3
+
+import fitz
+
+from patient_intake.archive import IntakeArchive
+from patient_intake.regenerate import MANIFEST_NAME, regenerate
+
+
+def test_regenerate_renders_then_skips(
+    tmp_path,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that unchanged intakes are skipped and a template change re-renders them."""
+    archive = IntakeArchive(tmp_path / "archive")
+    other_pet = {**sample_form_data, "patient_name": "Rex"}
+    archive.archive_visit(
+        b"%PDF-1.7",
+        [sample_form_data, other_pet],
+        [sample_extra_fields, sample_extra_fields],
+        [1, 2],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+    output = tmp_path / "out"
+
+    assert regenerate(archive, output, ["intake"], workers=2) == {
+        "rendered": 2,
+        "skipped": 0,
+        "failed": 0,
+    }
+    pdfs = sorted(output.glob("*.pdf"))
+    assert [pdf.name.split("_")[0] for pdf in pdfs] == ["Fluffy", "Rex"]
+    with fitz.open(pdfs[0]) as doc:
+        assert "Fluffy" in doc[0].get_text()
+    assert (output / MANIFEST_NAME).exists()
+
+    assert regenerate(archive, output, ["intake"], workers=2)["skipped"] == 2
+    assert regenerate(archive, output, ["intake", "history"], workers=2)["rendered"] == 2
+
+
+def test_regenerate_keeps_original_date_and_age(
+    tmp_path,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that a re-rendered intake shows the day it was submitted and the age back then."""
+    archive = IntakeArchive(tmp_path / "archive")
+    archive.archive_visit(
+        b"%PDF-1.7",
+        [sample_form_data],
+        [sample_extra_fields],
+        [1],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+    )
+    with sqlite3.connect(archive.index_path) as conn:
+        conn.execute("UPDATE intakes SET created_at = '2022-03-04T09:30:00'")
+    output = tmp_path / "out"
+
+    assert regenerate(archive, output, ["history"], workers=1)["rendered"] == 1
+    (pdf,) = output.glob("*.pdf")
+    with fitz.open(pdf) as doc:
+        text = doc[0].get_text()
+    assert "03/04/2022" in text
+    assert "\n2\n" in f"\n{text}\n"
+
+
+def test_regenerate_renders_repeat_payload_per_day(
+    tmp_path,
+    sample_form_data,
+    sample_extra_fields,
+    sample_species_map,
+    sample_breed_map,
+    sample_sex_map,
+):
+    """Test that the same payload submitted on two days gets a PDF dated for each."""
+    archive = IntakeArchive(tmp_path / "archive")
+    for _ in range(2):
+        archive.archive_visit(
+            b"%PDF-1.7",
+            [sample_form_data],
+            [sample_extra_fields],
+            [1],
+            sample_species_map,
+            sample_breed_map,
+            sample_sex_map,
+        )
+    with sqlite3.connect(archive.index_path) as conn:
+        for row_id, day in [(1, "2022-03-04"), (2, "2023-05-06")]:
+            conn.execute(
+                "UPDATE intakes SET created_at = ?, intake_date = ? WHERE id = ?",
+                (f"{day}T09:30:00", day, row_id),
+            )
+    output = tmp_path / "out"
+
+    assert regenerate(archive, output, ["history"], workers=1)["rendered"] == 2
+    dates = set()
+    for pdf in output.glob("*.pdf"):
+        with fitz.open(pdf) as doc:
+            text = doc[0].get_text()
+        dates.update(d for d in ("03/04/2022", "05/06/2023") if d in text)
+    assert dates == {"03/04/2022", "05/06/2023"}
+    assert regenerate(archive, output, ["history"], workers=1)["skipped"] == 2
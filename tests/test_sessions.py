@@ -0,0 +1,91 @@
+"""Tests for session memory accounting and the idle-session reaper."""
+
+import io
+from types import SimpleNamespace
+
+from streamlit.runtime.state import SessionState
+
+from patient_intake import sessions
+from patient_intake.sessions import SessionReaper, value_bytes
+
+
+def _info(session_id, values=None, runs=1, connected=True):
+    state = SessionState()
+    for key, value in (values or {}).items():
+        state[key] = value
+    session = SimpleNamespace(id=session_id, session_state=state)
+    return SimpleNamespace(
+        session=session, client=object() if connected else None, script_run_count=runs
+    )
+
+
+def test_value_bytes_counts_buffer_contents():
+    """Test that buffers and containers are sized by what they hold."""
+    assert value_bytes(io.BytesIO(b"x" * 100_000)) > 100_000
+    assert value_bytes(memoryview(b"x" * 50_000)) == 50_000
+    assert value_bytes({"pdf": b"x" * 100_000, "pets": ["Rex"]}) > 100_000
+
+
+def test_value_bytes_does_not_copy_shared_buffers():
+    """Test that measuring a BytesIO leaves it sharing the bytes it was created from."""
+    data = b"x" * 100_000
+    buffer = io.BytesIO(data)
+    value_bytes(buffer)
+    assert buffer.getvalue() is data
+
+
+def test_idle_tab_loses_large_buffers_only(fake_clock):
+    """Test that an open idle tab keeps its form but drops large buffers, once."""
+    reaper = SessionReaper(idle_seconds=60, buffer_bytes=1000, clock=fake_clock)
+    info = _info("tab", {"owner_name": "Jane Doe", "pdf": io.BytesIO(b"x" * 5000)})
+    before = reaper.sweep([info]).state_bytes["tab"]
+
+    fake_clock.now = 61
+    result = reaper.sweep([info])
+    assert result.trimmed == ["tab"]
+    assert result.close == []
+    assert "pdf" not in info.session.session_state
+    assert info.session.session_state["owner_name"] == "Jane Doe"
+    assert result.state_bytes["tab"] < before - 5000
+    assert reaper.sweep([info]).trimmed == []
+
+
+def test_disconnected_idle_session_is_closed(fake_clock):
+    """Test that a tab that went away is closed once idle, and activity defers it."""
+    reaper = SessionReaper(idle_seconds=60, clock=fake_clock)
+    gone, busy = _info("gone", connected=False), _info("busy", connected=False)
+    reaper.sweep([gone, busy])
+
+    fake_clock.now = 61
+    busy.script_run_count += 1
+    assert reaper.sweep([gone, busy]).close == ["gone"]
+
+    fake_clock.now = 122
+    assert reaper.sweep([busy]).close == ["busy"]
+
+
+def test_zero_idle_seconds_only_measures(fake_clock):
+    """Test that the reaper can be disabled while accounting keeps running."""
+    reaper = SessionReaper(idle_seconds=0, buffer_bytes=1, clock=fake_clock)
+    infos = [_info("a", {"pdf": b"x" * 10}), _info("b", connected=False)]
+    reaper.sweep(infos)
+    fake_clock.now = 10**6
+    result = reaper.sweep(infos)
+    assert result.close == result.trimmed == []
+    assert sessions._sessions.value(state="connected") == 1
+    assert sessions._sessions.value(state="disconnected") == 1
+    assert sessions._largest.value() == max(result.state_bytes.values())
+
+
+def test_missing_streamlit_internals_disable_the_reaper(monkeypatch, caplog):
+    """Test that the reaper stops sweeping if Streamlit's private session API is gone."""
+
+    def missing():
+        raise AttributeError("'Runtime' object has no attribute '_session_mgr'")
+
+    monkeypatch.setattr(sessions, "_runtime_sessions", missing)
+    monkeypatch.setattr(sessions, "_unsupported", sessions.threading.Event())
+    sessions._reap(SessionReaper(idle_seconds=60))
+    sessions._reap(SessionReaper(idle_seconds=60))
+    assert sessions._unsupported.is_set()
+    assert [r.levelname for r in caplog.records] == ["WARNING"]
@@ -0,0 +1,93 @@
+"""Tests for the host-wide catalogue and template snapshot."""
+
+import os
+import shutil
+
+import pytest
+
+from patient_intake.config import HISTORY_FORM_TEMPLATE_PATH, PDF_TEMPLATE_PATH
+from patient_intake.snapshot import SharedSnapshot, get_snapshot
+from patient_intake.template_registry import INTAKE_LAYOUT, TemplateRegistry
+
+
+@pytest.fixture
+def catalogue(sample_species_map, sample_breed_map, sample_sex_map):
+    return sample_species_map, sample_breed_map, sample_sex_map
+
+
+def test_catalogue_shared_between_processes(tmp_path, catalogue):
+    """Test that a catalogue published by one process is read by another until it expires."""
+    SharedSnapshot(tmp_path).publish(catalogue=catalogue)
+    other = SharedSnapshot(tmp_path)
+    assert other.catalogue(max_age=3600) == catalogue
+    assert other.catalogue(max_age=0) is None
+    assert SharedSnapshot(tmp_path / "empty").catalogue(max_age=3600) is None
+
+
+def test_publish_keeps_what_is_not_updated(tmp_path, catalogue):
+    """Test that publishing a template keeps the catalogue and other templates."""
+    snapshot = SharedSnapshot(tmp_path)
+    snapshot.publish(catalogue=catalogue)
+    snapshot.publish(templates={"intake": (PDF_TEMPLATE_PATH, (1, 2), b"intake")})
+    snapshot.publish(templates={"history": (HISTORY_FORM_TEMPLATE_PATH, (3, 4), b"history")})
+
+    other = SharedSnapshot(tmp_path)
+    assert other.catalogue(max_age=3600) == catalogue
+    assert other.template("intake", PDF_TEMPLATE_PATH, (1, 2)) == b"intake"
+    assert other.template("history", HISTORY_FORM_TEMPLATE_PATH, (3, 4)) == b"history"
+    assert other.template("intake", PDF_TEMPLATE_PATH, (1, 3)) is None
+
+
+def test_swap_leaves_attached_views_intact(tmp_path):
+    """Test that replacing the snapshot does not disturb bytes a reader still holds."""
+    snapshot = SharedSnapshot(tmp_path)
+    snapshot.publish(templates={"form": (PDF_TEMPLATE_PATH, (1, 1), b"old")})
+    reader = SharedSnapshot(tmp_path)
+    held = reader.template("form", PDF_TEMPLATE_PATH, (1, 1))
+
+    snapshot.publish(templates={"form": (PDF_TEMPLATE_PATH, (2, 2), b"newer")})
+    assert held == b"old"
+    assert reader.template("form", PDF_TEMPLATE_PATH, (2, 2)) == b"newer"
+
+
+def test_registries_share_validated_template(tmp_path):
+    """Test that the first registry publishes the template and a second one attaches to it."""
+    path = tmp_path / "form.pdf"
+    shutil.copy(PDF_TEMPLATE_PATH, path)
+    first = TemplateRegistry(snapshot=SharedSnapshot(tmp_path / "shm"))
+    first.register("form", path, INTAKE_LAYOUT)
+    assert isinstance(first.get("form")[0], memoryview)
+
+    second = TemplateRegistry(snapshot=SharedSnapshot(tmp_path / "shm"))
+    second.register("form", path, INTAKE_LAYOUT)
+    data, _ = second.get("form")
+    assert isinstance(data, memoryview)
+    assert data == PDF_TEMPLATE_PATH.read_bytes()
+
+
+def test_refuses_directory_open_to_others(tmp_path):
+    """Test that a snapshot directory someone else could write to is not trusted."""
+    planted = tmp_path / "planted"
+    planted.mkdir(mode=0o777)
+    os.chmod(planted, 0o777)
+    with pytest.raises(PermissionError):
+        SharedSnapshot(planted)
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path / "real", target_is_directory=True)
+    (tmp_path / "real").mkdir(mode=0o700)
+    with pytest.raises(PermissionError):
+        SharedSnapshot(link)
+
+
+def test_snapshot_file_keyed_by_catalogue_url(tmp_path, catalogue):
+    """Test that deployments against different backends do not share a catalogue."""
+    SharedSnapshot(tmp_path / "shm", key="https://a.example/catalogue").publish(catalogue=catalogue)
+    assert (
+        SharedSnapshot(tmp_path / "shm", key="https://b.example/catalogue").catalogue(3600) is None
+    )
+    assert SharedSnapshot(tmp_path / "shm", key="https://a.example/catalogue").catalogue(3600)
+
+
+def test_default_snapshot_stays_in_test_directory(snapshot_dir):
+    """Test that the process-wide snapshot uses the per-test directory, not the host's."""
+    assert get_snapshot().directory == snapshot_dir
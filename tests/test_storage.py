@@ -0,0 +1,136 @@
+"""Tests for the local intake store."""
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from patient_intake.storage import _SCHEMA, SCHEMA_VERSION, IntakeStore, normalize_phone
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IntakeStore(tmp_path / "intakes.db")
+
+
+def test_normalize_phone():
+    """Test that formatting and a leading US country code are ignored."""
+    assert normalize_phone("(555) 123-4567") == "5551234567"
+    assert normalize_phone("+1 555 123 4567") == "5551234567"
+    assert normalize_phone(None) == ""
+
+
+def test_lookups_by_phone_email_and_pet_name(store, sample_form_data, sample_extra_fields):
+    """Test that an appended visit is found through each index, newest first."""
+    rex = {**sample_form_data, "patient_name": "Rex"}
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    store.append_visit([rex], [sample_extra_fields])
+
+    by_phone = store.find_by_phone("555-123-4567")
+    assert [row["patient_name"] for row in by_phone] == ["Rex", "Fluffy"]
+    assert by_phone[1]["payload"] == sample_form_data
+    assert by_phone[1]["extra_fields"] == sample_extra_fields
+    assert len(store.find_by_email(" John@Example.com ")) == 2
+    assert [row["patient_name"] for row in store.find_by_pet_name("fluffy")] == ["Fluffy"]
+    assert store.find_by_phone("") == []
+
+
+def test_concurrent_appends(store, sample_form_data, sample_extra_fields):
+    """Test that appends from many threads all land."""
+
+    def append(n):
+        pet = {**sample_form_data, "patient_name": f"Pet{n}"}
+        for _ in range(10):
+            store.append_visit([pet], [sample_extra_fields])
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.count() == 80
+
+
+def test_legacy_json_imported_once(store, tmp_path):
+    """Test that both legacy record shapes are imported, and only on the first call."""
+    legacy = tmp_path / "data.json"
+    legacy.write_text(
+        json.dumps(
+            [
+                {
+                    "Full Name": "Ann Lee",
+                    "Email": "ann@example.com",
+                    "Phone number": "5550001111",
+                    "Patient name": "Milo",
+                    "Breed": "Beagle",
+                },
+                {
+                    "patient_name": "Rex",
+                    "patient_owner_firstname": "Test",
+                    "patient_owner_lastname": "Owner",
+                    "phone": "1231231234",
+                    "email": "test@example.com",
+                },
+            ]
+        )
+    )
+    assert store.import_legacy_json(legacy) == 2
+    assert store.import_legacy_json(legacy) == 0
+    assert store.count() == 2
+
+    milo = store.find_by_phone("5550001111")[0]
+    assert (milo["owner_firstname"], milo["owner_lastname"]) == ("Ann", "Lee")
+    assert milo["source"] == "legacy"
+    assert store.find_by_email("test@example.com")[0]["patient_name"] == "Rex"
+
+
+def test_returning_owner_lookup_is_cached_until_append(
+    store, sample_form_data, sample_extra_fields
+):
+    """Test that the newest intake is returned by phone or email and the cache refreshes."""
+    assert store.returning_owner("5551234567", "Doe") is None
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    first = store.returning_owner("(555) 123-4567", "Doe")
+    assert first["payload"]["patient_owner_firstname"] == "John"
+    assert store.returning_owner("JOHN@example.com", " doe ") == first
+    assert store.returning_owner("(555) 123-4567", "Doe") is first
+
+    moved = {**sample_form_data, "city": "Ames"}
+    store.append_visit([moved], [sample_extra_fields])
+    assert store.returning_owner("5551234567", "Doe")["payload"]["city"] == "Ames"
+
+
+def test_returning_owner_requires_matching_last_name(store, sample_form_data, sample_extra_fields):
+    """Test that a phone number or email alone does not reveal the owner's details."""
+    store.append_visit([sample_form_data], [sample_extra_fields])
+    assert store.returning_owner("5551234567", "") is None
+    assert store.returning_owner("5551234567", "Smith") is None
+
+    # Another household member on the same phone, visiting later
+    other = {**sample_form_data, "patient_owner_firstname": "Ann", "patient_owner_lastname": "Lee"}
+    store.append_visit([other], [sample_extra_fields])
+    assert store.returning_owner("5551234567", "Doe")["owner_firstname"] == "John"
+    assert store.returning_owner("5551234567", "Lee")["owner_firstname"] == "Ann"
+
+
+def test_migrates_version_1_database(tmp_path, sample_form_data, sample_extra_fields):
+    """Test that rows written before hashed keys existed are backfilled and found."""
+    path = tmp_path / "intakes.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    conn.execute(
+        "INSERT INTO intakes (created_at, source, owner_firstname, owner_lastname, phone, email,"
+        " patient_name, patient_name_key, payload, extra_fields)"
+        " VALUES ('2025-01-01', 'app', 'John', 'Doe', '5551234567', 'john@example.com',"
+        " 'Fluffy', 'fluffy', ?, ?)",
+        (json.dumps(sample_form_data), json.dumps(sample_extra_fields)),
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    store = IntakeStore(path)
+    assert store.find_by_phone("5551234567")[0]["patient_name"] == "Fluffy"
+    assert store.returning_owner("john@example.com", "Doe")["owner_lastname"] == "Doe"
+    assert store._connection().execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
@@ -0,0 +1,79 @@
+"""Tests for the PDF template registry."""
+
+import os
+import shutil
+
+import fitz
+import pytest
+
+from patient_intake.config import HISTORY_FORM_TEMPLATE_PATH, PDF_TEMPLATE_PATH
+from patient_intake.pdf_generator import fill_visit_pdf
+from patient_intake.template_registry import (
+    HISTORY_LAYOUT,
+    INTAKE_LAYOUT,
+    TemplateRegistry,
+)
+
+
+def test_unknown_form_type():
+    """Test looking up an unregistered form type raises KeyError."""
+    with pytest.raises(KeyError):
+        TemplateRegistry().get("missing")
+
+
+def test_hot_reload_picks_up_changed_file(tmp_path):
+    """Test a replaced template file is reloaded without re-registering."""
+    path = tmp_path / "form.pdf"
+    shutil.copy(PDF_TEMPLATE_PATH, path)
+    registry = TemplateRegistry(reload_interval=0)
+    registry.register("form", path, INTAKE_LAYOUT)
+    original, _ = registry.get("form")
+
+    shutil.copy(HISTORY_FORM_TEMPLATE_PATH, path)
+    reloaded, _ = registry.get("form")
+
+    assert original == PDF_TEMPLATE_PATH.read_bytes()
+    assert reloaded == HISTORY_FORM_TEMPLATE_PATH.read_bytes()
+
+
+def test_broken_reload_keeps_previous_template(tmp_path):
+    """Test an invalid replacement file does not evict the working template."""
+    path = tmp_path / "form.pdf"
+    shutil.copy(PDF_TEMPLATE_PATH, path)
+    registry = TemplateRegistry(reload_interval=0)
+    registry.register("form", path, INTAKE_LAYOUT)
+    original, _ = registry.get("form")
+
+    path.write_bytes(b"not a pdf")
+    os.utime(path, ns=(1, 1))
+    assert registry.get("form")[0] == original
+
+
+def test_layout_fields_must_exist(tmp_path):
+    """Test a template missing its layout's form fields is rejected on load."""
+    registry = TemplateRegistry()
+    registry.register("history", PDF_TEMPLATE_PATH, HISTORY_LAYOUT)
+    with pytest.raises(ValueError, match="missing form fields"):
+        registry.get("history")
+
+
+def test_visit_renders_every_form_for_every_pet(
+    sample_form_data, sample_extra_fields, sample_species_map, sample_breed_map, sample_sex_map
+):
+    """Test several forms per visit are merged, with history fields filled in."""
+    second_pet = {**sample_form_data, "patient_name": "Whiskers"}
+    pdf = fill_visit_pdf(
+        [sample_form_data, second_pet],
+        [sample_extra_fields, sample_extra_fields],
+        sample_species_map,
+        sample_breed_map,
+        sample_sex_map,
+        form_types=["intake", "history"],
+    )
+
+    doc = fitz.open(stream=pdf.getvalue(), filetype="pdf")
+    # Per pet: 1 intake page + 3 history pages
+    assert len(doc) == 8
+    assert "John Doe" in doc[1].get_text()
+    assert "Fluffy" in doc[1].get_text()
+    assert "Whiskers" in doc[5].get_text()
@@ -0,0 +1,96 @@
+"""Tests for correlation IDs and trace events."""
+
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from patient_intake import api_client, tracing
+from patient_intake.tracing import JsonFormatter, _DroppingQueueHandler, event, trace
+
+
+class _RecordingHandler(BaseHTTPRequestHandler):
+    headers_seen: list = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        _RecordingHandler.headers_seen.append(self.headers.get("X-Correlation-ID"))
+        body = b'{"result": "success", "patient_id": 7}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    _RecordingHandler.headers_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RecordingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(api_client, "PATIENT_ADD_URL", f"http://127.0.0.1:{server.server_port}/")
+    yield _RecordingHandler.headers_seen
+    server.shutdown()
+
+
+@pytest.fixture
+def events():
+    """Trace records as logged, before they reach the queue."""
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    tracing.logger.addHandler(handler)
+    yield records
+    tracing.logger.removeHandler(handler)
+
+
+def test_correlation_id_reaches_worker_threads_and_backend(backend, events, sample_form_data):
+    """Test that the ID is carried into the POST threads, its header and its events."""
+    with trace("abc123"):
+        responses = api_client.submit_patients([sample_form_data] * 2)
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert backend == ["abc123", "abc123"]
+    posts = [record for record in events if record.event == "backend.post"]
+    assert [record.correlation_id for record in posts] == ["abc123", "abc123"]
+    assert posts[0].fields["status"] == 200
+
+
+def test_unsampled_submission_logs_only_warnings(events):
+    """Test that sampling drops info events for the whole submission but keeps warnings."""
+    with trace(sample_rate=0):
+        event("backend.post", status=200)
+        event("email.send.failed", logging.ERROR, error="SMTPException")
+    assert [record.event for record in events] == ["email.send.failed"]
+    assert tracing.correlation_id() is None
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test that events are dropped and counted when the writer falls behind."""
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = tracing._dropped.value()
+    for _ in range(3):
+        handler.emit(logging.makeLogRecord({"msg": "event"}))
+    assert tracing._dropped.value() == before + 2
+
+
+def test_json_formatter():
+    """Test that a record renders as one JSON object with its fields."""
+    record = logging.makeLogRecord(
+        {
+            "levelname": "INFO",
+            "msg": "pdf.render",
+            "event": "pdf.render",
+            "correlation_id": "abc123",
+            "fields": {"pets": 2},
+        }
+    )
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["event"] == "pdf.render"
+    assert entry["correlation_id"] == "abc123"
+    assert entry["pets"] == 2
@@ -0,0 +1,35 @@
+"""Tests for the startup warm-up readiness probe."""
+
+import json
+import urllib.error
+import urllib.request
+
+from patient_intake import warmup
+
+
+def _get(server, path):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_ready_probe_follows_warm_up_state(monkeypatch):
+    """Test /ready is 503 until warm-up completes and /live is always 200."""
+    monkeypatch.setattr(warmup, "_ready", warmup.threading.Event())
+    server = warmup.start_health_server(port=0)
+    try:
+        assert _get(server, "/live") == (200, {"live": True})
+        status, body = _get(server, "/ready")
+        assert status == 503
+        assert body["ready"] is False
+
+        warmup._ready.set()
+        status, body = _get(server, "/ready")
+        assert status == 200
+        assert body["ready"] is True
+    finally:
+        server.shutdown()
+        server.server_close()